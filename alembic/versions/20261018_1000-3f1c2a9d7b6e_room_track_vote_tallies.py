@@ -0,0 +1,88 @@
+"""room_track vote tallies
+
+Revision ID: 3f1c2a9d7b6e
+Revises: 15be8f8912cd
+Create Date: 2026-10-18 10:00:12.481903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d7b6e'
+down_revision: Union[str, Sequence[str], None] = '15be8f8912cd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# keeps room_tracks.vote_sum / vote_count in step with every write to votes
+# (UPSERT_VOTE, cascades, manual fixes), so queue reads never aggregate votes
+TALLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION room_tracks_vote_tally() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE room_tracks
+    SET vote_sum = vote_sum + NEW.value, vote_count = vote_count + 1
+    WHERE id = NEW.room_track_id;
+
+  ELSIF TG_OP = 'UPDATE' THEN
+    -- re-voting the same value is a no-op, don't touch room_tracks
+    IF NEW.room_track_id = OLD.room_track_id AND NEW.value = OLD.value THEN
+      RETURN NULL;
+    END IF;
+    UPDATE room_tracks
+    SET vote_sum = vote_sum - OLD.value, vote_count = vote_count - 1
+    WHERE id = OLD.room_track_id;
+    UPDATE room_tracks
+    SET vote_sum = vote_sum + NEW.value, vote_count = vote_count + 1
+    WHERE id = NEW.room_track_id;
+
+  ELSIF TG_OP = 'DELETE' THEN
+    UPDATE room_tracks
+    SET vote_sum = vote_sum - OLD.value, vote_count = vote_count - 1
+    WHERE id = OLD.room_track_id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TALLY_TRIGGER = """
+CREATE TRIGGER trg_votes_tally
+AFTER INSERT OR UPDATE OF value, room_track_id OR DELETE ON votes
+FOR EACH ROW EXECUTE FUNCTION room_tracks_vote_tally();
+"""
+
+BACKFILL = """
+UPDATE room_tracks rt
+SET vote_sum = v.vote_sum, vote_count = v.vote_count
+FROM (
+  SELECT room_track_id, SUM(value) AS vote_sum, COUNT(*) AS vote_count
+  FROM votes
+  GROUP BY room_track_id
+) v
+WHERE v.room_track_id = rt.id;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('room_tracks', sa.Column('vote_sum', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.add_column('room_tracks', sa.Column('vote_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+    # trigger first: CREATE TRIGGER locks votes against writes until this migration commits,
+    # so no vote can slip in between the backfill and the trigger going live
+    op.execute(TALLY_FUNCTION)
+    op.execute(TALLY_TRIGGER)
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_votes_tally ON votes;")
+    op.execute("DROP FUNCTION IF EXISTS room_tracks_vote_tally();")
+    op.drop_column('room_tracks', 'vote_count')
+    op.drop_column('room_tracks', 'vote_sum')
@@ -0,0 +1,35 @@
+"""trigram search indexes on tracks
+
+Revision ID: 8d4e6b1f2a90
+Revises: 3f1c2a9d7b6e
+Create Date: 2026-10-18 11:30:41.207754
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4e6b1f2a90'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a9d7b6e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # pg_trgm lets '%q%' ILIKE use an index (B-tree can't with a leading wildcard) and gives us similarity()
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    op.create_index('ix_tracks_title_trgm', 'tracks', ['title'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+    op.create_index('ix_tracks_artist_trgm', 'tracks', ['artist'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'artist': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tracks_artist_trgm', table_name='tracks', postgresql_using='gin')
+    op.drop_index('ix_tracks_title_trgm', table_name='tracks', postgresql_using='gin')
+    # pg_trgm itself stays, other things may rely on it
@@ -0,0 +1,62 @@
+"""cast vote function
+
+Revision ID: a7c3e91d5b42
+Revises: 8d4e6b1f2a90
+Create Date: 2026-10-18 13:00:41.207315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e91d5b42'
+down_revision: Union[str, Sequence[str], None] = '8d4e6b1f2a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# POST /votes in one statement: check the track is queued in the room, upsert the vote,
+# return the new tally (NULL = not found / not queueable -> 404).
+# The room_track row is locked first (the same lock trg_votes_tally's UPDATE takes anyway),
+# so an advance can't play it mid-vote and the vote_sum we read back includes every earlier vote.
+CAST_VOTE_FUNCTION = """
+CREATE OR REPLACE FUNCTION cast_room_track_vote(
+  p_vote_id uuid, p_room_track_id uuid, p_room_id uuid, p_user_id uuid, p_value integer
+) RETURNS integer AS $$
+DECLARE
+  new_sum integer;
+BEGIN
+  PERFORM 1
+  FROM room_tracks
+  WHERE id = p_room_track_id
+    AND room_id = p_room_id
+    AND status = 'queued'::track_status
+  FOR NO KEY UPDATE;
+  IF NOT FOUND THEN
+    RETURN NULL;
+  END IF;
+
+  INSERT INTO votes (id, room_track_id, user_id, value)
+  VALUES (p_vote_id, p_room_track_id, p_user_id, p_value)
+  ON CONFLICT (room_track_id, user_id)
+  DO UPDATE SET value = EXCLUDED.value;
+
+  -- trg_votes_tally already ran, its update is visible here
+  SELECT vote_sum INTO new_sum FROM room_tracks WHERE id = p_room_track_id;
+  RETURN new_sum;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(CAST_VOTE_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP FUNCTION IF EXISTS cast_room_track_vote(uuid, uuid, uuid, uuid, integer);")
@@ -0,0 +1,55 @@
+"""one playing track per room
+
+Revision ID: c2d8f4a61e07
+Revises: a7c3e91d5b42
+Create Date: 2026-10-18 14:00:27.560913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d8f4a61e07'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e91d5b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# racing advances could leave several tracks 'playing' in a room; keep the newest
+# (the one GET_NOW_PLAYING_DETAILS shows) and mark the others played
+DEDUPE_PLAYING = """
+UPDATE room_tracks
+SET status = 'played'::track_status
+WHERE status = 'playing'::track_status
+  AND id NOT IN (
+    SELECT DISTINCT ON (room_id) id
+    FROM room_tracks
+    WHERE status = 'playing'::track_status
+    ORDER BY room_id, created_at DESC, id DESC
+  );
+"""
+
+# at most one 'playing' row per room. Deferred to commit: ADVANCE_ROOM plays the next track
+# and retires the current one in the same statement, in no guaranteed row order.
+# (A partial unique index can't be deferred, an exclusion constraint with = can.)
+ONE_PLAYING_CONSTRAINT = """
+ALTER TABLE room_tracks
+ADD CONSTRAINT ex_room_one_playing
+EXCLUDE USING btree (room_id WITH =)
+WHERE (status = 'playing'::track_status)
+DEFERRABLE INITIALLY DEFERRED;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(DEDUPE_PLAYING)
+    op.execute(ONE_PLAYING_CONSTRAINT)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE room_tracks DROP CONSTRAINT IF EXISTS ex_room_one_playing;")
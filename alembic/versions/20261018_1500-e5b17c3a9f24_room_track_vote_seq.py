@@ -0,0 +1,155 @@
+"""room_track vote seq
+
+Revision ID: e5b17c3a9f24
+Revises: c2d8f4a61e07
+Create Date: 2026-10-18 15:00:09.734412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b17c3a9f24'
+down_revision: Union[str, Sequence[str], None] = 'c2d8f4a61e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# room_tracks.vote_seq goes up with every change to the track's tally (same row lock as the tally update),
+# so workers receiving "vote" events out of order can tell an older tally from a newer one
+TALLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION room_tracks_vote_tally() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE room_tracks
+    SET vote_sum = vote_sum + NEW.value, vote_count = vote_count + 1, vote_seq = vote_seq + 1
+    WHERE id = NEW.room_track_id;
+
+  ELSIF TG_OP = 'UPDATE' THEN
+    -- re-voting the same value is a no-op, don't touch room_tracks
+    IF NEW.room_track_id = OLD.room_track_id AND NEW.value = OLD.value THEN
+      RETURN NULL;
+    END IF;
+    UPDATE room_tracks
+    SET vote_sum = vote_sum - OLD.value, vote_count = vote_count - 1, vote_seq = vote_seq + 1
+    WHERE id = OLD.room_track_id;
+    UPDATE room_tracks
+    SET vote_sum = vote_sum + NEW.value, vote_count = vote_count + 1, vote_seq = vote_seq + 1
+    WHERE id = NEW.room_track_id;
+
+  ELSIF TG_OP = 'DELETE' THEN
+    UPDATE room_tracks
+    SET vote_sum = vote_sum - OLD.value, vote_count = vote_count - 1, vote_seq = vote_seq + 1
+    WHERE id = OLD.room_track_id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+OLD_TALLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION room_tracks_vote_tally() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE room_tracks
+    SET vote_sum = vote_sum + NEW.value, vote_count = vote_count + 1
+    WHERE id = NEW.room_track_id;
+
+  ELSIF TG_OP = 'UPDATE' THEN
+    IF NEW.room_track_id = OLD.room_track_id AND NEW.value = OLD.value THEN
+      RETURN NULL;
+    END IF;
+    UPDATE room_tracks
+    SET vote_sum = vote_sum - OLD.value, vote_count = vote_count - 1
+    WHERE id = OLD.room_track_id;
+    UPDATE room_tracks
+    SET vote_sum = vote_sum + NEW.value, vote_count = vote_count + 1
+    WHERE id = NEW.room_track_id;
+
+  ELSIF TG_OP = 'DELETE' THEN
+    UPDATE room_tracks
+    SET vote_sum = vote_sum - OLD.value, vote_count = vote_count - 1
+    WHERE id = OLD.room_track_id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# cast_room_track_vote now returns the seq with the tally: one row (votes, vote_seq), none when
+# the track isn't queued in the room
+CAST_VOTE_FUNCTION = """
+CREATE FUNCTION cast_room_track_vote(
+  p_vote_id uuid, p_room_track_id uuid, p_room_id uuid, p_user_id uuid, p_value integer
+) RETURNS TABLE (votes integer, vote_seq bigint) AS $$
+BEGIN
+  PERFORM 1
+  FROM room_tracks
+  WHERE id = p_room_track_id
+    AND room_id = p_room_id
+    AND status = 'queued'::track_status
+  FOR NO KEY UPDATE;
+  IF NOT FOUND THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO votes (id, room_track_id, user_id, value)
+  VALUES (p_vote_id, p_room_track_id, p_user_id, p_value)
+  ON CONFLICT (room_track_id, user_id)
+  DO UPDATE SET value = EXCLUDED.value;
+
+  -- trg_votes_tally already ran, its update is visible here
+  RETURN QUERY SELECT rt.vote_sum, rt.vote_seq FROM room_tracks rt WHERE rt.id = p_room_track_id;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+OLD_CAST_VOTE_FUNCTION = """
+CREATE FUNCTION cast_room_track_vote(
+  p_vote_id uuid, p_room_track_id uuid, p_room_id uuid, p_user_id uuid, p_value integer
+) RETURNS integer AS $$
+DECLARE
+  new_sum integer;
+BEGIN
+  PERFORM 1
+  FROM room_tracks
+  WHERE id = p_room_track_id
+    AND room_id = p_room_id
+    AND status = 'queued'::track_status
+  FOR NO KEY UPDATE;
+  IF NOT FOUND THEN
+    RETURN NULL;
+  END IF;
+
+  INSERT INTO votes (id, room_track_id, user_id, value)
+  VALUES (p_vote_id, p_room_track_id, p_user_id, p_value)
+  ON CONFLICT (room_track_id, user_id)
+  DO UPDATE SET value = EXCLUDED.value;
+
+  SELECT vote_sum INTO new_sum FROM room_tracks WHERE id = p_room_track_id;
+  RETURN new_sum;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+DROP_CAST_VOTE = "DROP FUNCTION IF EXISTS cast_room_track_vote(uuid, uuid, uuid, uuid, integer);"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('room_tracks', sa.Column('vote_seq', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+    op.execute(TALLY_FUNCTION)
+    # the return type changes, CREATE OR REPLACE can't do that
+    op.execute(DROP_CAST_VOTE)
+    op.execute(CAST_VOTE_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(DROP_CAST_VOTE)
+    op.execute(OLD_CAST_VOTE_FUNCTION)
+    op.execute(OLD_TALLY_FUNCTION)
+    op.drop_column('room_tracks', 'vote_seq')
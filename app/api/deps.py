@@ -1,7 +1,10 @@
-from fastapi import Header, Cookie, HTTPException, status
+from fastapi import Header, Cookie, HTTPException, Query, Request, Response, status
 from typing import Optional
 from uuid import UUID
 
+from app.infra.room_directory import RoomRef, room_directory
+from app.schemas.tracks import QueueItem
+
 async def get_current_user_id(
     x_user_id: Optional[str] = Header(default=None),  # for dev
     uid: Optional[str] = Cookie(default=None),        # cookie set by /auth/guest
@@ -19,4 +22,38 @@ async def get_current_user_id(
     try:
         return UUID(raw)
     except Exception:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user id")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user id")
+
+async def resolve_active_room(session, code: str) -> RoomRef:
+    # code -> room from the per-worker cache, one query on a miss
+    room = await room_directory.resolve(session, code)
+    if room is None or not room.is_active:
+        raise HTTPException(status_code=404, detail="Room not found or inactive")
+    return room
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    # tags the response; a 304 to send instead when the client already has this version (If-None-Match)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"  # keep the copy, but always ask first
+    sent = request.headers.get("if-none-match")
+    if sent is None:
+        return None
+    tag = etag.removeprefix("W/")
+    if sent.strip() == "*" or any(t.strip().removeprefix("W/") == tag for t in sent.split(",")):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def queue_fields(
+    fields: Optional[str] = Query(default=None, max_length=200),  # e.g. room_track_id,votes,score
+) -> Optional[tuple[str, ...]]:
+    # slim queue items for clients that already hold the track metadata; room_track_id always comes along
+    if fields is None:
+        return None
+    wanted = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = wanted - QueueItem.model_fields.keys()
+    if unknown:
+        raise HTTPException(422, f"unknown queue fields: {', '.join(sorted(unknown))}")
+    wanted.add("room_track_id")
+    return tuple(name for name in QueueItem.model_fields if name in wanted)  # model order, like full items
@@ -1,14 +1,17 @@
 from typing import Optional
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import text
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.infra.db import get_session
-from app.api.deps import get_current_user_id
+from app.infra.queue_cache import queue_cache
+from app.infra.room_events import room_events
+from app.infra.vote_buffer import vote_buffer
+from app.api.deps import get_current_user_id, not_modified, resolve_active_room
+from app.api.responses import json_response
 from app.schemas.tracks import QueueItem, QueueState
-from app.api.tracks import _compute_queue
-from app.domain.scoring import score_room_track
+from app.api.tracks import _compute_queue, _ranked_queue
+from app.domain.scoring import T_AGE, W_AGE, W_HOST, score_room_track
 from app.sql import playback as SQL_PB
 
 router = APIRouter(tags=["playback"])
@@ -21,52 +24,56 @@ async def advance_playback(
 ):
 
     # room must be active; also fetch host
-    room_row = (await session.execute(text(SQL_PB.GET_ACTIVE_ROOM_WITH_HOST), {"code": code})).mappings().first()
-    if not room_row:
-        raise HTTPException(404, "Room not found or inactive")
-    room_id = room_row["id"]
-    host_id = room_row["host_user_id"]
+    room = await resolve_active_room(session, code)
+    room_id = room.id
+    host_id = room.host_user_id
     if str(host_id) != str(user_id):
         raise HTTPException(403, "Only the host can hit next!")
 
-    # mark any current playing as played 
-    current_playing = (await session.execute(text(SQL_PB.GET_CURRENT_PLAYING), {"room_id": str(room_id)})).scalar_one_or_none()
-    if current_playing:
-        await session.execute(text(SQL_PB.MARK_PLAYED), {"room_track_id": str(current_playing)})
+    # write-behind votes from this worker count for what plays next
+    if vote_buffer.enabled:
+        await vote_buffer.flush()
 
-    # compute queue
-    queue_items = await _compute_queue(session, room_id)
-
-    now_playing: Optional[QueueItem] = None
-    if queue_items:
-        next_item = queue_items[0]
-        # set DB track status to playing
-        await session.execute(text(SQL_PB.SET_PLAYING), {"room_track_id": str(next_item.room_track_id)})
-        await session.commit()
-
-        # reflect status in response
-        now_playing = QueueItem(**next_item.model_dump())
-        now_playing.status = "playing"
-
-        #return updated queue
-        remaining = queue_items[1:]
-        return QueueState(now_playing=now_playing, queue=remaining)
-
-    # nothing left to play
+    # one transaction: lock the room (a double-tapped "next" waits here for the first one), then
+    # retire the current track and play the top-ranked one in a single statement
+    params = {"room_id": str(room_id)}
+    if (await session.execute(SQL_PB.LOCK_ROOM_FOR_ADVANCE, params)).scalar_one_or_none() is None:
+        raise HTTPException(404, "Room not found or inactive")  # closed meanwhile; the session rolls back
+    started = (await session.execute(
+        SQL_PB.ADVANCE_ROOM,
+        {**params, "now": datetime.now(timezone.utc), "w_age": W_AGE, "t_age": T_AGE, "w_host": W_HOST},
+    )).scalar_one_or_none()
     await session.commit()
-    return QueueState(now_playing=None, queue=[])
+    # every worker moves the started track from its cached queue to now playing (see app.main)
+    room_events.publish(room_id, "advanced", room_track_id=str(started) if started else None)
+
+    return json_response(QueueState.model_construct(
+        now_playing=await _load_now_playing(session, room_id),
+        queue=await _compute_queue(session, room_id),
+    ))
 
 @router.get("/rooms/{code}/now-playing", response_model=Optional[QueueItem])
 async def get_now_playing(
     code: str,
+    request: Request,
+    response: Response,
     session: AsyncSession = Depends(get_session),
 ):
-    room_row = (await session.execute(text(SQL_PB.GET_ACTIVE_ROOM_WITH_HOST), {"code": code})).mappings().first()
-    if not room_row:
-        raise HTTPException(404, "Room not found or inactive")
-    room_id = room_row["id"]
+    room_id = (await resolve_active_room(session, code)).id
+    if (unchanged := not_modified(request, response, queue_cache.etag(room_id))) is not None:
+        return unchanged
+    return json_response(await _load_now_playing(session, room_id), response)
+
+
+async def _load_now_playing(session: AsyncSession, room_id) -> Optional[QueueItem]:
+    # kept next to the room's cached queue; without the cache one keyed query
+    if queue_cache.enabled:
+        return (await _ranked_queue(session, room_id)).now_playing(datetime.now(timezone.utc))
+    return await _fetch_now_playing(session, room_id)
+
 
-    row = (await session.execute(text(SQL_PB.GET_NOW_PLAYING_DETAILS), {"room_id": str(room_id)})).mappings().first()
+async def _fetch_now_playing(session: AsyncSession, room_id) -> Optional[QueueItem]:
+    row = (await session.execute(SQL_PB.GET_NOW_PLAYING_DETAILS, {"room_id": str(room_id)})).mappings().first()
     if not row:
         return None
 
@@ -0,0 +1,46 @@
+"""JSON bytes for the hot endpoints, encoded with orjson straight from the models' fields.
+
+Same output as FastAPI's response_model path (field order, "Z" datetimes, json.dumps-style small floats);
+the response_model stays on the routes for the OpenAPI schema."""
+from typing import Optional
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+from app.schemas.tracks import QueueItem
+
+OPTIONS = orjson.OPT_UTC_Z
+
+
+def _fields(obj):
+    # called by orjson for every model it meets, nested ones included (QueueState.queue, QueueDelta.changed)
+    if not isinstance(obj, BaseModel):
+        raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+    fields = obj.__dict__
+    score = fields.get("score")
+    if score and -1e-4 < score < 1e-4:
+        return {**fields, "score": orjson.Fragment(repr(score))}
+    return fields
+
+
+def _projected(fields: tuple[str, ...]):
+    def default(obj):
+        plain = _fields(obj)
+        if isinstance(obj, QueueItem):
+            return {name: plain[name] for name in fields}
+        return plain
+    return default
+
+
+def dumps(content, fields: Optional[tuple[str, ...]] = None) -> bytes:
+    return orjson.dumps(content, default=_fields if fields is None else _projected(fields), option=OPTIONS)
+
+
+def json_response(content, response: Optional[Response] = None, fields: Optional[tuple[str, ...]] = None) -> Response:
+    # headers set on the injected `response` (ETag, X-Queue-Version, cookies) only reach the client
+    # when FastAPI builds the response itself, so carry them over
+    out = Response(dumps(content, fields), media_type="application/json")
+    if response is not None:
+        out.raw_headers.extend(h for h in response.raw_headers if h[0] not in (b"content-length", b"content-type"))
+    return out
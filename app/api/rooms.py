@@ -6,7 +6,8 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.infra.db import get_session
-from app.api.deps import get_current_user_id
+from app.api.deps import get_current_user_id, resolve_active_room
+from app.infra.room_events import room_events
 from app.domain.models import Room, RoomMember
 from app.schemas.rooms import (
     RoomCreate, RoomResp, JoinRoomReq, JoinRoomResp, RoomMemberResp
@@ -68,10 +69,7 @@ async def join_room(
     if not code:
         raise HTTPException(status_code=422, detail="code required")
 
-    room = (await session.execute(select(Room).where(Room.code == code, Room.is_active.is_(True)))).scalar_one_or_none()
-
-    if not room or not room.is_active:
-        raise HTTPException(status_code=404, detail="Room not found or inactive")
+    room = await resolve_active_room(session, code)
 
     try:
         session.add(RoomMember(room_id=room.id, user_id=user_id, role="guest"))
@@ -94,5 +92,7 @@ async def close_room(
     if room.host_user_id != user_id:
         raise HTTPException(status_code=403, detail="Only the host can close the room")
 
-    async with session.begin():
-        room.is_active = False
\ No newline at end of file
+    room.is_active = False
+    await session.commit()
+    # every worker drops the cached code -> room (and pushes the change to open streams)
+    room_events.publish(room.id, "room_closed", code=room.code)
\ No newline at end of file
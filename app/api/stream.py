@@ -0,0 +1,57 @@
+import asyncio
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import resolve_active_room
+from app.api.playback import _load_now_playing
+from app.api.tracks import _compute_queue
+from app.infra.db import AsyncSessionLocal
+from app.infra.room_hub import room_hub
+from app.schemas.tracks import QueueState
+
+router = APIRouter(tags=["stream"])
+
+KEEPALIVE_S = 15  # comment line so proxies (Fly) don't drop an idle stream
+
+
+async def build_room_state(room_id) -> str:
+    # one queue computation per change, shared by every subscriber of the room
+    async with AsyncSessionLocal() as session:
+        queue = await _compute_queue(session, room_id)
+        now_playing = await _load_now_playing(session, room_id)
+    return QueueState(now_playing=now_playing, queue=queue).model_dump_json()
+
+room_hub.snapshot = build_room_state
+
+
+def _sse(payload: str) -> str:
+    return f"event: queue\ndata: {payload}\n\n"
+
+
+@router.get("/rooms/{code}/stream")
+async def stream_room(code: str, request: Request):
+    # short-lived session: don't hold a pooled connection for the lifetime of the stream
+    async with AsyncSessionLocal() as session:
+        room_id = (await resolve_active_room(session, code)).id
+
+    async def events():
+        mailbox = room_hub.subscribe(room_id)
+        try:
+            # current state first, then only what changes
+            yield _sse(await build_room_state(room_id))
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(mailbox.get(), timeout=KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(payload)
+        finally:
+            room_hub.unsubscribe(room_id, mailbox)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,95 +1,218 @@
 from datetime import datetime, timezone
+from typing import Optional, Union
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import text
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user_id
-from app.domain.scoring import score_room_track
+from app.api.deps import get_current_user_id, not_modified, queue_fields, resolve_active_room
+from app.api.responses import json_response
+from app.domain import queue_delta
+from app.domain.ranking import RankedQueue
+from app.domain.scoring import T_AGE, W_AGE, W_HOST, epoch_seconds, score_room_tracks_batch
 from app.infra.db import get_session
-from app.schemas.tracks import AddTrackReq, QueueItem, TrackOut
+from app.infra.queue_cache import queue_cache
+from app.infra.queue_log import queue_log
+from app.infra.room_events import room_events
+from app.infra.search_index import catalog_index
+from app.infra.track_cache import track_cache
+from app.infra.vote_buffer import vote_buffer
+from app.schemas.tracks import AddTrackReq, QueueDelta, QueueItem, TrackOut
 from app.sql import tracks as SQL
 
 router = APIRouter(tags=["tracks"])
 
 @router.get("/search", response_model=list[TrackOut])
 async def search_tracks(artist_or_title: str, session: AsyncSession = Depends(get_session)):
-    rows = (await session.execute(text(SQL.SEARCH_TRACKS), {"q": f"%{artist_or_title}%"})).mappings().all()
+    hits = catalog_index.search(artist_or_title)  # None = index cold / query it can't answer, ask Postgres
+    if hits is not None:
+        return [TrackOut(**hit) for hit in hits]
+    params = {"q": f"%{artist_or_title}%", "prefix": f"{artist_or_title}%", "term": artist_or_title}
+    rows = (await session.execute(SQL.SEARCH_TRACKS, params)).mappings().all()
     return [TrackOut(**row) for row in rows] #returns list of trackout objects
     
 
-@router.get("/rooms/{code}/queue", response_model=list[QueueItem])
-async def get_queue(code: str, session: AsyncSession = Depends(get_session)):
-    room_row = (await session.execute(text(SQL.GET_ACTIVE_ROOM_BY_CODE), {"code": code})).mappings().first()
-    if not room_row:
-        raise HTTPException(404, "Room not found or inactive")
-    return await _compute_queue(session, room_row["id"])
+@router.get("/rooms/{code}/queue", response_model=Union[list[QueueItem], QueueDelta])
+async def get_queue(
+    code: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, le=500),  # e.g. the UI only shows the top 50
+    offset: int = Query(default=0, ge=0),
+    since: Optional[str] = Query(default=None, max_length=64),  # X-Queue-Version of the queue the client has
+    fields: Optional[tuple[str, ...]] = Depends(queue_fields),
+    session: AsyncSession = Depends(get_session),
+):
+    room = await resolve_active_room(session, code)
+    # unchanged since the client's last poll: no queue work at all
+    etag = queue_cache.etag(room.id, variant="+".join(fields) if fields else "")
+    if (unchanged := not_modified(request, response, etag)) is not None:
+        return unchanged
+    if since is not None:
+        if limit is not None or offset:
+            raise HTTPException(422, "since diffs the whole queue, it doesn't go with limit/offset")
+        return json_response(await _queue_since(session, room.id, since, response), response, fields)
+    if limit is None and not offset:
+        return json_response((await _versioned_queue(session, room.id, response))[1], response, fields)
+    return json_response(await _compute_queue_page(session, room.id, limit, offset), response, fields)
 
 
 @router.post("/rooms/{code}/tracks", response_model=list[QueueItem])
 async def add_track_to_room(
     code: str, 
     payload: AddTrackReq,
+    fields: Optional[tuple[str, ...]] = Depends(queue_fields),
     session: AsyncSession = Depends(get_session),
     user_id = Depends(get_current_user_id)
     ):
 
-    room_row = (await session.execute(text(SQL.GET_ACTIVE_ROOM_BY_CODE), {"code": code})).mappings().first()
-    if not room_row:
-        raise HTTPException(404, "Room not found or inactive")
-    room_id = room_row["id"]
+    room_id = (await resolve_active_room(session, code)).id
 
-    exists = await session.execute(text(SQL.TRACK_EXISTS), {"track_id": payload.track_id})
-    if exists.scalar_one_or_none() is None:
+    # through the track cache: checks the id and keeps the metadata the queue reload below needs
+    if not await track_cache.lookup(session, [payload.track_id]):
         raise HTTPException(404, "Track not found")
 
     rt_id = uuid.uuid4()
     try:
         await session.execute(
-            text(SQL.INSERT_ROOM_TRACK_IF_NOT_EXISTS),
+            SQL.INSERT_ROOM_TRACK_IF_NOT_EXISTS,
             {
                 "id": rt_id,
                 "room_id": room_id,                 
-                "track_id_ins": payload.track_id,   
-                "track_id_chk": payload.track_id,
+                "track_id": payload.track_id,
                 "user_id": user_id,
             },
         )
         await session.commit()
+        room_events.publish(room_id, "track_added")
     except IntegrityError:
         # If two inserts raced, the partial unique index will reject one.
         # Roll back and continue; the track is already queued.
         await session.rollback()
 
-    return await _compute_queue(session, room_id)
+    return json_response(await _compute_queue(session, room_id), fields=fields)
 
 
 async def _compute_queue(session: AsyncSession, room_id):
-    rows = (await session.execute(text(SQL.COMPUTE_QUEUE), {"room_id": str(room_id)})).mappings().all()
-    now = datetime.now(timezone.utc)
-    items: list[QueueItem] = []
-    created_at_by_id: dict[str, datetime] = {}
-
-    for row in rows:
-        is_host_add = str(row["added_by_user_id"]) == str(row["host_user_id"])
-        score = score_room_track(row["created_at"], int(row["votes"]), is_host_add=is_host_add, now=now)
-        item = QueueItem(
-            room_track_id=str(row["room_track_id"]),
-            track_id=row["track_id"],
-            title=row["title"],
-            artist=row["artist"],
-            duration_ms=row["duration_ms"],
-            votes=int(row["votes"]),
-            score=float(score),
-            status=str(row["status"]),
-            created_at=row["created_at"],
+    return (await _ranked_queue(session, room_id)).ranked(datetime.now(timezone.utc))
+
+
+async def _versioned_queue(session: AsyncSession, room_id, response: Response) -> tuple[str, list[QueueItem]]:
+    # the ranking and its version (X-Queue-Version), remembered so later ?since= requests can diff against it.
+    # The version is read first: a write landing meanwhile makes the answer look older than it is, never newer
+    # (replaying a diff the client partly has already is harmless)
+    version = queue_cache.version(room_id)
+    items = await _compute_queue(session, room_id)
+    if queue_log.enabled and queue_cache.version(room_id) == version and not queue_log.has(room_id, version):
+        queue_log.record(room_id, version, queue_delta.snapshot(items))
+    token = f"{queue_cache.epoch}.{version}"  # versions are per worker
+    response.headers["X-Queue-Version"] = token
+    return token, items
+
+
+async def _queue_since(session: AsyncSession, room_id, since: str, response: Response) -> QueueDelta:
+    token, items = await _versioned_queue(session, room_id, response)
+    epoch, _, version = since.partition(".")
+    base = queue_log.get(room_id, int(version)) if epoch == queue_cache.epoch and version.isdigit() else None
+    if base is None:
+        # another worker's version, or one that fell out of the log
+        return QueueDelta.model_construct(version=token, full=True, queue=items)
+    return QueueDelta.model_construct(version=token, full=False, **queue_delta.diff(base, items))
+
+
+async def _ranked_queue(session: AsyncSession, room_id) -> RankedQueue:
+    # serve from the per-room ranked queue until a write bumps the room's version
+    version = queue_cache.version(room_id)
+    ranked = queue_cache.get(room_id, version)
+    if ranked is None:
+        ranked = await _load_ranked(session, room_id)
+        queue_cache.put(room_id, version, ranked)
+    return ranked
+
+
+async def _compute_queue_page(session: AsyncSession, room_id, limit: Optional[int], offset: int):
+    # cached ranking: slice it. Otherwise let Postgres rank and page, so we only ship/build the rows asked for
+    ranked = queue_cache.get(room_id, queue_cache.version(room_id))
+    if ranked is None and vote_buffer.enabled:
+        # Postgres doesn't have the buffered votes yet, its ranking would disagree with the full queue:
+        # load (and cache) the whole ranking, which counts them
+        ranked = await _ranked_queue(session, room_id)
+    if ranked is not None:
+        end = None if limit is None else offset + limit
+        return ranked.ranked(datetime.now(timezone.utc), limit=end)[offset:]
+
+    rows = (
+        await session.execute(
+            SQL.RANKED_QUEUE,
+            {
+                "room_id": str(room_id),
+                "now": datetime.now(timezone.utc),
+                "w_age": W_AGE,
+                "t_age": T_AGE,
+                "w_host": W_HOST,
+                "limit": limit,
+                "offset": offset,
+            },
         )
-        items.append(item)
-        created_at_by_id[item.room_track_id] = row["created_at"]
+    ).mappings().all()
+    return [_queue_item(row, row["score"]) for row in rows]
+
+
+async def _load_ranked(session: AsyncSession, room_id) -> RankedQueue:
+    now = datetime.now(timezone.utc)
+    tracks = None
+    if track_cache.enabled:
+        # only the room's own rows from Postgres, title / artist / duration_ms from the track cache
+        rows, scores, order = await _load_scored_rows(session, room_id, SQL.QUEUE_ENTRIES_AND_NOW_PLAYING, now)
+        tracks = await track_cache.lookup(session, [row["track_id"] for row in rows])
+        order = [i for i in order if rows[i]["track_id"] in tracks]  # gone from the catalog: left out, like the JOIN
+    else:
+        rows, scores, order = await _load_scored_rows(session, room_id, SQL.COMPUTE_QUEUE_AND_NOW_PLAYING, now)
+
+    def item(i):
+        return _queue_item(rows[i], scores[i], None if tracks is None else tracks[rows[i]["track_id"]])
+
+    queued = [i for i in order if str(rows[i]["status"]) == "queued"]
+    ranked = RankedQueue.from_ranked(((item(i), _is_host_add(rows[i])) for i in queued), now)
+    for i in queued:
+        ranked.set_vote_seq(rows[i]["room_track_id"], rows[i]["vote_seq"])
+    playing = [i for i in order if str(rows[i]["status"]) == "playing"]
+    if playing:
+        ranked.set_now_playing(item(playing[0]), _is_host_add(rows[playing[0]]))
+    # write-behind votes this worker hasn't flushed yet aren't in Postgres
+    for rt_id, delta in vote_buffer.pending_delta(room_id).items():
+        if rt_id in ranked:
+            ranked.set_votes(rt_id, ranked.votes(rt_id) + delta)
+    return ranked
+
+
+async def _load_scored_rows(session: AsyncSession, room_id, query, now: Optional[datetime] = None):
+    rows = (await session.execute(query, {"room_id": str(room_id)})).mappings().all()
+    scores, order = score_room_tracks_batch(
+        [epoch_seconds(row["created_at"]) for row in rows],
+        [int(row["votes"]) for row in rows],
+        [_is_host_add(row) for row in rows],
+        now=now or datetime.now(timezone.utc),
+    )
+    return rows, scores.tolist(), order.tolist()
+
+
+def _is_host_add(row) -> bool:
+    return str(row["added_by_user_id"]) == str(row["host_user_id"])
+
 
-    # created_at ASC, then score DESC 
-    items.sort(key=lambda i: created_at_by_id[i.room_track_id])
-    items.sort(key=lambda i: i.score, reverse=True)
-    return items
\ No newline at end of file
+def _queue_item(row, score: float, track: Optional[tuple] = None) -> QueueItem:
+    # track: (title, artist, duration_ms) from the track cache, for rows that don't carry them
+    title, artist, duration_ms = track if track is not None else (row["title"], row["artist"], row["duration_ms"])
+    return QueueItem(
+        room_track_id=str(row["room_track_id"]),
+        track_id=row["track_id"],
+        title=title,
+        artist=artist,
+        duration_ms=duration_ms,
+        votes=int(row["votes"]),
+        score=float(score),
+        status=str(row["status"]),
+        created_at=row["created_at"],
+    )
\ No newline at end of file
@@ -1,15 +1,17 @@
 import uuid
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.infra.db import get_session
-from app.api.deps import get_current_user_id
+from app.infra.db import get_autocommit_session
+from app.api.deps import get_current_user_id, queue_fields, resolve_active_room
+from app.api.responses import json_response
 from app.schemas.votes import VoteReq
 from app.schemas.tracks import QueueItem
-from app.api.tracks import _compute_queue
+from app.api.tracks import _compute_queue, _ranked_queue
+from app.infra.room_events import room_events
+from app.infra.vote_buffer import vote_buffer
 from app.sql import votes as SQLV
-from app.sql import tracks as SQLT
 
 router = APIRouter(tags=["votes"])
 
@@ -17,7 +19,8 @@ router = APIRouter(tags=["votes"])
 async def cast_vote(
     code: str,
     payload: VoteReq,
-    session: AsyncSession = Depends(get_session),
+    fields: Optional[tuple[str, ...]] = Depends(queue_fields),
+    session: AsyncSession = Depends(get_autocommit_session),
     user_id = Depends(get_current_user_id),
 ):
     code = (code or "").strip().upper()
@@ -25,34 +28,50 @@ async def cast_vote(
         raise HTTPException(422, "value must be +1 or -1")
 
     # 1) check if room exists or is active
-    room_row = (
-        await session.execute(text(SQLT.GET_ACTIVE_ROOM_BY_CODE), {"code": code})
-    ).mappings().first()
-    if not room_row:
-        raise HTTPException(404, "Room not found or inactive")
-    room_id = room_row["id"]
-
-    # 2) check if room_track belongs to this room and is queued
-    rt_ok = (
+    room_id = (await resolve_active_room(session, code)).id
+
+    if vote_buffer.enabled:
+        return json_response(await _buffer_vote(session, room_id, payload, user_id), fields=fields)
+
+    # 2) one statement, committed on its own: track queued in this room? upsert the vote, read the new tally
+    tally = (
         await session.execute(
-            text(SQLV.GET_ROOM_TRACK_IN_ROOM),
-            {"room_track_id": str(payload.room_track_id), "room_id": str(room_id)},
+            SQLV.CAST_VOTE,
+            {
+                "id": str(uuid.uuid4()),
+                "room_track_id": str(payload.room_track_id),
+                "room_id": str(room_id),
+                "user_id": str(user_id),
+                "value": int(payload.value),
+            },
         )
-    ).scalar_one_or_none()
-    if rt_ok is None:
+    ).first()
+    if tally is None:
         raise HTTPException(404, "Track not in this room (or not queueable)")
+    # carry the new tally so every worker can move just this track in its ranked queue
+    _publish_vote(room_id, payload, user_id, tally.votes, seq=tally.vote_seq)
+
+    # 3) return updated queue (normally the cached ranking the vote event just patched, no query)
+    return json_response(await _compute_queue(session, room_id), fields=fields)
+
+
+async def _buffer_vote(session: AsyncSession, room_id, payload: VoteReq, user_id):
+    # write-behind (VOTE_WRITE_BEHIND): the cached ranking decides what's votable and holds the tally,
+    # the vote reaches the votes table with the next batch flush
+    ranked = await _ranked_queue(session, room_id)
+    current = ranked.votes(payload.room_track_id)
+    if current is None:
+        raise HTTPException(404, "Track not in this room (or not queueable)")
+    votes = await vote_buffer.add(session, room_id, payload.room_track_id, user_id, int(payload.value), current)
+    _publish_vote(room_id, payload, user_id, votes)
+    return await _compute_queue(session, room_id)
+
 
-    # 3) upsert the vote
-    await session.execute(
-        text(SQLV.UPSERT_VOTE),
-        {
-            "id": str(uuid.uuid4()),
-            "room_track_id": str(payload.room_track_id),
-            "user_id": str(user_id),
-            "value": int(payload.value),
-        },
-    )
-    await session.commit()
-
-    # 4) return updated queue
-    return await _compute_queue(session, room_id)
\ No newline at end of file
+def _publish_vote(room_id, payload: VoteReq, user_id, votes: int, seq: Optional[int] = None) -> None:
+    # user_id/value keep other workers' write-behind ballots current.
+    # seq (vote_seq) only when the tally comes from Postgres; buffered tallies apply as they arrive
+    data = {"room_track_id": str(payload.room_track_id), "votes": int(votes), "user_id": str(user_id),
+            "value": int(payload.value)}
+    if seq is not None:
+        data["seq"] = int(seq)
+    room_events.publish(room_id, "vote", **data)
\ No newline at end of file
@@ -3,6 +3,7 @@ from enum import Enum as PyEnum
 import uuid
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     CheckConstraint,
     DateTime,
@@ -15,7 +16,7 @@ from sqlalchemy import (
     text,
     func,
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, ExcludeConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.infra.db import Base
@@ -58,6 +59,9 @@ class Track(Base):
     __table_args__ = (
         Index("ix_tracks_title", "title"),
         Index("ix_tracks_artist", "artist"),
+        # trigram GIN indexes so '%q%' search doesn't scan the whole catalog (needs pg_trgm)
+        Index("ix_tracks_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_tracks_artist_trgm", "artist", postgresql_using="gin", postgresql_ops={"artist": "gin_trgm_ops"}),
     )
 
 class TrackStatus(PyEnum):
@@ -74,6 +78,11 @@ class RoomTrack(Base):
     added_by_user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     status: Mapped[TrackStatus] = mapped_column(SAEnum(TrackStatus, name="track_status"), nullable=False, server_default=text("'queued'::track_status"))    
     created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # denormalized vote tally, kept in step with the votes table by the trg_votes_tally trigger
+    vote_sum: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    vote_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    # bumped with every tally change, orders "vote" events between workers
+    vote_seq: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
    
     __table_args__ = (
         Index("ix_room_tracks_room_id", "room_id"),
@@ -85,6 +94,13 @@ class RoomTrack(Base):
             postgresql_where=(status == TrackStatus.queued)  # condition for partial index
         ),
         Index("ix_room_tracks_room_status","room_id","status"),  #index to speed up filtering queued tracks for a room
+        ExcludeConstraint(
+            ("room_id", "="),
+            name="ex_room_one_playing",
+            using="btree",
+            where=(status == TrackStatus.playing),  # at most one playing track per room
+            deferrable=True, initially="DEFERRED",  # checked at commit, ADVANCE_ROOM swaps both rows in one statement
+        ),
     )
 
 class Vote(Base):
@@ -0,0 +1,55 @@
+"""Queue diffs for GET queue?since=<version>: inserted / changed / removed tracks (and the new order
+whenever something changed or moved) between a Snapshot the client has and the current ranking.
+
+apply() is the client side of diff()."""
+from typing import NamedTuple
+
+from app.schemas.tracks import QueueChange, QueueItem
+
+
+class Snapshot(NamedTuple):
+    order: tuple[str, ...]
+    state: dict[str, tuple[int, float, str]]  # room_track_id -> (votes, score, status)
+
+
+def snapshot(items: list[QueueItem]) -> Snapshot:
+    return Snapshot(
+        tuple(item.room_track_id for item in items),
+        {item.room_track_id: (item.votes, item.score, item.status) for item in items},
+    )
+
+
+def diff(base: Snapshot, items: list[QueueItem]) -> dict:
+    current = [item.room_track_id for item in items]
+    present = set(current)
+    inserted, changed = [], []
+    for item in items:
+        old = base.state.get(item.room_track_id)
+        if old is None:
+            inserted.append(item)
+        elif old != (item.votes, item.score, item.status):
+            changed.append(QueueChange(room_track_id=item.room_track_id, votes=item.votes, score=item.score, status=item.status))
+    kept = [rt_id for rt_id in base.order if rt_id in present]
+    return {
+        "inserted": inserted,
+        "changed": changed,
+        "removed": [rt_id for rt_id in base.order if rt_id not in present],
+        # a copy served later at the same version can be ordered differently from the logged snapshot (scores drift
+        # with the age bonus), so once anything changed the client gets the order rather than keeping its own
+        "order": current if changed or current != kept else None,
+    }
+
+
+def apply(queue: list[dict], delta: dict) -> list[dict]:
+    # replays a QueueDelta (as JSON) onto the queue the client holds, what the web app would do
+    if delta["full"]:
+        return delta["queue"]
+    by_id = {item["room_track_id"]: item for item in queue}
+    for rt_id in delta["removed"]:
+        by_id.pop(rt_id, None)
+    for change in delta["changed"]:
+        by_id[change["room_track_id"]] = {**by_id[change["room_track_id"]], **change}
+    for item in delta["inserted"]:
+        by_id[item["room_track_id"]] = item
+    order = delta["order"] or [item["room_track_id"] for item in queue if item["room_track_id"] in by_id]
+    return [by_id[rt_id] for rt_id in order]
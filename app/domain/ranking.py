@@ -0,0 +1,169 @@
+"""A room's queue kept in ranked order (score DESC, created_at ASC) between requests.
+
+Tracks older than t_age ("settled") only move when votes do and live in a sorted list;
+"fresh" ones are re-scored on each read and merged in. The room's now-playing track rides along."""
+import bisect
+import heapq
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from app.domain.scoring import T_AGE, score_room_track
+from app.schemas.tracks import QueueItem
+
+
+class RankedQueue:
+    def __init__(self, items: Iterable[tuple[QueueItem, bool]] = (), now: Optional[datetime] = None, t_age: int = T_AGE):
+        self.t_age = t_age
+        self._entries: dict[str, tuple[QueueItem, bool]] = {}  # room_track_id -> (item, is_host_add)
+        self._settled: list[tuple] = []                         # sorted (-score, created_at, room_track_id)
+        self._settled_keys: dict[str, tuple] = {}
+        self._fresh: list[tuple[datetime, str]] = []            # sorted (created_at, room_track_id)
+        self._vote_seqs: dict[str, int] = {}                    # room_track_id -> vote_seq of the tally we hold
+        self._now_playing: Optional[tuple[QueueItem, bool]] = None
+        now = now or datetime.now(timezone.utc)
+        for item, is_host_add in items:
+            self.add(item, is_host_add, now)
+
+    @classmethod
+    def from_ranked(cls, items: Iterable[tuple[QueueItem, bool]], now: datetime, t_age: int = T_AGE) -> "RankedQueue":
+        # items scored as of `now` and already in ranked order (score_room_tracks_batch's): settled tracks keep the
+        # score they came with (bonus maxed, the same one _settle_one computes) and nothing is re-scored or insorted
+        ranked = cls(t_age=t_age)
+        cutoff = now - timedelta(seconds=t_age)
+        for item, is_host_add in items:
+            if item.created_at.tzinfo is None:
+                item = item.model_copy(update={"created_at": item.created_at.replace(tzinfo=timezone.utc)})
+            key = item.room_track_id
+            ranked._entries[key] = (item, is_host_add)
+            if item.created_at <= cutoff:
+                sort_key = (-item.score, item.created_at, key)
+                ranked._settled_keys[key] = sort_key
+                ranked._settled.append(sort_key)
+            else:
+                ranked._fresh.append((item.created_at, key))
+        # in order already but for exact (score, created_at) ties, which the keys break by id: near-free sorts
+        ranked._settled.sort()
+        ranked._fresh.sort()
+        return ranked
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, room_track_id) -> bool:
+        return str(room_track_id) in self._entries
+
+    def add(self, item: QueueItem, is_host_add: bool, now: Optional[datetime] = None) -> None:
+        now = now or datetime.now(timezone.utc)
+        if item.created_at.tzinfo is None:
+            item = item.model_copy(update={"created_at": item.created_at.replace(tzinfo=timezone.utc)})
+        self.remove(item.room_track_id)
+        self._entries[item.room_track_id] = (item, is_host_add)
+        if now - item.created_at >= timedelta(seconds=self.t_age):
+            self._settle_one(item.room_track_id)
+        else:
+            bisect.insort(self._fresh, (item.created_at, item.room_track_id))
+
+    def remove(self, room_track_id) -> bool:
+        key = str(room_track_id)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._vote_seqs.pop(key, None)
+        sort_key = self._settled_keys.pop(key, None)
+        if sort_key is not None:
+            del self._settled[bisect.bisect_left(self._settled, sort_key)]
+        else:
+            del self._fresh[bisect.bisect_left(self._fresh, (entry[0].created_at, key))]
+        return True
+
+    def votes(self, room_track_id) -> Optional[int]:
+        entry = self._entries.get(str(room_track_id))
+        return None if entry is None else entry[0].votes
+
+    def set_vote_seq(self, room_track_id, seq: int) -> None:
+        if str(room_track_id) in self._entries:
+            self._vote_seqs[str(room_track_id)] = int(seq)
+
+    def set_votes(self, room_track_id, votes: int, seq: Optional[int] = None) -> bool:
+        # seq (room_tracks.vote_seq) orders tallies from different workers: one older than ours is ignored
+        key = str(room_track_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if seq is not None:
+            if seq <= self._vote_seqs.get(key, -1):
+                return True  # arrived late, what we hold is newer
+            self._vote_seqs[key] = int(seq)
+        item, is_host_add = entry
+        self._entries[key] = (item.model_copy(update={"votes": int(votes)}), is_host_add)
+        if key in self._settled_keys:
+            del self._settled[bisect.bisect_left(self._settled, self._settled_keys.pop(key))]
+            self._settle_one(key)
+        return True
+
+    def set_now_playing(self, item: Optional[QueueItem], is_host_add: bool = False) -> None:
+        self._now_playing = None if item is None else (item, is_host_add)
+
+    def now_playing(self, now: Optional[datetime] = None) -> Optional[QueueItem]:
+        if self._now_playing is None:
+            return None
+        item, is_host_add = self._now_playing
+        # scored like the queue (the age bonus keeps growing while it plays)
+        score = float(score_room_track(item.created_at, item.votes, is_host_add=is_host_add, t_age=self.t_age,
+                                       now=now or datetime.now(timezone.utc)))
+        return item.model_copy(update={"score": score})
+
+    def play(self, room_track_id) -> bool:
+        # an advance started room_track_id (None: the queue ran dry). False = not ours to patch, reload
+        if room_track_id is None:
+            if self._entries:
+                return False
+            self._now_playing = None
+            return True
+        entry = self._entries.get(str(room_track_id))
+        if entry is None:
+            return False
+        self.remove(room_track_id)
+        item, is_host_add = entry
+        self._now_playing = (item.model_copy(update={"status": "playing"}), is_host_add)
+        return True
+
+    def ranked(self, now: Optional[datetime] = None, limit: Optional[int] = None) -> list[QueueItem]:
+        now = now or datetime.now(timezone.utc)
+        self._settle(now)
+
+        fresh = []
+        for created_at, key in self._fresh:
+            item, is_host_add = self._entries[key]
+            score = float(score_room_track(created_at, item.votes, is_host_add=is_host_add, t_age=self.t_age, now=now))
+            fresh.append((-score, created_at, key, item.model_copy(update={"score": score})))
+        fresh.sort(key=lambda f: f[:3])
+
+        settled = ((k[0], k[1], k[2], self._entries[k[2]][0]) for k in self._settled)
+        merged = heapq.merge(fresh, settled, key=lambda f: f[:3])
+        out: list[QueueItem] = []
+        for *_, item in merged:
+            if limit is not None and len(out) >= limit:
+                break
+            out.append(item)
+        return out
+
+    def _settle(self, now: datetime) -> None:
+        # fresh tracks whose age bonus just maxed out move over to the settled list
+        cutoff = now - timedelta(seconds=self.t_age)
+        n = bisect.bisect_right(self._fresh, (cutoff, "\uffff"))
+        if not n:
+            return
+        done, self._fresh = self._fresh[:n], self._fresh[n:]
+        for _, key in done:
+            self._settle_one(key)
+
+    def _settle_one(self, key: str) -> None:
+        item, is_host_add = self._entries[key]
+        # same function as the per-row path, evaluated once the bonus is maxed, so scores match bit for bit
+        score = float(score_room_track(item.created_at, item.votes, is_host_add=is_host_add, t_age=self.t_age,
+                                       now=item.created_at + timedelta(seconds=self.t_age)))
+        self._entries[key] = (item.model_copy(update={"score": score}), is_host_add)
+        sort_key = (-score, item.created_at, key)
+        self._settled_keys[key] = sort_key
+        bisect.insort(self._settled, sort_key)
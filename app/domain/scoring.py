@@ -1,7 +1,14 @@
 from datetime import datetime, timezone
 
+import numpy as np
+
+# defaults shared by the Python scorers and the SQL ranking (app.sql.tracks.QUEUE_SCORE)
+W_AGE = 0.25
+T_AGE = 600
+W_HOST = 0.1
+
 def score_room_track(created_at, votes_sum: int, is_host_add: bool=False,
-                     w_age=0.25, t_age=600, w_host=0.1, now=None) -> float:
+                     w_age=W_AGE, t_age=T_AGE, w_host=W_HOST, now=None) -> float:
     """
     votes_sum: net (+1/-1)
     w_age: weight for age bonus; reaches full after t_age seconds
@@ -17,3 +24,40 @@ def score_room_track(created_at, votes_sum: int, is_host_add: bool=False,
     age_bonus = w_age * min(age / t_age, 1.0)
     host_bonus = w_host if is_host_add else 0.0
     return votes_sum + age_bonus + host_bonus
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def epoch_seconds(dt) -> float:
+    # naive datetimes are UTC, same as score_room_track
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - EPOCH).total_seconds()
+
+
+def score_room_tracks_batch(created_at_s, votes_sum, is_host_add, now=None,
+                            w_age=W_AGE, t_age=T_AGE, w_host=W_HOST):
+    """
+    Column version of score_room_track for a whole queue in one pass (NumPy).
+    created_at_s: epoch seconds per track (see epoch_seconds)
+    votes_sum / is_host_add: one entry per track
+    now: datetime or epoch seconds, shared by every row
+
+    Returns (scores, order): order indexes the input by score DESC, created_at ASC,
+    ties keeping input order, i.e. exactly what the per-row path's two stable sorts produce.
+    """
+    now = now or datetime.now(timezone.utc)
+    now_s = now if isinstance(now, (int, float)) else epoch_seconds(now)
+
+    # work in whole microseconds like timedelta does, so ages (and scores) match the per-row path bit for bit
+    created_us = np.rint(np.asarray(created_at_s, dtype=np.float64) * 1e6).astype(np.int64)
+    now_us = np.int64(round(now_s * 1e6))
+    age = (now_us - created_us) / 1e6
+
+    age_bonus = w_age * np.minimum(age / t_age, 1.0)
+    host_bonus = np.where(np.asarray(is_host_add, dtype=bool), w_host, 0.0)
+    scores = np.asarray(votes_sum, dtype=np.int64) + age_bonus + host_bonus
+
+    # lexsort: last key is primary -> score DESC, then created_at ASC, then input position
+    order = np.lexsort((np.arange(len(scores)), created_us, -scores))
+    return scores, order
@@ -0,0 +1,113 @@
+"""Response compression (br / gzip) as a plain ASGI middleware.
+
+JSON / text bodies of at least COMPRESS_MIN_BYTES get the first COMPRESSION encoding the client accepts
+(br needs the `brotli` package); streaming responses pass through untouched."""
+import gzip
+import logging
+import os
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+
+from app.infra.metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION = [e.strip() for e in os.getenv("COMPRESSION", "br,gzip").split(",") if e.strip()]
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+bytes_in = registry.register(Counter("http_compression_input_bytes_total", "Response bytes before compression",
+                                     ["encoding"]))
+bytes_out = registry.register(Counter("http_compression_output_bytes_total", "Response bytes after compression",
+                                      ["encoding"]))
+
+
+def encoders(names: list[str], gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY) -> dict:
+    # encoding -> compress(body), in order of preference
+    out = {}
+    for name in names:
+        if name == "br":
+            try:
+                import brotli
+            except ImportError:
+                logger.warning("COMPRESSION lists br but the brotli package isn't installed, skipping it")
+                continue
+            out["br"] = lambda body: brotli.compress(body, quality=brotli_quality)
+        elif name == "gzip":
+            out["gzip"] = lambda body: gzip.compress(body, compresslevel=gzip_level, mtime=0)
+        else:
+            logger.warning("unknown COMPRESSION encoding %r, skipping it", name)
+    return out
+
+
+def compressible(headers: MutableHeaders) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(("application/json", "text/")) and not content_type.startswith("text/event-stream")
+
+
+class CompressionMiddleware:
+    def __init__(self, app, encodings: Optional[list[str]] = None, min_bytes: int = COMPRESS_MIN_BYTES, **levels):
+        self.app = app
+        self.encoders = encoders(COMPRESSION if encodings is None else encodings, **levels)
+        self.min_bytes = min_bytes
+        self._counters = {name: (bytes_in.labels(encoding=name), bytes_out.labels(encoding=name)) for name in self.encoders}
+
+    def choose(self, accept_encoding: str) -> Optional[str]:
+        # ours in our order of preference; the client's q-values only count for saying no (q=0)
+        accepted = {}
+        for part in accept_encoding.lower().split(","):
+            name, _, params = part.partition(";")
+            q = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            accepted[name.strip()] = q
+        for name in self.encoders:
+            if accepted.get(name, accepted.get("*", 0.0)) > 0:
+                return name
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encoders:
+            await self.app(scope, receive, send)
+            return
+
+        accept = next((value for key, value in scope["headers"] if key == b"accept-encoding"), None)
+        encoding = self.choose(accept.decode("latin-1")) if accept else None
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message  # held until the body shows whether it's worth it
+                return
+            if start is None:
+                await send(message)
+                return
+            first, start = start, None
+            headers = MutableHeaders(raw=list(first.get("headers", ())))
+            if message["type"] != "http.response.body" or message.get("more_body") or not compressible(headers):
+                await send(first)
+                await send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            if encoding is not None and len(body) >= self.min_bytes:
+                compressed = self.encoders[encoding](body)
+                counter_in, counter_out = self._counters[encoding]
+                counter_in.inc(len(body))
+                counter_out.inc(len(compressed))
+                body = compressed
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+            await send({**first, "headers": headers.raw})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
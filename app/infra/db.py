@@ -1,14 +1,18 @@
 import os
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import uuid
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
+from app.infra.db_pool import PoolMetrics, PoolSettings, create_pooled_engine
 from app.infra.db_url import load_db_url
+from app.infra.metrics import registry
 
 load_dotenv() 
 
 """
 DATABASE_URL → reads the env variable , map to Postgres
-create_async_engine(...) → creates the engine, which is the gateway between SQLAlchemy and Postgres DB.
+create_pooled_engine(...) → creates the engine, which is the gateway between SQLAlchemy and Postgres DB
+  (pool sized and pre-pinged per DB_POOL_* / DB_PRE_PING, see app.infra.db_pool, metrics on GET /metrics).
 AsyncSessionLocal → a “factory” that creates sessions (conversations with the DB).
 Base = declarative_base() → a parent class that all models (tables) inherit from.
 get_session() → a FastAPI dependency to automatically give a session inside request handlers.
@@ -17,16 +21,38 @@ get_session() → a FastAPI dependency to automatically give a session inside re
 # Build the normalized async URL (works locally and on Fly)
 DATABASE_URL = load_db_url(for_async=True)
 
-engine = create_async_engine(
+# asyncpg prepares every statement; SQLAlchemy keeps the last DB_STATEMENT_CACHE_SIZE of them per
+# connection, so the app's fixed set of queries (app.sql) is parsed and planned once per connection.
+# Behind PgBouncer in transaction mode set DB_PGBOUNCER=true: statement names become unique (no clashes
+# between clients sharing a server connection) and asyncpg's own cache is off. PgBouncer >= 1.21 with
+# max_prepared_statements > 0 keeps the per-connection cache working; older versions need DB_STATEMENT_CACHE_SIZE=0.
+STATEMENT_ARGS = {"prepared_statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))}
+if os.getenv("DB_PGBOUNCER", "false").lower() == "true":
+    STATEMENT_ARGS.update(statement_cache_size=0, prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__")
+
+pool_settings = PoolSettings.from_env()
+pool_metrics = PoolMetrics().register(registry)
+
+engine = create_pooled_engine(
     DATABASE_URL,
-    echo=os.getenv("SQL_ECHO", "false").lower() == "true", # if SQL_ECHO is set to "true", the engine will log all SQL statements it runs (for debug)
-    pool_pre_ping=True, # enables a connection health check (ping), runs a lightweight test query (aka SELECT 1) right before giving the connection to the app
-    connect_args={"ssl": False},   # tell asyncpg: no TLS
+    pool_settings,
+    pool_metrics,
+    echo=os.getenv("SQL_ECHO", "false").lower() == "true", # if SQL_ECHO is set to "true", the engine will log all SQL statements it runs (for debug; SQL_TRACE for named, timed ones)
+    connect_args={"ssl": False, **STATEMENT_ARGS},   # tell asyncpg: no TLS
 )
 
 AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+# same pool, but every statement commits on its own: no BEGIN/COMMIT round trips
+# for endpoints that write with a single statement (POST /votes)
+autocommit_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+
 Base = declarative_base()
 
 async def get_session():
     async with AsyncSessionLocal() as session:
+        yield session
+
+async def get_autocommit_session():
+    async with AsyncSessionLocal(bind=autocommit_engine) as session:
         yield session
\ No newline at end of file
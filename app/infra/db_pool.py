@@ -0,0 +1,155 @@
+"""Connection pool settings (DB_POOL_*, DB_PRE_PING) and instrumentation for the async engine.
+
+DB_PRE_PING=always|idle|never: ping on every checkout, only after DB_PRE_PING_IDLE_S idle seconds, or not at all."""
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.infra.metrics import Counter, Gauge, Histogram, Registry
+
+CHECKOUT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = -1
+    pre_ping: str = "always"  # always | idle | never
+    pre_ping_idle_s: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        settings = cls(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "-1")),
+            pre_ping=os.getenv("DB_PRE_PING", "always").lower(),
+            pre_ping_idle_s=float(os.getenv("DB_PRE_PING_IDLE_S", "30")),
+        )
+        if settings.pre_ping not in ("always", "idle", "never"):
+            raise ValueError(f"DB_PRE_PING must be always, idle or never, not {settings.pre_ping!r}")
+        return settings
+
+
+class PoolMetrics:
+    def __init__(self, prefix: str = "db_pool"):
+        self.pool = None  # set by create_pooled_engine, read by the gauges at scrape time
+        self.checkouts = Counter(f"{prefix}_checkouts_total", "Connections handed out by the pool")
+        self.checkout_seconds = Histogram(
+            f"{prefix}_checkout_seconds", "Time to get a connection: waiting for a free one, connecting, pre-ping",
+            buckets=CHECKOUT_BUCKETS,
+        )
+        self.timeouts = Counter(f"{prefix}_checkout_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT")
+        self.overflow_checkouts = Counter(f"{prefix}_overflow_checkouts_total", "Checkouts made while more than DB_POOL_SIZE connections were out")
+        self.opened = Counter(f"{prefix}_connections_opened_total", "New connections to Postgres")
+        self.closed = Counter(f"{prefix}_connections_closed_total", "Connections closed (recycled, overflow returned, disposed)")
+        self.invalidated = Counter(f"{prefix}_connections_invalidated_total", "Connections found broken and thrown away")
+        self.pings = Counter(f"{prefix}_pings_total", "Pre-pings of idle connections (DB_PRE_PING=idle)", ["result"])
+        self.size = Gauge(f"{prefix}_size", "Configured pool size", fn=lambda: self.pool.size() if self.pool else 0)
+        self.checked_out = Gauge(f"{prefix}_checked_out", "Connections in use right now",
+                                 fn=lambda: self.pool.checkedout() if self.pool else 0)
+        self.overflow = Gauge(f"{prefix}_overflow", "Overflow connections open right now",
+                              fn=lambda: max(self.pool.overflow(), 0) if self.pool else 0)
+
+    def register(self, registry: Registry) -> "PoolMetrics":
+        for metric in (self.checkouts, self.checkout_seconds, self.timeouts, self.overflow_checkouts, self.opened,
+                       self.closed, self.invalidated, self.pings, self.size, self.checked_out, self.overflow):
+            registry.register(metric)
+        return self
+
+    def stats(self) -> dict:
+        return {
+            "checkouts": int(self.checkouts.value()),
+            "checkout_p50_ms": self.checkout_seconds.quantile(0.5) * 1000,
+            "checkout_p99_ms": self.checkout_seconds.quantile(0.99) * 1000,
+            "timeouts": int(self.timeouts.value()),
+            "overflow_checkouts": int(self.overflow_checkouts.value()),
+            "opened": int(self.opened.value()),
+            "closed": int(self.closed.value()),
+            "invalidated": int(self.invalidated.value()),
+        }
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    # AsyncAdaptedQueuePool that times every checkout
+    metrics: PoolMetrics = None
+
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.metrics.timeouts.inc()
+            raise
+        finally:
+            self.metrics.checkout_seconds.observe(time.perf_counter() - t0)
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool, keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        self.metrics.pool = pool
+        return pool
+
+
+def create_pooled_engine(url: str, settings: PoolSettings, metrics: PoolMetrics, **kwargs) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pre_ping == "always",
+        **kwargs,
+    )
+    pool = engine.sync_engine.pool
+    pool.metrics = metrics
+    metrics.pool = pool
+    dialect = engine.dialect
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _opened(dbapi_connection, record):
+        metrics.opened.inc()
+
+    @event.listens_for(engine.sync_engine, "close")
+    def _closed(dbapi_connection, record):
+        metrics.closed.inc()
+
+    @event.listens_for(engine.sync_engine, "invalidate")
+    def _invalidated(dbapi_connection, record, exception):
+        metrics.invalidated.inc()
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _checkin(dbapi_connection, record):
+        if record is not None:
+            record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _checkout(dbapi_connection, record, proxy):
+        metrics.checkouts.inc()
+        p = metrics.pool
+        if p is not None and p.checkedout() > p.size():
+            metrics.overflow_checkouts.inc()
+        if settings.pre_ping != "idle":
+            return
+        checked_in_at = record.info.get("checked_in_at")  # none yet = brand new connection
+        if checked_in_at is None or time.monotonic() - checked_in_at < settings.pre_ping_idle_s:
+            return
+        try:
+            dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            metrics.pings.inc(result="failed")
+            logging.info("Idle pooled connection failed its ping, reconnecting: %s", e)
+            raise exc.DisconnectionError() from e  # the pool drops it and checks out another
+        metrics.pings.inc(result="ok")
+
+    return engine
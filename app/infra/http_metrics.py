@@ -0,0 +1,75 @@
+"""Per-route request metrics for GET /metrics, as a plain ASGI middleware.
+
+Routes are labelled with their template, never the raw path; SSE streams are counted but kept out of
+the latency histogram. METRICS_ENABLED=false turns recording off."""
+import os
+import time
+
+from app.infra.metrics import Counter, Gauge, Histogram, registry
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))  # anything else is "other"
+
+requests_total = registry.register(Counter("http_requests_total", "HTTP requests by route, method and status",
+                                           ["route", "method", "status"]))
+request_seconds = registry.register(Histogram("http_request_duration_seconds", "Time to the end of the response body",
+                                              ["route", "method"]))
+in_flight = registry.register(Gauge("http_requests_in_flight", "Requests being handled right now")).labels()
+
+
+class MetricsMiddleware:
+    def __init__(self, app, enabled: bool = METRICS_ENABLED):
+        self.app = app
+        self.enabled = enabled
+        self._series: dict = {}  # (endpoint, method, status) -> (counter child, histogram child)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # nothing sent = the app blew up
+        streaming = False
+
+        async def send_and_watch(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for key, value in message.get("headers", ()):
+                    if key == b"content-type" and value.startswith(b"text/event-stream"):
+                        streaming = True
+            await send(message)
+
+        in_flight.inc(1)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_and_watch)
+        finally:
+            elapsed = time.perf_counter() - t0
+            in_flight.inc(-1)
+            method = scope["method"]
+            key = (scope.get("endpoint"), method if method in METHODS else "other", status)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = self._bind(scope, key)
+            series[0].inc()
+            if not streaming:
+                series[1].observe(elapsed)
+
+    def _bind(self, scope, key):
+        # once per endpoint / method / status: bind the metric series, then a request is a few in-place increments
+        endpoint, method, status = key
+        route = route_template(scope)
+        return (requests_total.labels(route=route, method=method, status=status),
+                request_seconds.labels(route=route, method=method))
+
+
+def route_template(scope) -> str:
+    # the router leaves the matched endpoint in the scope, not the route itself
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    for r in getattr(scope.get("app"), "routes", ()):
+        if getattr(r, "endpoint", None) is endpoint:
+            return r.path
+    return "unmatched"
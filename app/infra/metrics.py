@@ -0,0 +1,165 @@
+"""Just enough of a Prometheus client for GET /metrics: counters, gauges and histograms, per worker process.
+
+    checkouts = registry.register(Counter("db_pool_checkouts_total", "Connections handed out"))
+    checkouts.inc()
+"""
+import bisect
+import math
+from typing import Callable, Iterable, Optional
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, float] = {} if self.labelnames else {(): 0.0}  # unlabelled: report 0 from the start
+        self.fn = fn  # read at scrape time (e.g. a cache's own hit count or pool.checkedout), for unlabelled series
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.labelnames), 0.0)
+
+    def labels(self, **labels) -> "_CounterChild":
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        self._values.setdefault(key, 0.0)
+        return _CounterChild(self._values, key)
+
+    def lines(self) -> Iterable[str]:
+        if self.fn is not None:
+            yield f"{self.name} {_num(self.fn())}"
+            return
+        for key, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, key)} {_num(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self._values[tuple(str(labels[n]) for n in self.labelnames)] = float(value)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def labels(self, **labels) -> "_HistogramChild":
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        return _HistogramChild(self.buckets, series)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels[n]) for n in self.labelnames))
+        return series[2] if series else 0
+
+    def quantile(self, q: float, **labels) -> float:
+        # upper bound of the bucket holding the q-th observation (what histogram_quantile would say, roughly)
+        series = self._series.get(tuple(str(labels[n]) for n in self.labelnames))
+        if not series or not series[2]:
+            return 0.0
+        rank, seen = q * series[2], 0
+        for bound, n in zip(self.buckets + (math.inf,), series[0]):
+            seen += n
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def lines(self) -> Iterable[str]:
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = 'le="' + _num(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_num(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {count}"
+
+
+class _CounterChild:
+    # one series of a labelled counter/gauge, the label tuple already built
+    __slots__ = ("_values", "_key")
+
+    def __init__(self, values: dict, key: tuple):
+        self._values = values
+        self._key = key
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._values[self._key] += amount
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_series")
+
+    def __init__(self, buckets: tuple, series: list):
+        self._buckets = buckets
+        self._series = series
+
+    def observe(self, value: float) -> None:
+        series = self._series
+        series[0][bisect.bisect_left(self._buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        out: list[str] = []
+        for metric in self._metrics.values():
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(metric.lines())
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
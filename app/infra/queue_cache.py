@@ -0,0 +1,121 @@
+"""Per-room cache of the ranked queue (a RankedQueue, see app.domain.ranking).
+
+Writes call bump(room_id) after they commit, which moves the room to a new version and drops (or, with
+apply=fn, patches) its entry. QUEUE_CACHE_SIZE rooms, QUEUE_CACHE_TTL_S expiry; etag() turns the version
+into an HTTP validator for the polled GETs."""
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+from app.infra.metrics import Counter, Gauge, registry
+
+
+class QueueCache:
+    def __init__(self, max_rooms: int = 1024, ttl_s: float = 30.0, etag_window_s: float = 30.0, clock=time.monotonic):
+        self.max_rooms = max_rooms
+        self.ttl_s = ttl_s
+        self.etag_window_s = etag_window_s
+        self.epoch = secrets.token_hex(4)  # this process's versions
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[int, float, object]] = OrderedDict()  # room -> (version, expires_at, value)
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        self._seq = 0  # versions come from one global counter so a forgotten room can never reuse an old number
+        self._floor = 0  # version of every room not in _versions: at least as new as anything forgotten
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_rooms > 0
+
+    def version(self, room_id) -> int:
+        return self._versions.get(str(room_id), self._floor)
+
+    def bump(self, room_id, apply=None) -> int:
+        key = str(room_id)
+        self._seq += 1
+        self._versions[key] = self._seq
+        self._versions.move_to_end(key)
+        # versions are tiny, keep a lot more of them than queues
+        while len(self._versions) > max(self.max_rooms, 1) * 8:
+            self._floor = max(self._floor, self._versions.popitem(last=False)[1])
+        entry = self._entries.get(key)
+        if entry is not None and apply is not None and apply(entry[2]):
+            self._entries[key] = (self._seq, entry[1], entry[2])  # patched in place, still current
+        else:
+            self._entries.pop(key, None)
+        return self._seq
+
+    def clear(self) -> None:
+        # forget everything (e.g. we may have missed events from other workers)
+        for key in list(self._versions):
+            self._seq += 1
+            self._versions[key] = self._seq
+        self._seq += 1
+        self._floor = self._seq  # rooms we don't track move on too
+        self._entries.clear()
+
+    def get(self, room_id, version: int):
+        if not self.enabled:
+            return None
+        key = str(room_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        if entry[1] <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, room_id, version: int, value) -> None:
+        if not self.enabled:
+            return
+        key = str(room_id)
+        # a write landed while we were computing, this result is already stale
+        if self.version(key) != version:
+            return
+        self._entries[key] = (version, self._clock() + self.ttl_s, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_rooms:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def etag(self, room_id, variant: str = "") -> str:
+        # weak: the same tag covers responses whose scores differ by a window's worth of age bonus.
+        # variant tells apart different bodies of one version (e.g. a ?fields= projection)
+        window = int(time.time() // self.etag_window_s) if self.etag_window_s > 0 else 0
+        suffix = f".{variant}" if variant else ""
+        return f'W/"{self.epoch}.{self.version(room_id)}.{window}{suffix}"'
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "rooms": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+queue_cache = QueueCache(
+    max_rooms=int(os.getenv("QUEUE_CACHE_SIZE", "1024")),
+    ttl_s=float(os.getenv("QUEUE_CACHE_TTL_S", "30")),
+    etag_window_s=float(os.getenv("QUEUE_ETAG_WINDOW_S", "30")),
+)
+
+registry.register(Gauge("queue_cache_rooms", "Rooms with a cached ranked queue", fn=lambda: queue_cache.stats()["rooms"]))
+registry.register(Counter("queue_cache_hits_total", "Queue reads answered from the cache", fn=lambda: queue_cache.hits))
+registry.register(Counter("queue_cache_misses_total", "Queue reads that recomputed the ranking",
+                          fn=lambda: queue_cache.misses))
+registry.register(Gauge("queue_cache_hit_ratio", "Share of queue reads answered from the cache",
+                        fn=lambda: queue_cache.stats()["hit_ratio"]))
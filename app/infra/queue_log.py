@@ -0,0 +1,48 @@
+"""Per-room log of the last QUEUE_DELTA_VERSIONS queue snapshots this worker served, for GET queue?since=<version>."""
+import os
+from collections import OrderedDict
+
+
+class QueueLog:
+    def __init__(self, versions_per_room: int = 8, max_rooms: int = 256):
+        self.versions_per_room = versions_per_room
+        self.max_rooms = max_rooms
+        self._rooms: OrderedDict[str, OrderedDict[int, object]] = OrderedDict()  # room -> version -> snapshot
+
+    @property
+    def enabled(self) -> bool:
+        return self.versions_per_room > 0 and self.max_rooms > 0
+
+    def has(self, room_id, version: int) -> bool:
+        versions = self._rooms.get(str(room_id))
+        return versions is not None and version in versions
+
+    def get(self, room_id, version: int):
+        versions = self._rooms.get(str(room_id))
+        if versions is None:
+            return None
+        self._rooms.move_to_end(str(room_id))
+        return versions.get(version)
+
+    def record(self, room_id, version: int, snapshot) -> None:
+        if not self.enabled:
+            return
+        key = str(room_id)
+        versions = self._rooms.get(key)
+        if versions is None:
+            versions = self._rooms[key] = OrderedDict()
+        self._rooms.move_to_end(key)
+        versions.setdefault(version, snapshot)  # first ranking served at a version is the one on record
+        while len(versions) > self.versions_per_room:
+            versions.popitem(last=False)
+        while len(self._rooms) > self.max_rooms:
+            self._rooms.popitem(last=False)
+
+    def forget(self, room_id) -> None:
+        self._rooms.pop(str(room_id), None)
+
+
+queue_log = QueueLog(
+    versions_per_room=int(os.getenv("QUEUE_DELTA_VERSIONS", "8")),
+    max_rooms=int(os.getenv("QUEUE_DELTA_ROOMS", "256")),
+)
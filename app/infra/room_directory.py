@@ -0,0 +1,125 @@
+"""Room code -> (room_id, host_user_id, is_active), cached per worker (ROOM_CACHE_SIZE, ROOM_CACHE_TTL_S).
+
+Unknown codes aren't cached; closed rooms are dropped on the "room_closed" event (see app.main)."""
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from app.infra.metrics import Counter, Gauge, registry
+from app.sql import rooms as SQL
+
+
+class _LookupCancelled(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class RoomRef:
+    id: uuid.UUID
+    host_user_id: uuid.UUID
+    is_active: bool
+
+
+class RoomDirectory:
+    def __init__(self, max_rooms: int = 4096, ttl_s: float = 300.0, clock=time.monotonic):
+        self.max_rooms = max_rooms
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, RoomRef]] = OrderedDict()  # code -> (expires_at, room)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._generation = 0  # bumped on every invalidation, a lookup that raced one isn't cached
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_rooms > 0
+
+    async def resolve(self, session, code: str) -> Optional[RoomRef]:
+        entry = self._entries.get(code)
+        if entry is not None:
+            if entry[0] > self._clock():
+                self._entries.move_to_end(code)
+                self.hits += 1
+                return entry[1]
+            del self._entries[code]
+
+        pending = self._inflight.get(code)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except _LookupCancelled:
+                pass  # the request doing the lookup went away, do our own
+
+        self.misses += 1
+        if code in self._inflight:
+            return await self._load(session, code)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[code] = future
+        generation = self._generation
+        try:
+            room = await self._load(session, code)
+        except BaseException as e:
+            # waiters share a real error (no point retrying a failing query N times), a cancelled lookup they redo
+            future.set_exception(e if isinstance(e, Exception) else _LookupCancelled())
+            future.exception()  # retrieved: nobody waiting is fine
+            raise
+        finally:
+            self._inflight.pop(code, None)
+        future.set_result(room)
+        if room is not None and self.enabled and generation == self._generation:
+            self._entries[code] = (self._clock() + self.ttl_s, room)
+            self._entries.move_to_end(code)
+            while len(self._entries) > self.max_rooms:
+                self._entries.popitem(last=False)
+        return room
+
+    async def _load(self, session, code: str) -> Optional[RoomRef]:
+        row = (await session.execute(SQL.GET_ROOM_BY_CODE, {"code": code})).mappings().first()
+        if row is None:
+            return None
+        return RoomRef(id=row["id"], host_user_id=row["host_user_id"], is_active=row["is_active"])
+
+    def invalidate(self, code: Optional[str] = None, room_id=None) -> None:
+        self._generation += 1
+        if code is not None:
+            self._entries.pop(code, None)
+        if room_id is not None:
+            for key in [k for k, (_, room) in self._entries.items() if str(room.id) == str(room_id)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "rooms": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+room_directory = RoomDirectory(
+    max_rooms=int(os.getenv("ROOM_CACHE_SIZE", "4096")),
+    ttl_s=float(os.getenv("ROOM_CACHE_TTL_S", "300")),
+)
+
+registry.register(Gauge("room_directory_rooms", "Room codes cached by this worker", fn=lambda: room_directory.stats()["rooms"]))
+registry.register(Counter("room_directory_hits_total", "Room lookups answered from memory",
+                          fn=lambda: room_directory.hits))
+registry.register(Counter("room_directory_misses_total", "Room lookups that queried Postgres",
+                          fn=lambda: room_directory.misses))
+registry.register(Counter("room_directory_coalesced_total", "Room lookups that waited on another request's query",
+                          fn=lambda: room_directory.coalesced))
+registry.register(Gauge("room_directory_hit_ratio", "Share of room lookups answered from memory",
+                        fn=lambda: room_directory.stats()["hit_ratio"]))
@@ -0,0 +1,281 @@
+"""Room change events shared by every worker, over ROOM_EVENTS_BACKEND=postgres|redis|memory.
+
+publish() runs the local handlers right away and hands the event to the backend for everyone else.
+If the backend connection drops, handlers get a local "resync" once it is back; if the outbox overflows,
+the other workers get one once it drains."""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+CHANNEL = "room_events"
+
+
+@dataclass
+class RoomEvent:
+    room_id: str
+    kind: str = "changed"  # vote | track_added | advanced | room_closed | resync | tracks_added (catalog, room "*") ...
+    origin: str = ""       # which process published it
+    data: dict = field(default_factory=dict)
+
+    def encode(self) -> str:
+        return json.dumps({"room_id": self.room_id, "kind": self.kind, "origin": self.origin, "data": self.data})
+
+    @classmethod
+    def decode(cls, raw) -> "RoomEvent":
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        d = json.loads(raw)
+        return cls(room_id=d["room_id"], kind=d.get("kind", "changed"), origin=d.get("origin", ""), data=d.get("data") or {})
+
+
+Handler = Callable[[RoomEvent], None]
+
+
+class RoomEventBus:
+    name = "base"
+
+    def __init__(self, outbox_size: int = 10_000):
+        self.origin = uuid.uuid4().hex
+        self._handlers: list[Handler] = []
+        self._outbox_size = outbox_size
+        self._outbox: Optional[asyncio.Queue] = None
+        self._sender: Optional[asyncio.Task] = None
+        self._reconnecting: Optional[asyncio.Task] = None
+        self._overflowed = False  # an event didn't fit in the outbox, the other workers missed it
+        self.published = 0
+        self.received = 0
+        self.send_errors = 0
+        self.reconnects = 0
+
+    def subscribe(self, handler: Handler) -> None:
+        self._handlers.append(handler)
+
+    async def start(self) -> None:
+        self._outbox = asyncio.Queue(maxsize=self._outbox_size)
+        try:
+            await self._connect()
+        except Exception:
+            logging.exception("Room event bus (%s) failed to connect, retrying in the background", self.name)
+            self._schedule_reconnect()
+        self._sender = asyncio.create_task(self._send_loop())
+
+    async def stop(self, drain_s: float = 2.0) -> None:
+        # let already published events go out first (scripts publish right before exiting)
+        if self._outbox is not None and self._sender is not None:
+            try:
+                await asyncio.wait_for(self._outbox.join(), drain_s)
+            except asyncio.TimeoutError:
+                logging.warning("Room event bus (%s) stopped with %d unsent events", self.name, self._outbox.qsize())
+        for task in (self._sender, self._reconnecting):
+            if task is not None:
+                task.cancel()
+        self._sender = self._reconnecting = None
+        self._outbox = None
+        try:
+            await self._close()
+        except Exception:
+            logging.exception("Room event bus (%s) failed to close cleanly", self.name)
+
+    def publish(self, room_id, kind: str = "changed", **data) -> None:
+        event = RoomEvent(room_id=str(room_id), kind=kind, origin=self.origin, data=data)
+        self._dispatch(event)
+        self.published += 1
+        if self._outbox is None:
+            return  # not started (scripts, tests): local delivery only
+        try:
+            self._outbox.put_nowait(event.encode())
+        except asyncio.QueueFull:
+            self.send_errors += 1
+            self._overflowed = True
+            logging.warning("Room event outbox full, dropping event for room %s (peers resync once it drains)", event.room_id)
+
+    # --- backend hooks ---
+    async def _connect(self) -> None:
+        pass
+
+    async def _close(self) -> None:
+        pass
+
+    async def _send(self, raw: str) -> None:
+        pass
+
+    # --- shared plumbing ---
+    def _receive(self, raw) -> None:
+        try:
+            event = RoomEvent.decode(raw)
+        except Exception:
+            logging.exception("Bad room event payload: %r", raw)
+            return
+        if event.origin == self.origin:
+            return  # our own echo, already handled locally in publish()
+        self.received += 1
+        self._dispatch(event)
+
+    def _dispatch(self, event: RoomEvent) -> None:
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception:
+                logging.exception("Room event handler failed for %s", event)
+
+    async def _send_loop(self) -> None:
+        while True:
+            raw = await self._outbox.get()
+            try:
+                await self._send(raw)
+                if self._overflowed and self._outbox.empty():
+                    # like a lost connection, but it's the other workers that missed events: they start over
+                    self._overflowed = False
+                    raw = RoomEvent(room_id="*", kind="resync", origin=self.origin).encode()
+                    await self._send(raw)
+            except Exception:
+                if RoomEvent.decode(raw).kind == "resync":
+                    self._overflowed = True  # try again after the next event
+                self.send_errors += 1
+                logging.exception("Room event bus (%s) failed to send", self.name)
+                self._schedule_reconnect()
+            finally:
+                self._outbox.task_done()
+
+    def _schedule_reconnect(self) -> None:
+        if self._reconnecting is None or self._reconnecting.done():
+            self._reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 0.5
+        while True:
+            try:
+                await self._close()
+            except Exception:
+                pass
+            try:
+                await self._connect()
+                break
+            except Exception:
+                logging.warning("Room event bus (%s) reconnect failed, retrying in %.1fs", self.name, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+        self.reconnects += 1
+        # events published while we were gone are lost: tell local handlers to start over
+        self._dispatch(RoomEvent(room_id="*", kind="resync", origin=self.origin))
+
+
+class LocalChannel:
+    """Stand-in for the network: every InMemoryBus on the same channel sees the others' events."""
+
+    def __init__(self):
+        self.buses: list["InMemoryBus"] = []
+
+
+class InMemoryBus(RoomEventBus):
+    name = "memory"
+
+    def __init__(self, channel: Optional[LocalChannel] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.channel = channel or LocalChannel()
+        self.channel.buses.append(self)
+
+    async def _send(self, raw: str) -> None:
+        for bus in self.channel.buses:
+            bus._receive(raw)
+
+
+class PostgresBus(RoomEventBus):
+    name = "postgres"
+
+    def __init__(self, url=None, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url  # sqlalchemy URL, defaults to the app engine's
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        import asyncpg
+        from app.infra.db import engine
+
+        # dedicated connection: LISTEN pins it, so it must not come out of the request pool
+        url = self.url or engine.url
+        self._conn = await asyncpg.connect(
+            user=url.username, password=url.password, host=url.host, port=url.port,
+            database=url.database, ssl=False,  # same as the engine's connect_args
+        )
+        await self._conn.add_listener(CHANNEL, self._on_notify)
+        self._conn.add_termination_listener(lambda conn: self._schedule_reconnect())
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        self._receive(payload)
+
+    async def _send(self, raw: str) -> None:
+        if self._conn is None:
+            raise ConnectionError("not connected")
+        async with self._lock:  # asyncpg runs one query at a time per connection
+            await self._conn.execute("SELECT pg_notify($1, $2)", CHANNEL, raw)
+
+    async def _close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            await conn.close(timeout=5)
+
+
+class RedisBus(RoomEventBus):
+    name = "redis"
+
+    def __init__(self, url: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self._client = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def _connect(self) -> None:
+        import redis.asyncio as aioredis
+
+        self._client = aioredis.from_url(self.url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(CHANNEL)
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self) -> None:
+        try:
+            async for message in self._pubsub.listen():
+                if message.get("type") == "message":
+                    self._receive(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("Room event bus (redis) lost its subscription")
+            self._schedule_reconnect()
+
+    async def _send(self, raw: str) -> None:
+        if self._client is None:
+            raise ConnectionError("not connected")
+        await self._client.publish(CHANNEL, raw)
+
+    async def _close(self) -> None:
+        reader, self._reader = self._reader, None
+        if reader is not None and reader is not asyncio.current_task():
+            reader.cancel()
+        pubsub, self._pubsub = self._pubsub, None
+        client, self._client = self._client, None
+        if pubsub is not None:
+            await pubsub.aclose()
+        if client is not None:
+            await client.aclose()
+
+
+def make_bus(backend: Optional[str] = None) -> RoomEventBus:
+    backend = (backend or os.getenv("ROOM_EVENTS_BACKEND", "postgres")).lower()
+    if backend == "postgres":
+        return PostgresBus()
+    if backend == "redis":
+        return RedisBus()
+    if backend == "memory":
+        return InMemoryBus()
+    raise RuntimeError(f"Unknown ROOM_EVENTS_BACKEND={backend!r} (expected postgres, redis or memory)")
+
+
+room_events = make_bus()
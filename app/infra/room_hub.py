@@ -0,0 +1,74 @@
+"""Per-room fan-out for GET /rooms/{code}/stream: one snapshot per change, dropped into every listener's mailbox.
+
+Mailboxes keep only the latest snapshot, so a slow client skips straight to the newest state."""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+Snapshot = Callable[[str], Awaitable[str]]
+
+
+class RoomHub:
+    def __init__(self, snapshot: Optional[Snapshot] = None):
+        self.snapshot = snapshot  # async (room_id) -> serialized payload, wired up by app.api.stream
+        self._subs: dict[str, set[asyncio.Queue]] = {}
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self._dirty: set[str] = set()
+        self.snapshots_built = 0
+        self.messages_sent = 0
+
+    def subscribe(self, room_id) -> asyncio.Queue:
+        mailbox: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subs.setdefault(str(room_id), set()).add(mailbox)
+        return mailbox
+
+    def unsubscribe(self, room_id, mailbox: asyncio.Queue) -> None:
+        key = str(room_id)
+        subs = self._subs.get(key)
+        if subs is None:
+            return
+        subs.discard(mailbox)
+        if not subs:
+            del self._subs[key]
+
+    def subscribers(self, room_id) -> int:
+        return len(self._subs.get(str(room_id), ()))
+
+    def notify(self, room_id) -> None:
+        key = str(room_id)
+        if key not in self._subs or self.snapshot is None:
+            return
+        # a refresh is already running: make it go around once more instead of starting another
+        if key in self._refreshing:
+            self._dirty.add(key)
+            return
+        self._refreshing[key] = asyncio.create_task(self._refresh(key))
+
+    def notify_all(self) -> None:
+        for key in list(self._subs):
+            self.notify(key)
+
+    def broadcast(self, room_id, payload: str) -> None:
+        for mailbox in self._subs.get(str(room_id), ()):
+            if mailbox.full():
+                mailbox.get_nowait()  # drop the stale snapshot, keep the newest
+            mailbox.put_nowait(payload)
+            self.messages_sent += 1
+
+    async def _refresh(self, key: str) -> None:
+        try:
+            while True:
+                self._dirty.discard(key)
+                payload = await self.snapshot(key)
+                self.snapshots_built += 1
+                self.broadcast(key, payload)
+                if key not in self._dirty or key not in self._subs:
+                    break
+        except Exception:
+            logging.exception("Failed to push room update for %s", key)
+        finally:
+            self._refreshing.pop(key, None)
+            self._dirty.discard(key)
+
+
+room_hub = RoomHub()
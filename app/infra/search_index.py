@@ -0,0 +1,221 @@
+"""Optional in-memory trigram index over Track.title / Track.artist for GET /tracks/search.
+
+search() returns None whenever SQL should answer instead: index cold or over SEARCH_INDEX_MAX_MB,
+short or wildcard queries, or more than max_ranked matches. SEARCH_INDEX=false turns it off."""
+import asyncio
+import heapq
+import logging
+import os
+import re
+import sys
+from array import array
+from itertools import islice
+from typing import Optional
+
+
+from app.sql import tracks as SQL
+
+_WORDS = re.compile(r"[^\W_]+")
+
+
+def substring_grams(s: str) -> set[str]:
+    s = s.lower()
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def pg_trigrams(s: str) -> set[str]:
+    # pg_trgm's trigrams: lowercased alphanumeric words, padded with two spaces in front and one behind
+    grams = set()
+    for word in _WORDS.findall(s.lower()):
+        w = f"  {word} "
+        grams.update(w[i:i + 3] for i in range(len(w) - 2))
+    return grams
+
+
+def similarity(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    # pg_trgm returns a real (float4), round the same way so ties fall back to title like in SQL
+    return array("f", [shared / (len(a) + len(b) - shared)])[0]
+
+
+class CatalogIndex:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_ranked: int = 5000, limit: int = 20, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.max_ranked = max_ranked
+        self.limit = limit
+        self.enabled = enabled
+        self.ready = False
+        self.over_budget = False
+        self.hits = 0
+        self.fallbacks = 0
+        self._building = False
+        self._build_again = False
+        self._pending: list[str] = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: list[str] = []
+        self._titles: list[str] = []
+        self._artists: list[str] = []
+        self._durations = array("i")
+        self._doc_by_id: dict[str, int] = {}
+        self._postings: dict[str, array] = {}
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, track_id: str, title: str, artist: str, duration_ms: int) -> bool:
+        if self.over_budget:
+            return False
+        doc = self._doc_by_id.get(track_id)
+        if doc is None:
+            doc = len(self._ids)
+            self._doc_by_id[track_id] = doc
+            self._ids.append(track_id)
+            self._titles.append(title)
+            self._artists.append(artist)
+            self._durations.append(duration_ms)
+            self.bytes += sys.getsizeof(track_id) + sys.getsizeof(title) + sys.getsizeof(artist) + 3 * 8 + 4 + 100
+        else:
+            # updated track: stale postings are harmless, every candidate is re-checked against the real text
+            self._titles[doc], self._artists[doc], self._durations[doc] = title, artist, duration_ms
+
+        for gram in substring_grams(title) | substring_grams(artist):
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("I")
+                self.bytes += sys.getsizeof(gram) + 64 + 100  # key + empty array + dict slot
+            postings.append(doc)
+            self.bytes += postings.itemsize
+
+        if self.bytes > self.max_bytes:
+            logging.warning("Catalog search index over its %d MB budget, searching in SQL instead", self.max_bytes >> 20)
+            self.over_budget = True
+            self.ready = False
+            self._reset()
+            return False
+        return True
+
+    def search(self, q: str) -> Optional[list[dict]]:
+        term = (q or "").lower()
+        if not self.ready or len(term) < 3 or any(c in term for c in "%_\\"):
+            self.fallbacks += 1
+            return None
+
+        lists = []
+        for gram in substring_grams(term):
+            postings = self._postings.get(gram)
+            if postings is None:
+                self.hits += 1
+                return []  # some trigram of the query appears nowhere
+            lists.append(postings)
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for postings in lists[1:]:
+            # the substring check below is exact anyway, stop once walking long lists costs more than it saves
+            if len(candidates) <= 256 or len(postings) > 16 * len(candidates):
+                break
+            candidates.intersection_update(postings)
+
+        titles, artists = self._titles, self._artists
+        # one match past max_ranked is enough to know SQL takes this one, don't verify the rest
+        matches = list(islice(
+            (d for d in candidates if term in titles[d].lower() or term in artists[d].lower()), self.max_ranked + 1
+        ))
+        if len(matches) > self.max_ranked:
+            self.fallbacks += 1
+            return None  # too broad to rank here, the GIN index does it better
+
+        prefixed = {d for d in matches if titles[d].lower().startswith(term) or artists[d].lower().startswith(term)}
+        if len(prefixed) >= self.limit:
+            matches = prefixed  # enough prefix hits to fill the page, nothing else can make the cut
+        q_grams = pg_trigrams(q)
+
+        def rank(d):
+            score = max(similarity(pg_trigrams(titles[d]), q_grams), similarity(pg_trigrams(artists[d]), q_grams))
+            # ties on similarity go by casefolded title: close to the database collation's ORDER BY title,
+            # not identical (punctuation, accents), so equally similar tracks may come in another order than SQL's
+            return (d not in prefixed, -score, titles[d].casefold(), self._ids[d])
+
+        self.hits += 1
+        return [
+            {"id": self._ids[d], "title": titles[d], "artist": artists[d], "duration_ms": self._durations[d]}
+            for d in heapq.nsmallest(self.limit, matches, key=rank)
+        ]
+
+    async def build(self, session_factory) -> None:
+        if not self.enabled:
+            return
+        if self._building:
+            self._build_again = True  # the running build may have read the catalog before this change
+            return
+        self._building = True
+        try:
+            while True:
+                self._build_again = False
+                await self._build_once(session_factory)
+                if not self._build_again:
+                    break
+            # tracks added while we were building may have missed the snapshot
+            pending, self._pending = self._pending, []
+            if pending:
+                await self.add_from_db(session_factory, pending)
+        except Exception:
+            logging.exception("Failed to build the catalog search index, searching in SQL")
+        finally:
+            self._building = False
+
+    async def _build_once(self, session_factory) -> None:
+        fresh = CatalogIndex(self.max_bytes, self.max_ranked, self.limit)
+        async with session_factory() as session:
+            result = await session.stream(SQL.ALL_TRACKS)
+            n = 0
+            async for row in result:
+                if not fresh.add(row.id, row.title, row.artist, row.duration_ms):
+                    break
+                n += 1
+                if n % 2000 == 0:
+                    await asyncio.sleep(0)  # don't hog the event loop while building
+        # swap in the finished index in one go; searches used SQL meanwhile
+        self._ids, self._titles, self._artists = fresh._ids, fresh._titles, fresh._artists
+        self._durations, self._doc_by_id, self._postings = fresh._durations, fresh._doc_by_id, fresh._postings
+        self.bytes, self.over_budget = fresh.bytes, fresh.over_budget
+        self.ready = not fresh.over_budget
+        logging.info("Catalog search index: %d tracks, %.1f MB%s", len(self), self.bytes / 2**20,
+                     " (over budget, disabled)" if self.over_budget else "")
+
+    async def add_from_db(self, session_factory, track_ids: list[str]) -> None:
+        if self._building:
+            self._pending.extend(track_ids)
+            return
+        if not self.ready or not track_ids:
+            return
+        try:
+            async with session_factory() as session:
+                rows = (await session.execute(SQL.TRACKS_BY_IDS, {"ids": list(track_ids)})).all()
+        except Exception:
+            logging.exception("Failed to load added tracks into the search index, rebuilding it")
+            await self.build(session_factory)
+            return
+        for row in rows:
+            self.add(row.id, row.title, row.artist, row.duration_ms)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "tracks": len(self),
+            "trigrams": len(self._postings),
+            "mb": round(self.bytes / 2**20, 2),
+            "over_budget": self.over_budget,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+        }
+
+
+catalog_index = CatalogIndex(
+    max_bytes=int(float(os.getenv("SEARCH_INDEX_MAX_MB", "64")) * 2**20),
+    enabled=os.getenv("SEARCH_INDEX", "true").lower() == "true",
+)
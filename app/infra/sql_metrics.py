@@ -0,0 +1,83 @@
+"""Per-statement timings for the app's named queries (app.sql constants), from the engine's cursor events.
+
+    install(engine)  # once per engine, app.main does it for app.infra.db.engine
+"""
+import importlib
+import pkgutil
+import time
+
+from sqlalchemy import event
+from sqlalchemy.sql.elements import TextClause
+
+import app.sql
+from app.infra.metrics import Counter, Histogram, registry
+
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+statement_seconds = registry.register(Histogram("sql_statement_duration_seconds", "Statement execution time by app.sql name",
+                                                ["statement"], buckets=SQL_BUCKETS))
+statement_errors = registry.register(Counter("sql_statement_errors_total", "Statements that raised, by app.sql name",
+                                             ["statement"]))
+
+_names: dict[int, str] = {}  # id(TextClause) -> "module.CONSTANT"; the clauses live as long as their modules
+
+
+def _load_names() -> None:
+    for info in pkgutil.iter_modules(app.sql.__path__):
+        module = importlib.import_module(f"app.sql.{info.name}")
+        for attr, value in vars(module).items():
+            if isinstance(value, TextClause):
+                _names[id(value)] = f"{info.name}.{attr}"
+
+
+def statement_name(statement) -> str:
+    if not _names:
+        _load_names()
+    name = _names.get(id(statement))
+    if name is not None:
+        return name
+    if isinstance(statement, TextClause) or statement is None:
+        return "other"
+    return f"orm.{getattr(statement, '__visit_name__', 'other')}"
+
+
+_series: dict = {}  # name -> bound histogram child
+
+
+def _name(context) -> str:
+    # invoked_statement is what the caller passed to execute (compiled.statement may be a cached twin)
+    return statement_name(getattr(context, "invoked_statement", None)) if context is not None else "other"
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.sql_started = time.perf_counter()
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "sql_started", None)
+    if started is None:
+        return
+    name = _name(context)
+    series = _series.get(name)
+    if series is None:
+        series = _series[name] = statement_seconds.labels(statement=name)
+    series.observe(time.perf_counter() - started)
+
+
+def _error(exception_context):
+    statement_errors.inc(statement=_name(exception_context.execution_context))
+
+
+def install(engine) -> None:
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before)
+    event.listen(sync_engine, "after_cursor_execute", _after)
+    event.listen(sync_engine, "handle_error", _error)
+
+
+def uninstall(engine) -> None:
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.remove(sync_engine, "before_cursor_execute", _before)
+    event.remove(sync_engine, "after_cursor_execute", _after)
+    event.remove(sync_engine, "handle_error", _error)
@@ -0,0 +1,155 @@
+"""Structured SQL tracing, off unless SQL_TRACE=true.
+
+Statements become TraceRecords (name, duration, rows, route, room) handed to `sinks`; slow ones are logged
+and a SQL_EXPLAIN_SAMPLE share of slow SELECTs is re-run under EXPLAIN ANALYZE in a rolled-back transaction."""
+import asyncio
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy import event
+
+from app.infra.http_metrics import route_template
+from app.infra.metrics import Counter, registry
+from app.infra.sql_metrics import statement_name
+
+SQL_TRACE = os.getenv("SQL_TRACE", "false").lower() == "true"
+SLOW_MS = float(os.getenv("SQL_SLOW_MS", "200"))
+EXPLAIN_SAMPLE = float(os.getenv("SQL_EXPLAIN_SAMPLE", "0.1"))
+EXPLAIN_INTERVAL_S = float(os.getenv("SQL_EXPLAIN_INTERVAL_S", "60"))
+
+log = logging.getLogger("app.sql_trace")
+slow_statements = registry.register(Counter("sql_slow_statements_total", "Statements slower than SQL_SLOW_MS (SQL_TRACE=true)",
+                                            ["statement"]))
+
+request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+
+@dataclass
+class TraceRecord:
+    statement: str  # app.sql name, "orm.<kind>" or "other"
+    duration_ms: float
+    rows: int  # -1 when the driver doesn't say
+    route: Optional[str]  # None outside a request (startup, background flushes)
+    room: Optional[str]  # room code or id from the path, if the route has one
+    sql: str
+    slow: bool
+    plan: Optional[str] = None  # EXPLAIN output, only on the (sampled) slow record it was captured for
+
+
+def log_record(record: TraceRecord) -> None:
+    fields = {"sql_trace": vars(record)}
+    if record.plan is not None:
+        log.warning("slow statement %s %.1f ms, %d rows (%s room=%s)\n%s", record.statement, record.duration_ms,
+                    record.rows, record.route, record.room, record.plan, extra=fields)
+    elif record.slow:
+        log.warning("slow statement %s %.1f ms, %d rows (%s room=%s)", record.statement, record.duration_ms,
+                    record.rows, record.route, record.room, extra=fields)
+    elif log.isEnabledFor(logging.DEBUG):
+        log.debug("statement %s %.1f ms, %d rows (%s room=%s)", record.statement, record.duration_ms,
+                  record.rows, record.route, record.room, extra=fields)
+
+
+sinks: list[Callable[[TraceRecord], None]] = [log_record]
+
+
+class TraceContextMiddleware:
+    # remembers the request's scope for the statements it runs; the router fills in endpoint and path
+    # params later, in the same dict, so they're there by the time a statement is traced
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
+
+
+class SqlTracer:
+    def __init__(self, engine, slow_ms: float = SLOW_MS, explain_sample: float = EXPLAIN_SAMPLE,
+                 explain_interval_s: float = EXPLAIN_INTERVAL_S):
+        self.engine = engine
+        self.slow_ms = slow_ms
+        self.explain_sample = explain_sample
+        self.explain_interval_s = explain_interval_s
+        self._explaining = None  # the running EXPLAIN task
+        self._explained_at: dict[str, float] = {}  # statement -> monotonic time of its last EXPLAIN
+
+    def install(self) -> "SqlTracer":
+        sync_engine = self.engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._before)
+        event.listen(sync_engine, "after_cursor_execute", self._after)
+        return self
+
+    def uninstall(self) -> None:
+        sync_engine = self.engine.sync_engine
+        event.remove(sync_engine, "before_cursor_execute", self._before)
+        event.remove(sync_engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.trace_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "trace_started", None)
+        if started is None:
+            return
+        ms = (time.perf_counter() - started) * 1000
+        scope = request_scope.get()
+        path_params = scope.get("path_params", {}) if scope is not None else {}
+        record = TraceRecord(
+            statement=statement_name(getattr(context, "invoked_statement", None)),
+            duration_ms=ms,
+            rows=cursor.rowcount if cursor is not None else -1,
+            route=route_template(scope) if scope is not None else None,
+            room=str(path_params.get("code") or path_params.get("room_id") or "") or None,
+            sql=statement,
+            slow=ms >= self.slow_ms,
+        )
+        if record.slow:
+            slow_statements.inc(statement=record.statement)
+            if not executemany and self._should_explain(record):
+                self._explaining = asyncio.get_running_loop().create_task(self._explain(record, parameters))
+                return  # logged with its plan once EXPLAIN is back
+        for sink in sinks:
+            sink(record)
+
+    def _should_explain(self, record: TraceRecord) -> bool:
+        if self.explain_sample <= 0 or random.random() >= self.explain_sample:
+            return False
+        if self._explaining is not None and not self._explaining.done():
+            return False
+        if not record.sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            return False  # writes aren't re-run, not even in a rolled back transaction
+        now = time.monotonic()
+        if now - self._explained_at.get(record.statement, -self.explain_interval_s) < self.explain_interval_s:
+            return False
+        self._explained_at[record.statement] = now
+        return True
+
+    async def _explain(self, record: TraceRecord, parameters) -> None:
+        try:
+            async with self.engine.connect() as conn:
+                raw = (await conn.get_raw_connection()).driver_connection
+                tx = raw.transaction(readonly=True)
+                await tx.start()
+                try:
+                    rows = await raw.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {record.sql}", *(parameters or ()))
+                finally:
+                    await tx.rollback()
+            record.plan = "\n".join(row[0] for row in rows)
+        except Exception as e:
+            # e.g. a CTE that writes, or FOR UPDATE: a read-only transaction refuses them
+            log.info("EXPLAIN of %s failed: %s", record.statement, e)
+        for sink in sinks:
+            sink(record)
+
@@ -0,0 +1,130 @@
+"""Per-worker cache of track metadata: track_id -> (title, artist, duration_ms).
+
+Queue loads read only room_tracks and take the titles from here. TRACK_CACHE_SIZE tracks (0 turns it off),
+warmed with the TRACK_CACHE_WARM most queued ones."""
+import logging
+import os
+import sys
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from app.infra.metrics import Gauge, registry
+from app.sql import tracks as SQL
+
+ENTRY_OVERHEAD = 100  # OrderedDict slot + its link node, besides the key and the value
+
+
+def _size(track_id: str, entry: tuple) -> int:
+    title, artist, duration_ms = entry
+    return (sys.getsizeof(track_id) + sys.getsizeof(entry) + sys.getsizeof(title) + sys.getsizeof(artist)
+            + sys.getsizeof(duration_ms) + ENTRY_OVERHEAD)
+
+
+class TrackCache:
+    def __init__(self, max_tracks: int = 50_000):
+        self.max_tracks = max_tracks
+        self._entries: OrderedDict[str, tuple[str, str, int]] = OrderedDict()
+        self._generation = 0  # bumped on every invalidation, a lookup that raced one doesn't store its rows
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_tracks > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, track_id: str) -> Optional[tuple[str, str, int]]:
+        entry = self._entries.get(track_id)
+        if entry is not None:
+            self._entries.move_to_end(track_id)
+        return entry
+
+    def put(self, track_id: str, title: str, artist: str, duration_ms: int) -> None:
+        if not self.enabled:
+            return
+        old = self._entries.pop(track_id, None)
+        if old is not None:
+            self.bytes -= _size(track_id, old)
+        entry = (title, artist, duration_ms)
+        self._entries[track_id] = entry
+        self.bytes += _size(track_id, entry)
+        while len(self._entries) > self.max_tracks:
+            key, evicted = self._entries.popitem(last=False)
+            self.bytes -= _size(key, evicted)
+            self.evictions += 1
+
+    async def lookup(self, session, track_ids: Iterable[str]) -> dict[str, tuple[str, str, int]]:
+        # metadata of every id that exists, missing ones in one query; unknown ids are left out
+        found, missing = {}, set()
+        for track_id in track_ids:
+            if track_id in found or track_id in missing:
+                continue
+            entry = self.get(track_id)
+            if entry is None:
+                missing.add(track_id)
+            else:
+                found[track_id] = entry
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            generation = self._generation
+            rows = (await session.execute(SQL.TRACKS_BY_IDS, {"ids": list(missing)})).all()
+            for row in rows:
+                found[row.id] = (row.title, row.artist, row.duration_ms)
+            if generation == self._generation:
+                for row in rows:
+                    self.put(row.id, row.title, row.artist, row.duration_ms)
+        return found
+
+    async def warm(self, session_factory, limit: int) -> None:
+        if not self.enabled or limit <= 0:
+            return
+        generation = self._generation
+        try:
+            async with session_factory() as session:
+                rows = (await session.execute(SQL.MOST_QUEUED_TRACKS, {"limit": min(limit, self.max_tracks)})).all()
+        except Exception:
+            logging.exception("Failed to warm the track cache, it fills up as queues are loaded")
+            return
+        if generation != self._generation:
+            return
+        for row in rows:
+            self.put(row.id, row.title, row.artist, row.duration_ms)
+        logging.info("Track cache warmed with %d tracks (~%.1f MB)", len(rows), self.bytes / 2**20)
+
+    def forget(self, track_ids: Iterable[str]) -> None:
+        self._generation += 1
+        for track_id in track_ids:
+            entry = self._entries.pop(track_id, None)
+            if entry is not None:
+                self.bytes -= _size(track_id, entry)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "tracks": len(self._entries),
+            "mb": round(self.bytes / 2**20, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+track_cache = TrackCache(max_tracks=int(os.getenv("TRACK_CACHE_SIZE", "50000")))
+TRACK_CACHE_WARM = int(os.getenv("TRACK_CACHE_WARM", "5000"))
+
+registry.register(Gauge("track_cache_tracks", "Tracks in this worker's metadata cache", fn=lambda: len(track_cache)))
+registry.register(Gauge("track_cache_bytes", "Estimated memory held by the track metadata cache",
+                        fn=lambda: track_cache.bytes))
+registry.register(Gauge("track_cache_hit_ratio", "Share of track lookups answered from memory",
+                        fn=lambda: track_cache.stats()["hit_ratio"]))
@@ -0,0 +1,203 @@
+"""Optional write-behind for POST /votes (VOTE_WRITE_BEHIND=true).
+
+Votes are counted in the cached ranking right away and written in batches every VOTE_FLUSH_MS
+(or VOTE_FLUSH_BATCH votes). A crash loses what was waiting; a clean shutdown flushes."""
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+
+from app.sql import votes as SQL
+
+
+class VoteBuffer:
+    def __init__(self, enabled: bool = False, flush_ms: float = 50, max_batch: int = 500,
+                 max_pending: int = 10_000, max_rooms: int = 1024):
+        self.enabled = enabled
+        self.flush_s = flush_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_rooms = max_rooms
+        self.session_factory = None  # async sessionmaker, set by start()
+        self.publish = None          # room_events.publish, set by start()
+        # (room_track_id, user_id) -> [vote_id, room_id, value, value already in the DB]
+        self._pending: dict[tuple[str, str], list] = {}
+        self._flushing: dict[tuple[str, str], list] = {}
+        self._ballots: OrderedDict[str, dict[tuple[str, str], int]] = OrderedDict()  # room -> (rt, user) -> value
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.buffered = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def start(self, session_factory, publish) -> None:
+        if not self.enabled:
+            return
+        self.session_factory = session_factory
+        self.publish = publish
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        # last chance for whatever is still waiting
+        for attempt in range(3):
+            try:
+                await self.flush()
+                return
+            except Exception:
+                logging.exception("Vote flush on shutdown failed (attempt %d)", attempt + 1)
+                await asyncio.sleep(0.5)
+        logging.error("Shutting down with %d unflushed votes", len(self._pending))
+
+    async def add(self, session, room_id, room_track_id, user_id, value: int, current_votes: int) -> int:
+        """Buffer one vote, return the track's new tally (current_votes from the cached ranking)."""
+        room, rt, user = str(room_id), str(room_track_id), str(user_id)
+        key = (rt, user)
+        if key not in self._pending and len(self._pending) >= self.max_pending:
+            await self.flush()  # full: this voter waits for the write instead of the buffer growing
+
+        ballots = await self._room_ballots(session, room)
+        prev = ballots.get(key, 0)
+        entry = self._pending.get(key)
+        if entry is None:
+            in_db = self._flushing[key][2] if key in self._flushing else prev
+            self._pending[key] = [uuid.uuid4(), room, value, in_db]
+        else:
+            entry[2] = value
+        ballots[key] = value
+        self.buffered += 1
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+        return current_votes - prev + value
+
+    def note_ballot(self, room_id, room_track_id, user_id, value: int) -> None:
+        # a vote seen on the bus (ours or another worker's)
+        ballots = self._ballots.get(str(room_id))
+        if ballots is not None:
+            ballots[(str(room_track_id), str(user_id))] = int(value)
+
+    def forget_room(self, room_id=None) -> None:
+        # room_id None = every room (after a resync we may have missed votes)
+        if room_id is None:
+            self._ballots.clear()
+        else:
+            self._ballots.pop(str(room_id), None)
+
+    def pending_delta(self, room_id) -> dict[str, int]:
+        # how far this worker's unflushed votes move each track's tally past what Postgres has
+        room = str(room_id)
+        deltas: dict[str, int] = {}
+        for entries in (self._flushing, self._pending):
+            for (rt, _), (_, entry_room, value, in_db) in entries.items():
+                if entry_room == room and value != in_db:
+                    deltas[rt] = deltas.get(rt, 0) + value - in_db
+        return deltas
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+            try:
+                tallies = await self._write(batch)
+            except Exception:
+                self.flush_errors += 1
+                # put the batch back under anything newer, keeping what the DB really has
+                for key, entry in batch.items():
+                    newer = self._pending.get(key)
+                    if newer is None:
+                        self._pending[key] = entry
+                    else:
+                        newer[3] = entry[3]
+                raise
+            finally:
+                self._flushing = {}
+            self.flushes += 1
+            deltas: dict[str, dict[str, int]] = {}
+            for rt, room, vote_sum, vote_seq in tallies:
+                # what Postgres has, plus our own votes that arrived while we were writing
+                if room not in deltas:
+                    deltas[room] = self.pending_delta(room)
+                self.publish(room, "vote", room_track_id=rt, votes=vote_sum + deltas[room].get(rt, 0), seq=vote_seq)
+
+    async def _write(self, batch: dict) -> list[tuple[str, str, int, int]]:
+        keys = list(batch)
+        params = {
+            "ids": [batch[k][0] for k in keys],
+            "room_track_ids": [k[0] for k in keys],
+            "room_ids": [batch[k][1] for k in keys],
+            "user_ids": [k[1] for k in keys],
+            "vote_values": [batch[k][2] for k in keys],
+        }
+        async with self.session_factory() as session:
+            async with session.begin():
+                written = (await session.execute(SQL.FLUSH_VOTES, params)).scalars().all()
+                rows = (await session.execute(
+                    SQL.GET_ROOM_TRACK_TALLIES, {"room_track_ids": sorted({k[0] for k in keys})}
+                )).mappings().all()
+        self.flushed += len(written)
+        self.dropped += len(keys) - len(written)
+        return [(str(r["room_track_id"]), str(r["room_id"]), int(r["vote_sum"]), int(r["vote_seq"])) for r in rows]
+
+    async def _room_ballots(self, session, room: str) -> dict:
+        ballots = self._ballots.get(room)
+        if ballots is None:
+            rows = (await session.execute(SQL.GET_ROOM_BALLOTS, {"room_id": room})).mappings().all()
+            loaded = {(str(r["room_track_id"]), str(r["user_id"])): int(r["value"]) for r in rows}
+            # our own votes aren't in Postgres yet
+            for entries in (self._flushing, self._pending):
+                for key, (_, entry_room, value, _) in entries.items():
+                    if entry_room == room:
+                        loaded[key] = value
+            ballots = self._ballots.setdefault(room, loaded)  # someone may have loaded it meanwhile
+            while len(self._ballots) > self.max_rooms:
+                self._ballots.popitem(last=False)
+        self._ballots.move_to_end(room)
+        return ballots
+
+    async def _run(self) -> None:
+        delay = self.flush_s
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+                delay = self.flush_s
+            except Exception:
+                logging.exception("Vote flush failed, %d votes waiting", len(self._pending))
+                delay = min(max(delay * 2, 0.1), 5.0)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "buffered": self.buffered,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+        }
+
+
+vote_buffer = VoteBuffer(
+    enabled=os.getenv("VOTE_WRITE_BEHIND", "false").lower() == "true",
+    flush_ms=float(os.getenv("VOTE_FLUSH_MS", "50")),
+    max_batch=int(os.getenv("VOTE_FLUSH_BATCH", "500")),
+    max_pending=int(os.getenv("VOTE_BUFFER_MAX", "10000")),
+)
@@ -1,15 +1,85 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import auth, playback, rooms, tracks, votes
+from app.api import auth, metrics, playback, rooms, stream, tracks, votes
+from app.infra import sql_metrics, sql_trace
+from app.infra.compression import CompressionMiddleware
+from app.infra.db import AsyncSessionLocal, engine
+from app.infra.http_metrics import METRICS_ENABLED, MetricsMiddleware
+from app.infra.queue_cache import queue_cache
+from app.infra.queue_log import queue_log
+from app.infra.room_directory import room_directory
+from app.infra.room_events import RoomEvent, room_events
+from app.infra.room_hub import room_hub
+from app.infra.search_index import catalog_index
+from app.infra.track_cache import TRACK_CACHE_WARM, track_cache
+from app.infra.vote_buffer import vote_buffer
 # Load environment variables from .env
 load_dotenv()
 
 
-app = FastAPI(title="Live Party Mode")
+def apply_room_event(event: RoomEvent):
+    # runs in every worker: drop the cached queue first, then push the fresh state to streams
+    if event.kind == "tracks_added":
+        # catalog events aren't about a room, they keep the search index current
+        asyncio.create_task(catalog_index.add_from_db(AsyncSessionLocal, event.data.get("track_ids", [])))
+        track_cache.forget(event.data.get("track_ids", []))  # new or updated, reloaded when a queue needs them
+        return
+    if event.kind == "catalog_changed":
+        asyncio.create_task(catalog_index.build(AsyncSessionLocal))
+        track_cache.clear()
+        return
+    if event.kind == "resync":
+        asyncio.create_task(catalog_index.build(AsyncSessionLocal))
+        track_cache.clear()
+        room_directory.clear()
+        vote_buffer.forget_room()
+        queue_cache.clear()
+        room_hub.notify_all()
+        return
+    if event.kind == "room_closed":
+        room_directory.invalidate(event.data.get("code"), room_id=event.room_id)
+        vote_buffer.forget_room(event.room_id)
+        queue_log.forget(event.room_id)
+    if event.kind == "vote" and "user_id" in event.data:
+        vote_buffer.note_ballot(event.room_id, event.data["room_track_id"], event.data["user_id"], event.data["value"])
+    if event.kind == "vote" and "room_track_id" in event.data:
+        # a vote only moves one track: patch the cached ranking instead of reloading the room
+        # seq: tallies from different workers can arrive out of order, the older one is ignored
+        rt_id, votes, seq = event.data["room_track_id"], event.data["votes"], event.data.get("seq")
+        queue_cache.bump(event.room_id, apply=lambda ranked: ranked.set_votes(rt_id, votes, seq))
+    elif event.kind == "advanced" and "room_track_id" in event.data:
+        # the started track leaves the queue for the now-playing slot
+        started = event.data["room_track_id"]
+        queue_cache.bump(event.room_id, apply=lambda ranked: ranked.play(started))
+    else:
+        queue_cache.bump(event.room_id)
+    room_hub.notify(event.room_id)
+
+room_events.subscribe(apply_room_event)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await room_events.start()
+    await vote_buffer.start(AsyncSessionLocal, room_events.publish)
+    # searches go to Postgres until the index is built
+    index_build = asyncio.create_task(catalog_index.build(AsyncSessionLocal))
+    # popular tracks' titles in memory before the first queues load (missing ones are fetched as needed)
+    cache_warm = asyncio.create_task(track_cache.warm(AsyncSessionLocal, TRACK_CACHE_WARM))
+    yield
+    index_build.cancel()
+    cache_warm.cancel()
+    await vote_buffer.stop()  # flush buffered votes while the bus can still announce them
+    await room_events.stop()
+
+
+app = FastAPI(title="Live Party Mode", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,7 +87,16 @@ app.add_middleware(
     allow_credentials=True,     # needed for cookies
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Queue-Version"],  # sent back as If-None-Match / ?since= when polling
 )
+app.add_middleware(CompressionMiddleware)  # br / gzip for big JSON bodies (COMPRESSION, COMPRESS_MIN_BYTES)
+# added last = outermost: times everything, CORS included (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+if METRICS_ENABLED:
+    sql_metrics.install(engine)
+if sql_trace.SQL_TRACE:
+    sql_trace.SqlTracer(engine).install()
+    app.add_middleware(sql_trace.TraceContextMiddleware)  # statements know their request's route and room
 
 @app.get("/")
 async def root():
@@ -32,4 +111,6 @@ app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(rooms.router, prefix="/rooms", tags=["rooms"])
 app.include_router(tracks.router, prefix="/tracks", tags=["tracks"])
 app.include_router(votes.router, prefix="/votes", tags=["votes"])
-app.include_router(playback.router, tags=["playback"])
\ No newline at end of file
+app.include_router(playback.router, tags=["playback"])
+app.include_router(stream.router, tags=["stream"])
+app.include_router(metrics.router, tags=["metrics"])
\ No newline at end of file
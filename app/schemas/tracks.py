@@ -24,4 +24,19 @@ class QueueItem(BaseModel):
 
 class QueueState(BaseModel):
     now_playing: Optional[QueueItem] = None
-    queue: list[QueueItem]
\ No newline at end of file
+    queue: list[QueueItem]
+
+class QueueChange(BaseModel):
+    room_track_id: str
+    votes: int
+    score: float
+    status: str
+
+class QueueDelta(BaseModel):
+    version: str  # send back as ?since= next time
+    full: bool  # since was unknown or too old: `queue` is the whole queue, the rest is empty
+    queue: list[QueueItem] = []
+    inserted: list[QueueItem] = []
+    changed: list[QueueChange] = []
+    removed: list[str] = []  # room_track_ids
+    order: Optional[list[str]] = None  # room_track_ids in rank order, left out only when nothing changed or moved
@@ -0,0 +1,19 @@
+"""The app's raw SQL, one module per area, each query built once at import with statement():
+a text() clause with typed bind parameters, so every pooled connection prepares it once and reuses it."""
+from sqlalchemy import Float, Integer, String, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, TIMESTAMP, UUID
+from sqlalchemy.sql.elements import TextClause
+
+Uuid = UUID(as_uuid=True)
+Uuids = ARRAY(Uuid)
+Int = Integer()
+Ints = ARRAY(Integer)
+Str = String()
+Strs = ARRAY(String)
+Float8 = Float(precision=53)
+Timestamptz = TIMESTAMP(timezone=True)
+
+
+def statement(sql: str, **types) -> TextClause:
+    # statement("... WHERE id = :room_id", room_id=Uuid); naming a bind that isn't in the SQL is an error
+    return text(sql).bindparams(*(bindparam(name, type_=type_) for name, type_ in types.items()))
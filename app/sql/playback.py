@@ -1,44 +1,51 @@
-GET_ACTIVE_ROOM_WITH_HOST = """
-SELECT id, host_user_id
-FROM rooms
-WHERE code = :code AND is_active IS TRUE;
-"""
+from app.sql import Uuid, statement
+from app.sql.tracks import QUEUE_SCORE, SCORE_BINDS
 
-GET_CURRENT_PLAYING = """
+# taken first in every advance: concurrent advances of one room queue up behind it,
+# other rooms (and votes/adds in this room) don't touch it. NULL = room gone or closed meanwhile.
+LOCK_ROOM_FOR_ADVANCE = statement("""
 SELECT id
-FROM room_tracks
-WHERE room_id = CAST(:room_id AS uuid)
-  AND status = 'playing'::track_status
-ORDER BY created_at DESC
-LIMIT 1;
-"""
-
-MARK_PLAYED = """
-UPDATE room_tracks
-SET status = 'played'::track_status
-WHERE id = CAST(:room_track_id AS uuid);
-"""
+FROM rooms
+WHERE id = :room_id
+  AND is_active
+FOR NO KEY UPDATE;
+""", room_id=Uuid)
 
-SET_PLAYING = """
-UPDATE room_tracks
+# the whole advance in one statement, run right after LOCK_ROOM_FOR_ADVANCE (so its snapshot
+# already sees the previous advance): retire what's playing, play the top of the queue
+# (same order as RANKED_QUEUE). Returns the new playing room_track id, no row = queue empty.
+ADVANCE_ROOM = statement(f"""
+WITH played AS (
+  UPDATE room_tracks
+  SET status = 'played'::track_status
+  WHERE room_id = :room_id
+    AND status = 'playing'::track_status
+  RETURNING id
+),
+next_up AS (
+  SELECT rt.id
+  FROM room_tracks rt
+  JOIN rooms r ON r.id = rt.room_id
+  WHERE rt.room_id = :room_id
+    AND rt.status = 'queued'::track_status
+  ORDER BY {QUEUE_SCORE} DESC, rt.created_at ASC, rt.id ASC
+  LIMIT 1
+)
+UPDATE room_tracks rt
 SET status = 'playing'::track_status
-WHERE id = CAST(:room_track_id AS uuid);
-"""
+FROM next_up
+WHERE rt.id = next_up.id
+RETURNING rt.id;
+""", room_id=Uuid, **SCORE_BINDS)
 
-GET_NOW_PLAYING_DETAILS = """
-WITH votes_sum AS (
-  SELECT room_track_id, 
-  COALESCE(SUM(value), 0) AS votes
-  FROM votes
-  GROUP BY room_track_id
-)
+GET_NOW_PLAYING_DETAILS = statement("""
 SELECT
   rt.id AS room_track_id,
   t.id AS track_id,
   t.title AS title,
   t.artist AS artist,
   t.duration_ms AS duration_ms,
-  COALESCE(vs.votes, 0) AS votes,
+  rt.vote_sum AS votes,
   rt.created_at AS created_at,
   rt.status AS status,
   rt.added_by_user_id AS added_by_user_id,
@@ -48,10 +55,8 @@ JOIN tracks t
     ON t.id = rt.track_id
 JOIN rooms  r 
     ON r.id = rt.room_id
-LEFT JOIN votes_sum vs 
-     ON vs.room_track_id = rt.id
-WHERE rt.room_id = CAST(:room_id AS uuid)
+WHERE rt.room_id = :room_id
   AND rt.status = 'playing'::track_status
 ORDER BY rt.created_at DESC
 LIMIT 1;
-"""
\ No newline at end of file
+""", room_id=Uuid)
\ No newline at end of file
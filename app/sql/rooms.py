@@ -0,0 +1,9 @@
+from app.sql import Str, statement
+
+#every endpoint's code -> room lookup, cached by app.infra.room_directory
+#(inactive rooms too, so closing a room is just an invalidation)
+GET_ROOM_BY_CODE = statement("""
+SELECT id, host_user_id, is_active
+FROM rooms
+WHERE code = :code;
+""", code=Str)
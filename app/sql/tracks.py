@@ -1,17 +1,9 @@
-GET_ACTIVE_ROOM_BY_CODE = """
-SELECT id
-FROM rooms
-WHERE code = :code 
-AND is_active IS TRUE;
-"""
+from app.sql import Float8, Int, Str, Strs, Timestamptz, Uuid, statement
 
-TRACK_EXISTS = """
-SELECT 1
-FROM tracks
-WHERE id = :track_id;
-"""
-
-SEARCH_TRACKS = """
+#substring match served by the trigram GIN indexes, ranked by relevance:
+#prefix hits first, then closest trigram similarity, then title (id keeps ties stable,
+#the in-memory index in app.infra.search_index orders the same way)
+SEARCH_TRACKS = statement("""
 SELECT 
     id, 
     title, 
@@ -19,56 +11,153 @@ SELECT
     duration_ms
 FROM tracks
 WHERE title ILIKE :q OR artist ILIKE :q
-ORDER BY title
+ORDER BY
+    (title ILIKE :prefix OR artist ILIKE :prefix) DESC,
+    GREATEST(similarity(title, :term), similarity(artist, :term)) DESC,
+    title,
+    id
 LIMIT 20;
-"""
+""", q=Str, prefix=Str, term=Str)
+
+#whole catalog, streamed once to build the in-memory search index
+ALL_TRACKS = statement("""
+SELECT id, title, artist, duration_ms
+FROM tracks;
+""")
+
+TRACKS_BY_IDS = statement("""
+SELECT id, title, artist, duration_ms
+FROM tracks
+WHERE id = ANY(:ids);
+""", ids=Strs)
+
+#bulk ingestion (scripts/ingest_tracks.py): each chunk is COPYed into this per-connection staging table
+CREATE_TRACKS_STAGING = statement("""
+CREATE TEMP TABLE IF NOT EXISTS tracks_staging (
+    seq         bigint  NOT NULL,
+    id          varchar NOT NULL,
+    title       varchar NOT NULL,
+    artist      varchar NOT NULL,
+    duration_ms integer NOT NULL
+) ON COMMIT DELETE ROWS;
+""")
+
+#then merged into tracks; the last row wins when a chunk repeats an id,
+#and rows that didn't change aren't rewritten, so a rerun only applies the differences
+UPSERT_TRACKS_FROM_STAGING = statement("""
+INSERT INTO tracks AS t (id, title, artist, duration_ms)
+SELECT DISTINCT ON (id) id, title, artist, duration_ms
+FROM tracks_staging
+ORDER BY id, seq DESC
+ON CONFLICT (id) DO UPDATE
+SET title = EXCLUDED.title,
+    artist = EXCLUDED.artist,
+    duration_ms = EXCLUDED.duration_ms
+WHERE (t.title, t.artist, t.duration_ms) IS DISTINCT FROM (EXCLUDED.title, EXCLUDED.artist, EXCLUDED.duration_ms)
+RETURNING t.id, (xmax = 0) AS inserted;
+""")
 
-INSERT_ROOM_TRACK_IF_NOT_EXISTS = """
+INSERT_ROOM_TRACK_IF_NOT_EXISTS = statement("""
 WITH ins AS (
   INSERT INTO room_tracks (id, room_id, track_id, added_by_user_id, status)
-  SELECT
-    CAST(:id AS uuid),
-    CAST(:room_id AS uuid),
-    CAST(:track_id_ins AS varchar),
-    CAST(:user_id AS uuid),
-    'queued'::track_status
+  SELECT :id, :room_id, :track_id, :user_id, 'queued'::track_status
   WHERE NOT EXISTS (
     SELECT 1
     FROM room_tracks
-    WHERE room_id = CAST(:room_id AS uuid)
-      AND track_id = CAST(:track_id_chk AS varchar)
+    WHERE room_id = :room_id
+      AND track_id = :track_id
       AND status = 'queued'::track_status
   )
   RETURNING id
 )
 SELECT id FROM ins;
-"""
+""", id=Uuid, room_id=Uuid, track_id=Str, user_id=Uuid)
 
-#get all the tracks in queue, only include the ones with status as queued
-COMPUTE_QUEUE = """
-WITH votes_sum AS (
-  SELECT 
-    room_track_id, 
-    COALESCE(SUM(value), 0) AS votes_sum
-  FROM votes
-  GROUP BY room_track_id
-)
+# the room's queued tracks plus its playing track (at most one, see ex_room_one_playing):
+# everything the cached RankedQueue holds, in one query
+COMPUTE_QUEUE_AND_NOW_PLAYING = statement("""
 SELECT
   rt.id AS room_track_id,
   t.id  AS track_id,
   t.title AS title,
   t.artist AS artist,
   t.duration_ms AS duration_ms,
-  COALESCE(vs.votes_sum, 0) AS votes,
+  rt.vote_sum AS votes,
+  rt.vote_seq AS vote_seq,
+  rt.created_at AS created_at,
+  rt.status AS status,
+  rt.added_by_user_id AS added_by_user_id,
+  r.host_user_id  AS host_user_id
+FROM room_tracks rt
+JOIN tracks t ON t.id = rt.track_id
+JOIN rooms  r ON r.id = rt.room_id
+WHERE rt.room_id = :room_id
+  AND rt.status IN ('queued'::track_status, 'playing'::track_status);
+""", room_id=Uuid)
+
+# COMPUTE_QUEUE_AND_NOW_PLAYING without the tracks join: title, artist and duration_ms come from
+# the per-worker track cache (app.infra.track_cache), so this reads only the room's own rows
+QUEUE_ENTRIES_AND_NOW_PLAYING = statement("""
+SELECT
+  rt.id AS room_track_id,
+  rt.track_id AS track_id,
+  rt.vote_sum AS votes,
+  rt.vote_seq AS vote_seq,
   rt.created_at AS created_at,
   rt.status AS status,
   rt.added_by_user_id AS added_by_user_id,
   r.host_user_id  AS host_user_id
 FROM room_tracks rt
+JOIN rooms  r ON r.id = rt.room_id
+WHERE rt.room_id = :room_id
+  AND rt.status IN ('queued'::track_status, 'playing'::track_status);
+""", room_id=Uuid)
+
+#the tracks queued most often across all rooms, to warm the track cache at startup
+#(least queued first, so the most popular end up most recently used)
+MOST_QUEUED_TRACKS = statement("""
+SELECT t.id, t.title, t.artist, t.duration_ms
+FROM (
+  SELECT track_id, count(*) AS times
+  FROM room_tracks
+  GROUP BY track_id
+  ORDER BY times DESC
+  LIMIT :limit
+) q
+JOIN tracks t ON t.id = q.track_id
+ORDER BY q.times ASC;
+""", limit=Int)
+
+# score_room_track as SQL: votes + capped age bonus + host bonus.
+# Every step is float8 and in the same order as the Python version, so scores (and ties) match exactly.
+# A fragment, not a statement: its binds are typed by whoever embeds it (SCORE_BINDS)
+QUEUE_SCORE = """
+(
+  CAST(rt.vote_sum AS float8)
+  + CAST(:w_age AS float8) * LEAST(
+      CAST(EXTRACT(EPOCH FROM (CAST(:now AS timestamptz) - rt.created_at)) AS float8) / CAST(:t_age AS float8),
+      CAST(1.0 AS float8))
+  + CASE WHEN rt.added_by_user_id = r.host_user_id THEN CAST(:w_host AS float8) ELSE CAST(0.0 AS float8) END
+)"""
+SCORE_BINDS = {"now": Timestamptz, "w_age": Float8, "t_age": Float8, "w_host": Float8}
+
+#the queued rows of COMPUTE_QUEUE_AND_NOW_PLAYING but ranked by the database, one page at a time (:limit NULL = everything)
+RANKED_QUEUE = statement(f"""
+SELECT
+  rt.id AS room_track_id,
+  t.id  AS track_id,
+  t.title AS title,
+  t.artist AS artist,
+  t.duration_ms AS duration_ms,
+  rt.vote_sum AS votes,
+  {QUEUE_SCORE} AS score,
+  rt.created_at AS created_at,
+  rt.status AS status
+FROM room_tracks rt
 JOIN tracks t ON t.id = rt.track_id
-JOIN rooms  r ON r.id = rt.room_id 
-LEFT JOIN votes_sum vs 
-ON vs.room_track_id = rt.id
-WHERE rt.room_id = CAST(:room_id AS uuid)
-  AND rt.status = 'queued'::track_status;
-"""
+JOIN rooms  r ON r.id = rt.room_id
+WHERE rt.room_id = :room_id
+  AND rt.status = 'queued'::track_status
+ORDER BY score DESC, rt.created_at ASC, rt.id ASC
+LIMIT :limit OFFSET :offset;
+""", room_id=Uuid, limit=Int, offset=Int, **SCORE_BINDS)
@@ -1,19 +1,81 @@
-GET_ROOM_TRACK_IN_ROOM = """
-SELECT 1
-FROM room_tracks
-WHERE id = CAST(:room_track_id AS uuid)
-  AND room_id = CAST(:room_id AS uuid)
-  AND status = 'queued'::track_status;
-"""
+from app.sql import Int, Ints, Uuid, Uuids, statement
+
+# the whole vote in one round trip (function from migrations a7c3e91d5b42, e5b17c3a9f24):
+# new vote_sum and vote_seq, no row when the track isn't queued in this room
+CAST_VOTE = statement("""
+SELECT votes, vote_seq
+FROM cast_room_track_vote(:id, :room_track_id, :room_id, :user_id, :value);
+""", id=Uuid, room_track_id=Uuid, room_id=Uuid, user_id=Uuid, value=Int)
 
-UPSERT_VOTE = """
+# write-behind mode (app.infra.vote_buffer): everyone's current vote on the room's queued tracks
+GET_ROOM_BALLOTS = statement("""
+SELECT v.room_track_id, v.user_id, v.value
+FROM votes v
+JOIN room_tracks rt ON rt.id = v.room_track_id
+WHERE rt.room_id = :room_id
+  AND rt.status = 'queued'::track_status;
+""", room_id=Uuid)
+
+# one multi-row upsert per flush (one row per room_track/user, the buffer already collapsed repeats).
+# Tracks that stopped being queued since the vote was buffered (and unknown users) are dropped,
+# rows are locked in id order so two workers flushing at once can't deadlock
+FLUSH_VOTES = statement("""
+WITH batch AS (
+  SELECT *
+  FROM unnest(:ids, :room_track_ids, :room_ids, :user_ids, :vote_values)
+    AS b(id, room_track_id, room_id, user_id, value)
+),
+valid AS (
+  SELECT b.id, b.room_track_id, b.user_id, b.value
+  FROM batch b
+  JOIN room_tracks rt ON rt.id = b.room_track_id AND rt.room_id = b.room_id AND rt.status = 'queued'::track_status
+  JOIN users u ON u.id = b.user_id
+  ORDER BY b.room_track_id
+  FOR NO KEY UPDATE OF rt
+)
 INSERT INTO votes (id, room_track_id, user_id, value)
-VALUES (
-    CAST(:id AS uuid), 
-    CAST(:room_track_id AS uuid), 
-    CAST(:user_id AS uuid), 
-    CAST(:value AS int))
+SELECT id, room_track_id, user_id, value
+FROM valid
 ON CONFLICT (room_track_id, user_id)
 DO UPDATE SET value = EXCLUDED.value
-RETURNING id;
-"""
\ No newline at end of file
+RETURNING room_track_id;
+""", ids=Uuids, room_track_ids=Uuids, room_ids=Uuids, user_ids=Uuids, vote_values=Ints)
+
+# tallies after a flush (same transaction, the trigger's updates are visible)
+GET_ROOM_TRACK_TALLIES = statement("""
+SELECT id AS room_track_id, room_id, vote_sum, vote_seq
+FROM room_tracks
+WHERE id = ANY(:room_track_ids);
+""", room_track_ids=Uuids)
+
+# room_tracks whose vote_sum/vote_count drifted from the votes table (should always be empty)
+CHECK_VOTE_TALLIES = statement("""
+SELECT
+  rt.id AS room_track_id,
+  rt.vote_sum AS vote_sum,
+  rt.vote_count AS vote_count,
+  COALESCE(v.vote_sum, 0) AS expected_sum,
+  COALESCE(v.vote_count, 0) AS expected_count
+FROM room_tracks rt
+LEFT JOIN (
+  SELECT room_track_id, SUM(value) AS vote_sum, COUNT(*) AS vote_count
+  FROM votes
+  GROUP BY room_track_id
+) v ON v.room_track_id = rt.id
+WHERE rt.vote_sum <> COALESCE(v.vote_sum, 0)
+   OR rt.vote_count <> COALESCE(v.vote_count, 0);
+""")
+
+REPAIR_VOTE_TALLIES = statement("""
+UPDATE room_tracks rt
+SET vote_sum = COALESCE(v.vote_sum, 0), vote_count = COALESCE(v.vote_count, 0)
+FROM room_tracks rt2
+LEFT JOIN (
+  SELECT room_track_id, SUM(value) AS vote_sum, COUNT(*) AS vote_count
+  FROM votes
+  GROUP BY room_track_id
+) v ON v.room_track_id = rt2.id
+WHERE rt.id = rt2.id
+  AND (rt.vote_sum <> COALESCE(v.vote_sum, 0) OR rt.vote_count <> COALESCE(v.vote_count, 0))
+RETURNING rt.id;
+""")
@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import httpx
+from sqlalchemy import text
+from app.infra.db import AsyncSessionLocal
+from app.main import app
+
+# Concurrency stress test for POST /rooms/{code}/advance (the host double/triple-tapping "next").
+# Fires bursts of parallel advances at one room through the app and checks that
+#   - a room never has more than one playing track (sampled while the bursts run, and at the end)
+#   - N advances play exactly the first N tracks of the ranking, in order: nothing skipped, nothing twice
+#   - while one room's advance holds its lock, another room still advances right away
+# Creates throwaway rooms + users, removes them afterwards. Needs a migrated database with tracks.
+#   python -m bench.advance_stress --parallel 8 --bursts 10 --tracks 100
+
+PLAYBACK_STATE = """
+SELECT
+  count(*) FILTER (WHERE status = 'playing'::track_status) AS playing,
+  count(*) FILTER (WHERE status = 'played'::track_status) AS played,
+  count(*) FILTER (WHERE status = 'queued'::track_status) AS queued
+FROM room_tracks
+WHERE room_id = CAST(:room_id AS uuid);
+"""
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def setup(tracks: int):
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            host = uuid.uuid4()
+            await session.execute(text("INSERT INTO users (id, display_name) VALUES (:id, 'bench host')"), {"id": host})
+            rooms = []
+            for _ in range(2):
+                room_id, code = uuid.uuid4(), uuid.uuid4().hex[:12].upper()
+                await session.execute(
+                    text("INSERT INTO rooms (id, code, name, host_user_id, is_active) VALUES (:id, :code, 'bench', :host, true)"),
+                    {"id": room_id, "code": code, "host": host},
+                )
+                n = (await session.execute(text("""
+                    INSERT INTO room_tracks (id, room_id, track_id, added_by_user_id, status)
+                    SELECT gen_random_uuid(), :room_id, t.id, :host, 'queued'::track_status
+                    FROM (SELECT id FROM tracks ORDER BY id LIMIT :n) t
+                """), {"room_id": room_id, "host": host, "n": tracks})).rowcount
+                if not n:
+                    raise SystemExit("no tracks to queue, seed the catalog first")
+                rooms.append((room_id, code))
+    return host, rooms
+
+
+async def cleanup(host, rooms):
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(text("DELETE FROM rooms WHERE id = ANY(CAST(:ids AS uuid[]))"), {"ids": [r[0] for r in rooms]})
+            await session.execute(text("DELETE FROM users WHERE id = :id"), {"id": host})
+
+
+async def playback_state(room_id) -> dict:
+    async with AsyncSessionLocal() as session:
+        return dict((await session.execute(text(PLAYBACK_STATE), {"room_id": str(room_id)})).mappings().one())
+
+
+async def stress(client, headers, room_id, code, parallel: int, bursts: int):
+    ranking = [item["room_track_id"] for item in (await client.get(f"/tracks/rooms/{code}/queue")).json()]
+    latencies: list[float] = []
+    max_playing = 0
+    done = False
+
+    async def sampler():
+        nonlocal max_playing
+        while not done:
+            max_playing = max(max_playing, (await playback_state(room_id))["playing"])
+            await asyncio.sleep(0.002)
+
+    async def advance():
+        t0 = time.perf_counter()
+        r = await client.post(f"/rooms/{code}/advance", headers=headers)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        assert r.status_code == 200, r.text
+
+    watcher = asyncio.create_task(sampler())
+    t0 = time.perf_counter()
+    for _ in range(bursts):
+        await asyncio.gather(*[advance() for _ in range(parallel)])
+    elapsed = time.perf_counter() - t0
+    done = True
+    await watcher
+
+    total = parallel * bursts
+    print(f"{total} advances in {bursts} bursts of {parallel}: {total / elapsed:.0f}/s, "
+          f"p50 {statistics.median(latencies):.1f} ms, p99 {pct(latencies, 99):.1f} ms")
+
+    state = await playback_state(room_id)
+    assert max_playing <= 1, f"saw {max_playing} playing tracks at once"
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(
+            text("SELECT id, status FROM room_tracks WHERE room_id = CAST(:room_id AS uuid)"), {"room_id": str(room_id)}
+        )).all()
+    status = {str(r.id): r.status for r in rows}
+    if total <= len(ranking):
+        # the first total-1 are played, the total-th plays, the rest still waits
+        assert [status[rt] for rt in ranking[:total - 1]] == ["played"] * (total - 1), "a track was skipped"
+        assert status[ranking[total - 1]] == "playing", "wrong track playing"
+        assert all(status[rt] == "queued" for rt in ranking[total:]), "a track played out of turn"
+    else:
+        assert state == {"playing": 0, "played": len(ranking), "queued": 0}, state
+    print(f"ok: {state}, never more than {max_playing} playing")
+
+
+async def isolation(client, headers, locked_room, other_code, locked_code):
+    # hold one room's advance lock, the other room must not notice
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(text("SELECT 1 FROM rooms WHERE id = :id FOR NO KEY UPDATE"), {"id": locked_room})
+            t0 = time.perf_counter()
+            r = await client.post(f"/rooms/{other_code}/advance", headers=headers)
+            other_ms = (time.perf_counter() - t0) * 1000
+            assert r.status_code == 200, r.text
+            blocked = asyncio.create_task(client.post(f"/rooms/{locked_code}/advance", headers=headers))
+            await asyncio.sleep(0.5)
+            assert not blocked.done(), "advance didn't wait for the room lock"
+        r = await blocked
+        assert r.status_code == 200, r.text
+    print(f"ok: other room advanced in {other_ms:.1f} ms while this one was locked; this one waited and then went through")
+
+
+async def main(parallel: int, bursts: int, tracks: int):
+    host, rooms = await setup(tracks)
+    (room_id, code), (_, other_code) = rooms
+    headers = {"X-User-ID": str(host)}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await stress(client, headers, room_id, code, parallel, bursts)
+            await isolation(client, headers, room_id, other_code, code)
+    finally:
+        await cleanup(host, rooms)
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel advances against one room")
+    parser.add_argument("--parallel", type=int, default=8, help="advances fired at once per burst")
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--tracks", type=int, default=100, help="queued tracks; fewer than parallel*bursts also tests running dry")
+    args = parser.parse_args()
+    asyncio.run(main(args.parallel, args.bursts, args.tracks))
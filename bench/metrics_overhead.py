@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import text
+from app.infra import sql_metrics
+from app.infra.db import AsyncSessionLocal, engine
+from app.infra.http_metrics import MetricsMiddleware
+from app.main import app
+from app.sql import rooms as SQL_ROOMS
+
+# What the request metrics cost per request, metrics off vs on (GET /metrics, app.infra.http_metrics / sql_metrics).
+#   http  requests straight into the ASGI app (no client, no sockets, so the difference isn't lost in noise):
+#         GET /health (next to nothing else to do) and GET queue of a room (answered from the queue cache)
+#   sql   GET_ROOM_BY_CODE on one session, with and without the cursor event hooks
+# Off and on alternate in rounds; the figure is the median over rounds of the mean µs per call.
+# Creates a throwaway room, removes it afterwards.
+#   python -m bench.metrics_overhead --requests 2000 --rounds 15
+
+
+async def setup():
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            host, room_id, code = uuid.uuid4(), uuid.uuid4(), uuid.uuid4().hex[:12].upper()
+            await session.execute(text("INSERT INTO users (id, display_name) VALUES (:id, 'bench host')"), {"id": host})
+            await session.execute(
+                text("INSERT INTO rooms (id, code, name, host_user_id, is_active) VALUES (:id, :code, 'bench', :host, true)"),
+                {"id": room_id, "code": code, "host": host},
+            )
+            await session.execute(text("""
+                INSERT INTO room_tracks (id, room_id, track_id, added_by_user_id, status)
+                SELECT gen_random_uuid(), :room_id, t.id, :host, 'queued'::track_status
+                FROM (SELECT id FROM tracks ORDER BY id LIMIT 30) t
+            """), {"room_id": room_id, "host": host})
+    return host, room_id, code
+
+
+async def cleanup(host, room_id):
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(text("DELETE FROM rooms WHERE id = :id"), {"id": room_id})
+            await session.execute(text("DELETE FROM users WHERE id = :id"), {"id": host})
+
+
+async def call(path: str) -> int:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80), "app": app}
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def middleware() -> MetricsMiddleware:
+    layer = app.middleware_stack
+    while not isinstance(layer, MetricsMiddleware):
+        layer = layer.app
+    return layer
+
+
+async def time_http(path: str, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await call(path)
+    return (time.perf_counter() - t0) / n * 1_000_000
+
+
+async def time_sql(session, code: str, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        (await session.execute(SQL_ROOMS.GET_ROOM_BY_CODE, {"code": code})).first()
+    return (time.perf_counter() - t0) / n * 1_000_000
+
+
+async def main(requests: int, queries: int, rounds: int):
+    host, room_id, code = await setup()
+    try:
+        async with app.router.lifespan_context(app):
+            paths = {"GET /health": "/health", "GET queue (cached)": f"/tracks/rooms/{code}/queue"}
+            for path in paths.values():  # warm up: build the middleware stack, load the room and its queue
+                if await call(path) != 200:
+                    raise SystemExit(f"{path} didn't answer 200")
+            mw = middleware()
+            print(f"µs per call, median of {rounds} rounds")
+            print(f"{'':>22} {'off':>8} {'on':>8} {'cost':>8}")
+            for name, path in paths.items():
+                results = {False: [], True: []}
+                for _ in range(rounds):
+                    for enabled in (False, True):
+                        mw.enabled = enabled
+                        results[enabled].append(await time_http(path, requests))
+                off, on = statistics.median(results[False]), statistics.median(results[True])
+                print(f"{name:>22} {off:>8.1f} {on:>8.1f} {on - off:>8.1f}")
+            mw.enabled = True
+
+            sql_metrics.uninstall(engine)  # app.main installed it
+            results = {False: [], True: []}
+            async with AsyncSessionLocal() as session:
+                await time_sql(session, code, 50)
+                for _ in range(rounds):
+                    for enabled in (False, True):
+                        if enabled:
+                            sql_metrics.install(engine)
+                        results[enabled].append(await time_sql(session, code, queries))
+                        if enabled:
+                            sql_metrics.uninstall(engine)
+            sql_metrics.install(engine)
+            off, on = statistics.median(results[False]), statistics.median(results[True])
+            print(f"{'SQL GET_ROOM_BY_CODE':>22} {off:>8.1f} {on:>8.1f} {on - off:>8.1f}")
+    finally:
+        await cleanup(host, room_id)
+        await engine.dispose()
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-request cost of the request and SQL metrics")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per round and route")
+    parser.add_argument("--queries", type=int, default=500, help="queries per round")
+    parser.add_argument("--rounds", type=int, default=15)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.queries, args.rounds))
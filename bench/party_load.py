@@ -0,0 +1,339 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+# Party traffic against the real app over HTTP: uvicorn in a subprocess (or --url for a server you started,
+# e.g. gunicorn with the production worker count) and the Postgres from DATABASE_URL / .env.
+# Setup goes through the API like the web app does: hosts POST /auth/guest + POST /rooms, guests
+# POST /auth/guest + POST /rooms/join, each host queues --seed-tracks tracks. Then for --duration seconds
+# every guest runs the --mix (see MIXES, any field can be overridden with its flag):
+#   poll       GET now-playing + GET queue together every poll_s (what App.tsx does without the stream)
+#   typeahead  search as someone types: one request per keystroke from the 2nd letter, keystroke_s apart
+#   add        add a track found by search
+#   votes      a burst of burst_votes taps on random queued tracks, tap_s apart
+#   advance    the host skips to the next track every advance_s
+# Per endpoint: requests, errors, req/s and latency p50/p95/p99 (ms), saved as JSON (--out) to compare runs:
+#   python -m bench.party_load --rooms 10 --guests 15 --duration 60
+#   python -m bench.party_load --mix vote_storm --compare bench/results/party_load-20261018-120000.json
+# Rooms are closed at the end; the guest users stay (they're just rows in users).
+
+
+@dataclass(frozen=True)
+class Mix:
+    poll_s: float = 4.0  # 0 = no polling
+    searches_per_min: float = 1.0  # per guest
+    keystroke_s: float = 0.15
+    adds_per_min: float = 0.5
+    vote_bursts_per_min: float = 1.0
+    burst_votes: int = 5
+    tap_s: float = 0.2
+    downvote_share: float = 0.2
+    advance_s: float = 30.0  # per room, 0 = never
+
+
+MIXES = {
+    "party": Mix(),
+    "polling": Mix(searches_per_min=0, adds_per_min=0, vote_bursts_per_min=0, advance_s=0),
+    "typeahead": Mix(searches_per_min=6.0, adds_per_min=1.0, vote_bursts_per_min=0.5),
+    "vote_storm": Mix(searches_per_min=0.5, vote_bursts_per_min=6.0, burst_votes=10, tap_s=0.1, advance_s=10.0),
+}
+
+SEARCH_SEEDS = ("love", "night", "the", "baby", "heart", "dance", "girl", "time", "blue", "fire", "rain", "man")
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # endpoint -> ms
+        self.statuses = defaultdict(Counter)  # endpoint -> status (or exception name) -> n
+        self.recording = True
+
+    async def request(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            r = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            if self.recording:
+                self.statuses[endpoint][type(e).__name__] += 1
+            return None
+        if self.recording:
+            self.latencies[endpoint].append((time.perf_counter() - t0) * 1000)
+            self.statuses[endpoint][str(r.status_code)] += 1
+        return r
+
+    def summary(self, elapsed: float) -> dict:
+        out = {}
+        for endpoint in sorted(self.statuses):
+            ms, statuses = self.latencies[endpoint], self.statuses[endpoint]
+            n = sum(statuses.values())
+            out[endpoint] = {
+                "requests": n,
+                "errors": sum(c for s, c in statuses.items() if not s.isdigit() or int(s) >= 500),
+                "statuses": dict(statuses),
+                "rps": round(n / elapsed, 2),
+                "p50_ms": round(pct(ms, 50), 2) if ms else None,
+                "p95_ms": round(pct(ms, 95), 2) if ms else None,
+                "p99_ms": round(pct(ms, 99), 2) if ms else None,
+                "max_ms": round(max(ms), 2) if ms else None,
+            }
+        return out
+
+
+class Room:
+    def __init__(self, room_id: str, code: str, host: httpx.AsyncClient):
+        self.id, self.code, self.host = room_id, code, host
+        self.queue: list[str] = []  # room_track_ids as last seen by anyone polling
+
+
+async def new_user(transport, url: str, rec: Recorder, name: str) -> httpx.AsyncClient:
+    # one client per person: its own uid cookie, plus the X-User-ID header the web app sends
+    client = httpx.AsyncClient(base_url=url, transport=transport, timeout=30.0)
+    r = await rec.request(client, "POST /auth/guest", "POST", "/auth/guest", json={"display_name": name})
+    if r is None or r.status_code != 201:
+        raise SystemExit(f"POST /auth/guest failed: {r.status_code if r is not None else 'no response'}")
+    client.headers["X-User-ID"] = r.json()["user_id"]
+    return client
+
+
+async def vocabulary(client, rec: Recorder) -> tuple[list[str], list[str]]:
+    # words to type and tracks to add, from what the catalog actually has
+    words, track_ids = set(), set()
+    for seed in SEARCH_SEEDS:
+        r = await rec.request(client, "GET /tracks/search", "GET", "/tracks/search", params={"artist_or_title": seed})
+        for t in (r.json() if r is not None and r.status_code == 200 else []):
+            track_ids.add(t["id"])
+            words.update(w.lower() for w in f"{t['title']} {t['artist']}".split() if len(w) >= 4 and w.isalpha())
+    if not track_ids:
+        raise SystemExit("search found no tracks, seed the catalog first (python -m seeds.seed_tracks)")
+    return sorted(words) or list(SEARCH_SEEDS), sorted(track_ids)
+
+
+async def setup(transport, url: str, rec: Recorder, rooms: int, guests: int, seed_tracks: int, track_ids: list[str]):
+    async def make_room(i):
+        host = await new_user(transport, url, rec, f"load host {i}")
+        r = await rec.request(host, "POST /rooms", "POST", "/rooms", json={"name": f"load {i}"})
+        if r is None or r.status_code != 201:
+            raise SystemExit(f"POST /rooms failed: {r.status_code if r is not None else 'no response'}")
+        room = Room(r.json()["id"], r.json()["code"], host)
+        for track_id in random.sample(track_ids, min(seed_tracks, len(track_ids))):
+            await rec.request(host, "POST /tracks/rooms/{code}/tracks", "POST", f"/tracks/rooms/{room.code}/tracks",
+                              json={"track_id": track_id})
+        members = []
+        for g in range(guests):
+            guest = await new_user(transport, url, rec, f"load guest {i}.{g}")
+            await rec.request(guest, "POST /rooms/join", "POST", "/rooms/join", json={"code": room.code})
+            members.append(guest)
+        return room, members
+
+    return await asyncio.gather(*[make_room(i) for i in range(rooms)])
+
+
+async def every(rate_per_min: float, until: float, action):
+    # Poisson arrivals: exponential gaps averaging 60 / rate seconds
+    if rate_per_min <= 0:
+        return
+    while True:
+        gap = random.expovariate(rate_per_min / 60)
+        if time.monotonic() + gap >= until:
+            return
+        await asyncio.sleep(gap)
+        await action()
+
+
+async def guest(client, room: Room, mix: Mix, rec: Recorder, words, track_ids, until: float, is_host: bool):
+    code = room.code
+
+    async def poll():
+        await asyncio.sleep(random.random() * mix.poll_s)  # guests don't all open the page at once
+        while time.monotonic() < until:
+            _, q = await asyncio.gather(
+                rec.request(client, "GET /rooms/{code}/now-playing", "GET", f"/rooms/{code}/now-playing"),
+                rec.request(client, "GET /tracks/rooms/{code}/queue", "GET", f"/tracks/rooms/{code}/queue"),
+            )
+            if q is not None and q.status_code == 200:
+                room.queue = [item["room_track_id"] for item in q.json()]
+            if time.monotonic() + mix.poll_s >= until:
+                return
+            await asyncio.sleep(mix.poll_s)
+
+    async def search():
+        word = random.choice(words)
+        for n in range(2, len(word) + 1):
+            r = await rec.request(client, "GET /tracks/search", "GET", "/tracks/search", params={"artist_or_title": word[:n]})
+            if r is not None and r.status_code == 200 and r.json():
+                track_ids.extend(t["id"] for t in r.json()[:3])
+            await asyncio.sleep(mix.keystroke_s)
+
+    async def add():
+        r = await rec.request(client, "POST /tracks/rooms/{code}/tracks", "POST", f"/tracks/rooms/{code}/tracks",
+                              json={"track_id": random.choice(track_ids)})
+        if r is not None and r.status_code == 200:
+            room.queue = [item["room_track_id"] for item in r.json()]
+
+    async def vote_burst():
+        for _ in range(mix.burst_votes):
+            if room.queue:
+                value = -1 if random.random() < mix.downvote_share else 1
+                await rec.request(client, "POST /votes/rooms/{code}/votes", "POST", f"/votes/rooms/{code}/votes",
+                                  json={"room_track_id": random.choice(room.queue), "value": value})
+            await asyncio.sleep(mix.tap_s)
+
+    async def advance():
+        while mix.advance_s > 0 and time.monotonic() + mix.advance_s < until:
+            await asyncio.sleep(mix.advance_s)
+            r = await rec.request(client, "POST /rooms/{code}/advance", "POST", f"/rooms/{code}/advance")
+            if r is not None and r.status_code == 200:
+                room.queue = [item["room_track_id"] for item in r.json()["queue"]]
+
+    tasks = [every(mix.searches_per_min, until, search), every(mix.adds_per_min, until, add),
+             every(mix.vote_bursts_per_min, until, vote_burst)]
+    if mix.poll_s > 0:
+        tasks.append(poll())
+    if is_host:
+        tasks.append(advance())
+    await asyncio.gather(*tasks)
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+           "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(cmd, env=os.environ.copy())
+
+
+async def wait_ready(url: str, server: subprocess.Popen):
+    async with httpx.AsyncClient(base_url=url) as client:
+        for _ in range(200):
+            if server is not None and server.poll() is not None:
+                raise SystemExit("uvicorn exited, see its output above")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise SystemExit(f"{url} didn't come up")
+
+
+def git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def print_table(endpoints: dict, previous: dict = None):
+    print(f"{'endpoint':>34} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50':>7} {'p95':>7} {'p99':>7}"
+          + (f" {'p95 was':>8} {'req/s was':>9}" if previous is not None else ""))
+    for name, s in endpoints.items():
+        line = (f"{name:>34} {s['requests']:>8} {s['errors']:>6} {s['rps']:>7.1f} "
+                f"{s['p50_ms'] or 0:>7.1f} {s['p95_ms'] or 0:>7.1f} {s['p99_ms'] or 0:>7.1f}")
+        if previous is not None:
+            old = previous.get(name)
+            line += f" {old['p95_ms'] or 0:>8.1f} {old['rps']:>9.1f}" if old else f" {'-':>8} {'-':>9}"
+        print(line)
+
+
+async def main(args, mix: Mix):
+    server = None
+    url = args.url
+    if url is None:
+        server = start_server(args.port, args.workers)
+        url = f"http://127.0.0.1:{args.port}"
+    transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=args.connections,
+                                                             max_keepalive_connections=args.connections))
+    setup_rec, rec = Recorder(), Recorder()
+    rooms = []
+    try:
+        await wait_ready(url, server)
+        t0 = time.perf_counter()
+        bootstrap = await new_user(transport, url, setup_rec, "load bootstrap")
+        words, track_ids = await vocabulary(bootstrap, setup_rec)
+        rooms = await setup(transport, url, setup_rec, args.rooms, args.guests, args.seed_tracks, track_ids)
+        setup_s = time.perf_counter() - t0
+        print(f"{url}: {args.rooms} rooms x {args.guests} guests ready in {setup_s:.1f}s, mix {args.mix}: {mix}")
+
+        until = time.monotonic() + args.duration
+        t0 = time.perf_counter()
+        await asyncio.gather(*[
+            guest(client, room, mix, rec, words, track_ids, until, is_host=client is room.host)
+            for room, members in rooms
+            for client in [room.host, *members]
+        ])
+        elapsed = time.perf_counter() - t0
+        rec.recording = False
+    finally:
+        for room, _ in rooms:
+            await setup_rec.request(room.host, "POST /rooms/{room_id}/close", "POST", f"/rooms/{room.id}/close")
+        await transport.aclose()
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:  # stuck on in-flight requests
+                server.kill()
+
+    endpoints = rec.summary(elapsed)
+    total = sum(s["requests"] for s in endpoints.values())
+    result = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git": git_rev(),
+        "url": url,
+        "workers": args.workers if args.url is None else None,
+        "rooms": args.rooms,
+        "guests": args.guests,
+        "duration_s": round(elapsed, 2),
+        "mix": {"name": args.mix, **dataclasses.asdict(mix)},
+        "total": {"requests": total, "rps": round(total / elapsed, 2),
+                  "errors": sum(s["errors"] for s in endpoints.values())},
+        "endpoints": endpoints,
+        "setup": {"seconds": round(setup_s, 2), "endpoints": setup_rec.summary(setup_s)},
+    }
+    previous = json.loads(Path(args.compare).read_text())["endpoints"] if args.compare else None
+    print_table(endpoints, previous)
+    print(f"{total} requests in {elapsed:.1f}s = {result['total']['rps']:.1f} req/s, {result['total']['errors']} errors "
+          f"(ms; errors = 5xx and failed connections)")
+
+    out = Path(args.out or f"bench/results/party_load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    print(f"saved {out}")
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated party traffic against the app over HTTP")
+    parser.add_argument("--url", help="target a running server instead of starting uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting the server")
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--guests", type=int, default=10, help="guests per room, besides the host")
+    parser.add_argument("--seed-tracks", type=int, default=15, help="tracks each host queues before the run")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of traffic")
+    parser.add_argument("--connections", type=int, default=200, help="HTTP connections shared by all simulated users")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="party")
+    for field in dataclasses.fields(Mix):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=field.type, default=None,
+                            help=f"override the mix's {field.name}")
+    parser.add_argument("--out", help="JSON results file (default bench/results/party_load-<time>.json)")
+    parser.add_argument("--compare", help="earlier JSON results to show next to this run")
+    parser.add_argument("--seed", type=int, help="random seed, for the same traffic shape run to run")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    overrides = {f.name: getattr(args, f.name) for f in dataclasses.fields(Mix) if getattr(args, f.name) is not None}
+    asyncio.run(main(args, dataclasses.replace(MIXES[args.mix], **overrides)))
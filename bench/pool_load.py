@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import text
+from app.infra.db import DATABASE_URL
+from app.infra.db_pool import PoolMetrics, PoolSettings, create_pooled_engine
+
+# Pool settings under bursty load: C clients hammer one engine, each "request" checks out a
+# connection, runs a query that holds it for --hold-ms and gives it back, then thinks for up to --think-ms.
+# Every configuration gets a fresh engine (cold pool), results per row:
+#   req/s, request latency p50/p95/p99, checkout time p50/p99 (histogram bucket bounds),
+#   connections opened (churn: overflow connections are closed when handed back), checkouts while over pool_size, timeouts.
+#   python -m bench.pool_load --clients 40 --requests 4000 --hold-ms 2
+# Pre-ping costs one round trip: ~0.1 ms locally, 1-3 ms to hosted Postgres (--rtt-ms for the estimate).
+
+CONFIGS = {
+    "5+10 always (old default)": PoolSettings(pool_size=5, max_overflow=10, pre_ping="always"),
+    "5+10 idle": PoolSettings(pool_size=5, max_overflow=10, pre_ping="idle"),
+    "5+10 never": PoolSettings(pool_size=5, max_overflow=10, pre_ping="never"),
+    "5+0 idle": PoolSettings(pool_size=5, max_overflow=0, pre_ping="idle"),
+    "10+10 idle": PoolSettings(pool_size=10, max_overflow=10, pre_ping="idle"),
+    "20+0 idle": PoolSettings(pool_size=20, max_overflow=0, pre_ping="idle"),
+}
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(name: str, settings: PoolSettings, clients: int, requests: int, hold_ms: float, think_ms: float, rtt_ms: float):
+    metrics = PoolMetrics()  # not registered, read directly
+    engine = create_pooled_engine(DATABASE_URL, settings, metrics, connect_args={"ssl": False})
+    query = text("SELECT pg_sleep(CAST(:s AS float8))")
+    latencies: list[float] = []
+    remaining = requests
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            t0 = time.perf_counter()
+            async with engine.connect() as conn:
+                await conn.execute(query, {"s": hold_ms / 1000})
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if think_ms:
+                await asyncio.sleep(random.random() * think_ms / 1000)
+
+    try:
+        t0 = time.perf_counter()
+        await asyncio.gather(*[client() for _ in range(clients)])
+        elapsed = time.perf_counter() - t0
+    finally:
+        await engine.dispose()
+
+    s = metrics.stats()
+    pings = s["checkouts"] if settings.pre_ping == "always" else 0
+    print(f"{name:>26} {len(latencies) / elapsed:>7.0f} {statistics.median(latencies):>7.2f} {pct(latencies, 95):>7.2f} "
+          f"{pct(latencies, 99):>7.2f} {s['checkout_p50_ms']:>8.2f} {s['checkout_p99_ms']:>8.2f} {s['opened']:>6} "
+          f"{s['overflow_checkouts']:>8} {s['timeouts']:>5} {pings * rtt_ms / max(len(latencies), 1):>8.2f}")
+
+
+async def main(clients: int, requests: int, hold_ms: float, think_ms: float, rtt_ms: float, only):
+    print(f"{clients} clients, {requests} requests, {hold_ms} ms per query, up to {think_ms} ms think time")
+    print(f"{'config':>26} {'req/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'co p50':>8} {'co p99':>8} "
+          f"{'opened':>6} {'overflow':>8} {'t/o':>5} {'+ping ms':>8}")
+    for name, settings in CONFIGS.items():
+        if only and only not in name:
+            continue
+        await run(name, settings, clients, requests, hold_ms, think_ms, rtt_ms)
+    print(f"(ms columns are request latency, co = checkout; +ping ms = pre-ping round trips per request at {rtt_ms} ms RTT)")
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connection pool settings under bursty load")
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--hold-ms", type=float, default=2.0, help="how long each request keeps its connection")
+    parser.add_argument("--think-ms", type=float, default=5.0, help="random pause between a client's requests")
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="round trip used for the hosted pre-ping estimate")
+    parser.add_argument("--only", help="run the configs whose name contains this")
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.requests, args.hold_ms, args.think_ms, args.rtt_ms, args.only))
@@ -0,0 +1,22 @@
+from app.sql import Uuid, statement
+
+# a room's queued tracks, unranked, with what score_room_track needs: the reference side of the parity
+# benches (the app itself loads COMPUTE_QUEUE_AND_NOW_PLAYING / QUEUE_ENTRIES_AND_NOW_PLAYING)
+COMPUTE_QUEUE = statement("""
+SELECT
+  rt.id AS room_track_id,
+  t.id  AS track_id,
+  t.title AS title,
+  t.artist AS artist,
+  t.duration_ms AS duration_ms,
+  rt.vote_sum AS votes,
+  rt.created_at AS created_at,
+  rt.status AS status,
+  rt.added_by_user_id AS added_by_user_id,
+  r.host_user_id  AS host_user_id
+FROM room_tracks rt
+JOIN tracks t ON t.id = rt.track_id
+JOIN rooms  r ON r.id = rt.room_id 
+WHERE rt.room_id = :room_id
+  AND rt.status = 'queued'::track_status;
+""", room_id=Uuid)
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.api.responses import dumps
+from app.api.tracks import _compute_queue
+from app.infra.compression import BROTLI_QUALITY, GZIP_LEVEL, encoders
+from app.infra.db import AsyncSessionLocal, engine
+from app.main import app
+from bench.queue_etag import call, cleanup, setup
+
+# Bytes on the wire vs CPU for the queue, for a room with --tracks queued tracks:
+#   payload   full items vs ?fields=room_track_id,votes,score, each raw / gzip / br at the configured levels
+#             (GZIP_LEVEL, BROTLI_QUALITY) and the median µs to compress it
+#   request   a whole GET queue through the app (cached ranking, CompressionMiddleware included) per
+#             Accept-Encoding: identity / gzip / br, µs and bytes sent
+# Creates throwaway rooms, removes them afterwards.
+#   python -m bench.queue_compression --tracks 50 200 500 --requests 200
+
+SLIM = ("room_track_id", "votes", "score")
+
+
+def timed(fn, n: int) -> float:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1_000_000)
+    return statistics.median(samples)
+
+
+async def request(path: str, encoding: str) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    status, size = await call(path, [(b"accept-encoding", encoding.encode())])
+    if status != 200:
+        raise SystemExit(f"{path} answered {status}")
+    return (time.perf_counter() - t0) * 1_000_000, size
+
+
+async def main(sizes: list[int], requests: int):
+    compress = encoders(["gzip", "br"])
+    async with app.router.lifespan_context(app):
+        print(f"gzip level {GZIP_LEVEL}, br quality {BROTLI_QUALITY}; median µs over {requests}")
+        print(f"{'tracks':>6} {'items':>5} {'raw':>8} {'gzip':>8} {'µs':>6} {'br':>8} {'µs':>6} {'saved (br)':>10}")
+        requests_table = []
+        for size in sizes:
+            host, room_id, code = await setup(size)
+            try:
+                async with AsyncSessionLocal() as session:
+                    items = await _compute_queue(session, room_id)
+                for label, fields in (("full", None), ("slim", SLIM)):
+                    body = dumps(items, fields)
+                    row = [f"{size:>6} {label:>5} {len(body):>8}"]
+                    for name in ("gzip", "br"):
+                        squeezed = compress[name](body)
+                        row.append(f"{len(squeezed):>8} {timed(lambda: compress[name](body), requests):>6.0f}")
+                    saved = 1 - len(compress["br"](body)) / len(body)
+                    print(" ".join(row), f"{saved:>10.0%}")
+
+                path = f"/tracks/rooms/{code}/queue"
+                await call(path, [])  # cache the ranking
+                samples, sent = {encoding: [] for encoding in ("identity", "gzip", "br")}, {}
+                for _ in range(requests):  # interleaved, so all three see the same background noise
+                    for encoding, taken in samples.items():
+                        us, sent[encoding] = await request(path, encoding)
+                        taken.append(us)
+                for encoding, taken in samples.items():
+                    requests_table.append((size, encoding, statistics.median(taken), sent[encoding]))
+            finally:
+                await cleanup(host, room_id)
+        print("\nwhole GET queue through the app (cached ranking)")
+        print(f"{'tracks':>6} {'accept-encoding':>16} {'µs':>7} {'bytes sent':>11}")
+        for size, encoding, us, sent in requests_table:
+            print(f"{size:>6} {encoding:>16} {us:>7.0f} {sent:>11}")
+    await engine.dispose()
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue payload size: compression and ?fields= projection")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.tracks, args.requests))
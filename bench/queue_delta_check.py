@@ -0,0 +1,99 @@
+import argparse
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+
+from app.api.responses import dumps
+from app.domain.queue_delta import apply, diff, snapshot
+from app.schemas.tracks import QueueDelta, QueueItem
+
+# Checks app.domain.queue_delta with no database: a queue goes through random inserts, removals, votes and status
+# changes while a clock runs, one version per step, and fresh tracks gain score with age like the real bonus, so
+# the ranking can reorder within a version. The server logs each version's snapshot when it is first served; the
+# client holds a copy served a little later at the same version (possibly already in another order). Replaying
+# diff(logged snapshot, current) through the wire format (app.api.responses.dumps) onto that copy with apply()
+# must give the current queue's JSON exactly, for the previous version and ones many steps back; so must a full delta.
+#   python -m bench.queue_delta_check [--steps 2000] [--seeds 20]
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+BONUS = 0.25  # age bonus a fresh track gains over RAMP seconds, then it's settled
+RAMP = 10.0
+
+
+class Track:
+    def __init__(self, rnd: random.Random, t: float):
+        self.id = str(uuid.UUID(int=rnd.getrandbits(128)))
+        self.added_t = t
+        self.votes = 0
+        self.host = rnd.choice([0.0, 0.1])
+        self.status = "queued"
+
+    def score(self, t: float) -> float:
+        return self.votes + BONUS * min((t - self.added_t) / RAMP, 1.0) + self.host
+
+
+def ranking(tracks: dict, t: float) -> list[QueueItem]:
+    ordered = sorted(tracks.values(), key=lambda tr: (-tr.score(t), tr.added_t, tr.id))
+    return [
+        QueueItem(room_track_id=tr.id, track_id=tr.id[:8], title=f"title {tr.id[:4]}", artist="artist",
+                  duration_ms=180_000, votes=tr.votes, score=tr.score(t), status=tr.status,
+                  created_at=START + timedelta(seconds=tr.added_t))
+        for tr in ordered
+    ]
+
+
+def mutate(rnd: random.Random, tracks: dict, t: float) -> None:
+    for _ in range(rnd.choice([0, 1, 1, 2, 5])):
+        op = rnd.choice(["insert", "remove", "vote", "status"])
+        if op != "insert" and not tracks:
+            op = "insert"
+        if op == "insert":
+            track = Track(rnd, t)
+            tracks[track.id] = track
+        elif op == "remove":
+            del tracks[rnd.choice(sorted(tracks))]
+        elif op == "vote":
+            tracks[rnd.choice(sorted(tracks))].votes += rnd.choice([-1, 1])
+        else:
+            tracks[rnd.choice(sorted(tracks))].status = rnd.choice(["queued", "playing"])
+
+
+def wire(content) -> list | dict:
+    return orjson.loads(dumps(content))
+
+
+def check(steps: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    t = 0.0
+    tracks: dict[str, Track] = {}
+    history = [(snapshot([]), [])]  # per version: the snapshot the server logged, the copy the client holds
+
+    for step in range(steps):
+        mutate(rnd, tracks, t)
+        logged = ranking(tracks, t)
+        t += rnd.choice([0, 0.5, 3])  # the client's copy of this version is served a bit later
+        held = wire(ranking(tracks, t))
+        t += rnd.choice([0, 0.5, 3])
+
+        items = ranking(tracks, t)
+        want = wire(items)
+        for back in {1, rnd.randint(1, len(history))}:
+            base, copy = history[-back]
+            delta = wire(QueueDelta.model_construct(version=str(step), full=False, **diff(base, items)))
+            assert apply(copy, delta) == want, f"seed {seed} step {step}: diff from {back} versions back differs"
+        full = wire(QueueDelta.model_construct(version=str(step), full=True, queue=items))
+        assert apply(history[0][1], full) == want, f"seed {seed} step {step}: full delta differs"
+        history.append((snapshot(logged), held))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check queue diffs round trip onto older queues, no database")
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seeds", type=int, default=20)
+    args = parser.parse_args()
+
+    for seed in range(args.seeds):
+        check(args.steps, seed)
+    print(f"{args.seeds} seeds x {args.steps} steps: every diff replayed to the current queue ✅")
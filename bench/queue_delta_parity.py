@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import random
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import httpx
+from app.domain.queue_delta import apply
+from app.infra.queue_log import queue_log
+from app.main import app
+from bench.now_playing_parity import cleanup, setup
+
+# Checks GET queue?since=<version> diffs: a random mix of adds, votes and advances goes through the app
+# while --clients simulated guests each hold a copy of the queue and catch up now and then (some often,
+# some lagging many versions behind, past the log's reach). Every catch-up replays the diff onto the
+# client's copy (app.domain.queue_delta.apply) and must give the queue a full GET returns right after:
+# same tracks, order, votes and status, scores equal up to the age bonus gained between the two requests.
+# Also reports how many catch-ups were diffs vs full snapshots and the bytes a diff saved.
+# Creates a throwaway room + users, removes them afterwards. Needs a migrated database with tracks.
+#   python -m bench.queue_delta_parity --steps 500 [--seed 7]
+
+SCORE_TOLERANCE = 1e-3  # 0.25 age bonus over 600 s: a second between requests is 0.0004
+
+
+def same_queue(got: list[dict], want: list[dict]) -> bool:
+    if [i["room_track_id"] for i in got] != [i["room_track_id"] for i in want]:
+        return False
+    for g, w in zip(got, want):
+        if abs(g["score"] - w["score"]) > SCORE_TOLERANCE:
+            return False
+        if {k: v for k, v in g.items() if k != "score"} != {k: v for k, v in w.items() if k != "score"}:
+            return False
+    return True
+
+
+async def main(steps: int, clients: int, voters: int, catalog: int, seed: int):
+    random.seed(seed)
+    room_id, code, users, tracks = await setup(voters, catalog)
+    host = {"X-User-ID": str(users[0])}
+    path = f"/tracks/rooms/{code}/queue"
+    counts = {"add": 0, "vote": 0, "advance": 0}
+    diffs = fulls = 0
+    diff_bytes = full_bytes = 0
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            first = await client.get(path)
+            copies = [(first.headers["X-Queue-Version"], first.json()) for _ in range(clients)]
+            # client i catches up with probability 1 / (i + 1) per step: from every step to rarely
+            for _ in range(steps):
+                queue = copies[0][1]
+                op = random.choices(["add", "vote", "advance"], weights=[3, 10, 1])[0]
+                if op == "vote" and not queue:
+                    op = "add"
+                if op == "add":
+                    who = random.choice([host, {"X-User-ID": str(random.choice(users))}])
+                    r = await client.post(f"/tracks/rooms/{code}/tracks", json={"track_id": random.choice(tracks)}, headers=who)
+                elif op == "vote":
+                    r = await client.post(
+                        f"/votes/rooms/{code}/votes",
+                        json={"room_track_id": random.choice(queue)["room_track_id"], "value": random.choice((1, -1))},
+                        headers={"X-User-ID": str(random.choice(users))},
+                    )
+                else:
+                    r = await client.post(f"/rooms/{code}/advance", headers=host)
+                assert r.status_code == 200, r.text
+                counts[op] += 1
+
+                for i, (version, held) in enumerate(copies):
+                    if i and random.random() > 1 / (i + 1):
+                        continue
+                    r = await client.get(path, params={"since": version})
+                    assert r.status_code == 200, r.text
+                    delta = r.json()
+                    full = await client.get(path)
+                    got, want = apply(held, delta), full.json()
+                    assert same_queue(got, want), (delta, held, want)
+                    if delta["full"]:
+                        fulls += 1
+                    else:
+                        diffs += 1
+                        diff_bytes += len(r.content)
+                        full_bytes += len(full.content)
+                    copies[i] = (delta["version"], got)
+    finally:
+        await cleanup(room_id, users)
+    print(f"{steps} steps {counts}: every replayed diff matched the full queue ✅")
+    print(f"{diffs} diffs, {fulls} full snapshots (log keeps {queue_log.versions_per_room} versions per room); "
+          f"diffs were {diff_bytes / max(full_bytes, 1):.0%} of the full queue's bytes")
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replaying queue?since= diffs vs the full queue")
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=12, help="simulated guests, from always in sync to far behind")
+    parser.add_argument("--voters", type=int, default=20)
+    parser.add_argument("--catalog", type=int, default=60, help="distinct tracks to add from")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(main(args.steps, args.clients, args.voters, args.catalog, args.seed))
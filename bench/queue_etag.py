@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import text
+from app.infra.db import AsyncSessionLocal, engine
+from app.infra.queue_cache import queue_cache
+from app.main import app
+
+# What a poll costs the server when the room didn't change: full answer vs 304 Not Modified (ETag / If-None-Match).
+# Requests go straight into the ASGI app (no client or sockets), for GET queue and GET now-playing of a room
+# with --tracks queued tracks, three ways:
+#   200 recompute  version bumped before every request: QUEUE_ENTRIES_AND_NOW_PLAYING + ranking + serialization (after a write)
+#   200 cached     queue from the cache, still QueueItem objects + JSON encoding (client without ETag)
+#   304            client sends the ETag it got: the room lookup and a header, no queue work, no body
+# Creates throwaway rooms, removes them afterwards.
+#   python -m bench.queue_etag --tracks 50 200 500 --requests 500
+
+
+async def setup(tracks: int):
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            host, room_id, code = uuid.uuid4(), uuid.uuid4(), uuid.uuid4().hex[:12].upper()
+            await session.execute(text("INSERT INTO users (id, display_name) VALUES (:id, 'bench host')"), {"id": host})
+            await session.execute(
+                text("INSERT INTO rooms (id, code, name, host_user_id, is_active) VALUES (:id, :code, 'bench', :host, true)"),
+                {"id": room_id, "code": code, "host": host},
+            )
+            await session.execute(text("""
+                INSERT INTO room_tracks (id, room_id, track_id, added_by_user_id, status)
+                SELECT gen_random_uuid(), :room_id, t.id, :host, 'queued'::track_status
+                FROM (SELECT id FROM tracks ORDER BY id LIMIT :n) t
+            """), {"room_id": room_id, "host": host, "n": tracks})
+            await session.execute(text("""
+                UPDATE room_tracks SET status = 'playing'::track_status
+                WHERE id = (SELECT id FROM room_tracks WHERE room_id = :room_id ORDER BY id LIMIT 1)
+            """), {"room_id": room_id})
+    return host, room_id, code
+
+
+async def cleanup(host, room_id):
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(text("DELETE FROM rooms WHERE id = :id"), {"id": room_id})
+            await session.execute(text("DELETE FROM users WHERE id = :id"), {"id": host})
+
+
+async def call(path: str, headers: list) -> tuple[int, int]:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"host", b"bench"), *headers], "client": ("127.0.0.1", 1), "server": ("bench", 80), "app": app}
+    status, size = 0, 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, size
+
+
+async def measure(path: str, n: int, headers: list, before=None) -> tuple[float, int, int]:
+    samples = []
+    for _ in range(n):
+        if before is not None:
+            before()
+        t0 = time.perf_counter()
+        status, size = await call(path, headers)
+        samples.append((time.perf_counter() - t0) * 1_000_000)
+    return statistics.median(samples), status, size
+
+
+async def main(sizes: list[int], requests: int):
+    async with app.router.lifespan_context(app):
+        print(f"median µs per request over {requests}, body bytes")
+        print(f"{'tracks':>6} {'endpoint':>12} {'200 recompute':>14} {'200 cached':>11} {'304':>8} {'bytes':>8} {'cached/304':>10}")
+        for tracks in sizes:
+            host, room_id, code = await setup(tracks)
+            try:
+                for name, path in (("queue", f"/tracks/rooms/{code}/queue"), ("now-playing", f"/rooms/{code}/now-playing")):
+                    status, _ = await call(path, [])
+                    if status != 200:
+                        raise SystemExit(f"{path} answered {status}")
+                    recompute, _, _ = await measure(path, max(requests // 5, 20), [], before=lambda: queue_cache.bump(room_id))
+                    await call(path, [])  # cache it again
+                    cached, _, size = await measure(path, requests, [])
+                    etag = queue_cache.etag(room_id).encode()
+                    not_modified, status, _ = await measure(path, requests, [(b"if-none-match", etag)])
+                    if status != 304:
+                        raise SystemExit(f"{path} with If-None-Match answered {status}")
+                    print(f"{tracks:>6} {name:>12} {recompute:>14.0f} {cached:>11.0f} {not_modified:>8.0f} {size:>8} "
+                          f"{cached / not_modified:>9.1f}x")
+            finally:
+                await cleanup(host, room_id)
+    await engine.dispose()
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server cost of a poll: 200 vs 304 Not Modified")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.tracks, args.requests))
@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from app.api import playback, tracks, votes
+from app.api.responses import json_response
+from app.infra.db import AsyncSessionLocal, engine
+from app.main import app
+from app.schemas.tracks import QueueDelta, QueueState
+from bench.queue_etag import call, cleanup, setup
+
+# CPU per response for the hot endpoints, FastAPI's response_model path vs app.api.responses (orjson bytes).
+# For a room with --tracks queued tracks:
+#   encode   the same content both ways: serialize_response() with the route's response_model + JSONResponse
+#            (what FastAPI does with a returned model) vs json_response(). Bodies must be byte-identical,
+#            also with the tiny scores of just-added tracks.
+#   request  a whole GET through the ASGI app (cached queue), with json_response switched off (old) and on (new)
+# Creates throwaway rooms, removes them afterwards.
+#   python -m bench.queue_json --tracks 50 200 500 --requests 300
+
+
+def route(path: str, method: str):
+    return next(r for r in app.routes if getattr(r, "path", None) == path and method in r.methods)
+
+
+async def fastapi_body(field, content) -> bytes:
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+def timed(fn, n: int) -> float:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1_000_000)
+    return statistics.median(samples)
+
+
+async def atimed(fn, n: int) -> float:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1_000_000)
+    return statistics.median(samples)
+
+
+@contextmanager
+def fastapi_encoding():
+    # handlers hand their models to FastAPI again, like before app.api.responses
+    modules = (tracks, votes, playback)
+    saved = [m.json_response for m in modules]
+    for m in modules:
+        m.json_response = lambda content, response=None: content
+    try:
+        yield
+    finally:
+        for m, fn in zip(modules, saved):
+            m.json_response = fn
+
+
+def shapes(room_id, ranked, items):
+    now_playing = ranked.now_playing(datetime.now(timezone.utc))
+    fresh = [item.model_copy(update={"score": 2.5e-06 * (i + 1)}) for i, item in enumerate(items[:20])]
+    return {
+        "queue": (route("/tracks/rooms/{code}/queue", "GET"), items),
+        "delta": (route("/tracks/rooms/{code}/queue", "GET"),
+                  QueueDelta.model_construct(version="bench.1", full=True, queue=items)),
+        "advance": (route("/rooms/{code}/advance", "POST"),
+                    QueueState.model_construct(now_playing=now_playing, queue=items)),
+        "now-playing": (route("/rooms/{code}/now-playing", "GET"), now_playing),
+        "fresh": (route("/votes/rooms/{code}/votes", "POST"), fresh),
+    }
+
+
+async def main(sizes: list[int], requests: int):
+    async with app.router.lifespan_context(app):
+        print(f"median µs per response over {requests}")
+        print(f"{'tracks':>6} {'shape':>12} {'bytes':>7} {'encode old':>11} {'encode new':>11} {'speedup':>8}")
+        requests_table = []
+        for size in sizes:
+            host, room_id, code = await setup(size)
+            try:
+                async with AsyncSessionLocal() as session:
+                    ranked = await tracks._ranked_queue(session, room_id)
+                    items = await tracks._compute_queue(session, room_id)
+                for shape, (r, content) in shapes(room_id, ranked, items).items():
+                    old = await fastapi_body(r.response_field, content)
+                    new = json_response(content).body
+                    if old != new:
+                        raise SystemExit(f"{shape}: bodies differ\n{old[:300]!r}\n{new[:300]!r}")
+                    old_us = await atimed(lambda: fastapi_body(r.response_field, content), requests)
+                    new_us = timed(lambda: json_response(content), requests)
+                    print(f"{size:>6} {shape:>12} {len(new):>7} {old_us:>11.0f} {new_us:>11.0f} {old_us / new_us:>7.1f}x")
+
+                for name, path in (("queue", f"/tracks/rooms/{code}/queue"), ("now-playing", f"/rooms/{code}/now-playing")):
+                    await call(path, [])  # cache the ranking
+                    old, new = [], []
+                    for _ in range(requests):  # interleaved, so both see the same background noise
+                        with fastapi_encoding():
+                            old.append(await atimed(lambda: call(path, []), 1))
+                        new.append(await atimed(lambda: call(path, []), 1))
+                    requests_table.append((size, name, statistics.median(old), statistics.median(new)))
+            finally:
+                await cleanup(host, room_id)
+        print("\nwhole GET through the app (cached ranking), median µs")
+        print(f"{'tracks':>6} {'endpoint':>12} {'old':>8} {'new':>8} {'speedup':>8}")
+        for size, name, old_us, new_us in requests_table:
+            print(f"{size:>6} {name:>12} {old_us:>8.0f} {new_us:>8.0f} {old_us / new_us:>7.1f}x")
+    await engine.dispose()
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FastAPI response_model encoding vs orjson bytes for the queue endpoints")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(main(args.tracks, args.requests))
@@ -0,0 +1,111 @@
+import argparse
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.domain.ranking import RankedQueue
+from app.domain.scoring import epoch_seconds, score_room_track, score_room_tracks_batch
+from app.schemas.tracks import QueueItem
+
+# Checks RankedQueue against the original ranking (score_room_track per row + two stable sorts) with no database:
+# random adds, removes, votes and advances while the clock moves, so tracks cross t_age and settle between reads.
+# After every step the incremental ranking, a page of it, score_room_tracks_batch and a fresh reload
+# (the batch + RankedQueue.from_ranked, what a cache miss does) must all match the two-sort ranking score for score,
+# and the track an advance moved into now playing must keep scoring like score_room_track.
+#   python -m bench.ranked_queue_check [--steps 2000] [--seeds 20]
+
+
+def two_sort_ranking(tracks: dict, now: datetime) -> list[tuple[str, float]]:
+    # tracks: room_track_id -> (created_at, votes, is_host_add); ids sorted first so exact ties come out by id
+    ids = sorted(tracks)
+    scores = {k: float(score_room_track(tracks[k][0], tracks[k][1], is_host_add=tracks[k][2], now=now)) for k in ids}
+    ids.sort(key=lambda k: tracks[k][0])
+    ids.sort(key=lambda k: scores[k], reverse=True)
+    return [(k, scores[k]) for k in ids]
+
+
+def item(key: str, created_at: datetime, votes: int, score: float = 0.0) -> QueueItem:
+    return QueueItem(room_track_id=key, track_id=key, title="t", artist="a", duration_ms=1,
+                     votes=votes, score=score, status="queued", created_at=created_at)
+
+
+def batch_ranking(tracks: dict, now: datetime) -> tuple[list[str], list[float], list[int]]:
+    ids = sorted(tracks)
+    scores, order = score_room_tracks_batch(
+        [epoch_seconds(tracks[k][0]) for k in ids], [tracks[k][1] for k in ids], [tracks[k][2] for k in ids], now=now,
+    )
+    return ids, scores.tolist(), order.tolist()
+
+
+def reload(tracks: dict, now: datetime) -> RankedQueue:
+    ids, scores, order = batch_ranking(tracks, now)
+    return RankedQueue.from_ranked(((item(ids[i], tracks[ids[i]][0], tracks[ids[i]][1], scores[i]), tracks[ids[i]][2])
+                                    for i in order), now)
+
+
+def check(steps: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=rnd.randint(0, 10**12))
+    tracks: dict[str, tuple[datetime, int, bool]] = {}
+    playing = None  # (room_track_id, created_at, votes, is_host_add)
+    ranked = RankedQueue(now=now)
+
+    for step in range(steps):
+        op = rnd.choices(["add", "remove", "vote", "advance", "tick"], weights=[3, 1, 8, 1, 3])[0]
+        if op in ("remove", "vote") and not tracks:
+            op = "add"
+        if op == "add":
+            key = str(uuid.UUID(int=rnd.getrandbits(128)))
+            # some share a timestamp, some arrive already older than t_age
+            created_at = now - timedelta(seconds=rnd.choice([0, 0, 1, 300, 900]))
+            tracks[key] = (created_at, 0, rnd.random() < 0.2)
+            ranked.add(item(key, created_at, 0), tracks[key][2], now)
+        elif op == "remove":
+            key = rnd.choice(sorted(tracks))
+            del tracks[key]
+            ranked.remove(key)
+        elif op == "vote":
+            key = rnd.choice(sorted(tracks))
+            created_at, votes, is_host_add = tracks[key]
+            tracks[key] = (created_at, votes + rnd.choice([-1, 1]), is_host_add)
+            ranked.set_votes(key, tracks[key][1])
+        elif op == "advance":
+            # the top track starts playing (None once the queue ran dry)
+            top = two_sort_ranking(tracks, now)[:1]
+            key = top[0][0] if top else None
+            assert ranked.play(key), f"seed {seed} step {step}: advance not patched"
+            playing = None if key is None else (key, *tracks.pop(key))
+        else:
+            now += timedelta(seconds=rnd.choice([0.5, 30, 200, 599, 601]), microseconds=rnd.randint(0, 999_999))
+
+        want = two_sort_ranking(tracks, now)
+        got = [(i.room_track_id, i.score) for i in ranked.ranked(now)]
+        assert got == want, f"seed {seed} step {step} ({op}): incremental ranking differs"
+        limit = rnd.randint(0, len(want) + 1)
+        assert [(i.room_track_id, i.score) for i in ranked.ranked(now, limit=limit)] == want[:limit], \
+            f"seed {seed} step {step}: page of {limit} differs"
+        if step % 10 == 0:
+            ids, scores, order = batch_ranking(tracks, now)
+            assert [(ids[i], scores[i]) for i in order] == want, f"seed {seed} step {step}: batch scoring differs"
+            assert [(i.room_track_id, i.score) for i in reload(tracks, now).ranked(now)] == want, \
+                f"seed {seed} step {step}: reloaded ranking differs"
+
+        current = ranked.now_playing(now)
+        if playing is None:
+            assert current is None, f"seed {seed} step {step}: now playing should be empty"
+        else:
+            key, created_at, votes, is_host_add = playing
+            score = float(score_room_track(created_at, votes, is_host_add=is_host_add, now=now))
+            assert (current.room_track_id, current.score, current.status) == (key, score, "playing"), \
+                f"seed {seed} step {step}: now playing differs"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check RankedQueue against the two-sort ranking, no database")
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seeds", type=int, default=20)
+    args = parser.parse_args()
+
+    for seed in range(args.seeds):
+        check(args.steps, seed)
+    print(f"{args.seeds} seeds x {args.steps} steps: RankedQueue always matched the two-sort ranking ✅")
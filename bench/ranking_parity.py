@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import text
+from app.domain.scoring import T_AGE, W_AGE, W_HOST, score_room_track
+from app.infra.db import AsyncSessionLocal
+from app.sql import tracks as SQL
+from bench.queries import COMPUTE_QUEUE
+
+# Checks that RANKED_QUEUE (scoring + ordering in Postgres) matches score_room_track + the Python sort,
+# score for score and position for position, for every active room (or --code), page by page.
+# --synthetic N checks N throwaway rooms instead, built to hit the edges (timestamp ties, tracks right at
+# t_age, host adds, negative votes) on any migrated database, empty catalog included (CI runs it that way).
+#   python -m bench.ranking_parity [--code ABCD2345] [--synthetic 5]
+
+ACTIVE_ROOMS = "SELECT id, code FROM rooms WHERE is_active IS TRUE;"
+
+
+def python_ranking(rows, now):
+    scored = []
+    for row in rows:
+        is_host_add = str(row["added_by_user_id"]) == str(row["host_user_id"])
+        score = float(score_room_track(row["created_at"], int(row["votes"]), is_host_add=is_host_add, now=now))
+        scored.append((str(row["room_track_id"]), score, row["created_at"]))
+    # SQL breaks exact ties on id, so feed Python the same base order before its two stable sorts
+    scored.sort(key=lambda s: s[0])
+    scored.sort(key=lambda s: s[2])
+    scored.sort(key=lambda s: s[1], reverse=True)
+    return [(rt_id, score) for rt_id, score, _ in scored]
+
+
+async def check_room(session, room_id, now) -> bool:
+    rows = (await session.execute(COMPUTE_QUEUE, {"room_id": str(room_id)})).mappings().all()
+    expected = python_ranking(rows, now)
+
+    async def sql_page(limit, offset):
+        params = {"room_id": str(room_id), "now": now, "w_age": W_AGE, "t_age": T_AGE, "w_host": W_HOST,
+                  "limit": limit, "offset": offset}
+        page = (await session.execute(SQL.RANKED_QUEUE, params)).mappings().all()
+        return [(str(r["room_track_id"]), float(r["score"])) for r in page]
+
+    if await sql_page(None, 0) != expected:
+        return False
+    # every page of a few sizes, including ones running past the end
+    for limit in (1, 3, 10):
+        for offset in range(0, len(expected) + limit, limit):
+            if await sql_page(limit, offset) != expected[offset:offset + limit]:
+                return False
+    return True
+
+
+async def synthetic_room(session, seed: int, now) -> tuple:
+    # one throwaway room: tracks sharing timestamps, fresh / right at t_age / settled, host and guest adds
+    rnd = random.Random(seed)
+    host, guest = uuid.uuid4(), uuid.uuid4()
+    room_id, code = uuid.uuid4(), uuid.uuid4().hex[:12].upper()
+    track_ids = [f"bench:ranking:{seed}:{i}" for i in range(rnd.randint(20, 60))]
+    await session.execute(
+        text("INSERT INTO users (id, display_name) SELECT u, 'bench guest' FROM unnest(CAST(:ids AS uuid[])) u"),
+        {"ids": [host, guest]},
+    )
+    await session.execute(
+        text("INSERT INTO rooms (id, code, name, host_user_id, is_active) VALUES (:id, :code, 'bench', :host, true)"),
+        {"id": room_id, "code": code, "host": host},
+    )
+    await session.execute(
+        text("INSERT INTO tracks (id, title, artist, duration_ms) SELECT t, 'bench', 'bench', 180000 FROM unnest(CAST(:ids AS text[])) t"),
+        {"ids": track_ids},
+    )
+    ages = [0, 0.5, 1, 300, 599.999999, T_AGE, 600.000001, 3600]
+    for track_id in track_ids:
+        await session.execute(
+            text("INSERT INTO room_tracks (id, room_id, track_id, added_by_user_id, status, created_at, vote_sum) "
+                 "VALUES (:id, :room_id, :track_id, :user_id, 'queued', :created_at, :votes)"),
+            {"id": uuid.uuid4(), "room_id": room_id, "track_id": track_id, "user_id": rnd.choice([host, guest]),
+             "created_at": now - timedelta(seconds=rnd.choice(ages)), "votes": rnd.randint(-2, 3)},
+        )
+    return room_id, code, [host, guest], track_ids
+
+
+async def cleanup_synthetic(session, room_id, users, track_ids) -> None:
+    await session.execute(text("DELETE FROM rooms WHERE id = :id"), {"id": room_id})
+    await session.execute(text("DELETE FROM users WHERE id = ANY(CAST(:ids AS uuid[]))"), {"ids": users})
+    await session.execute(text("DELETE FROM tracks WHERE id = ANY(CAST(:ids AS text[]))"), {"ids": track_ids})
+
+
+async def main(code, synthetic: int):
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as session:
+        if synthetic:
+            bad = []
+            for seed in range(synthetic):
+                async with session.begin():
+                    room_id, room_code, users, track_ids = await synthetic_room(session, seed, now)
+                try:
+                    if not await check_room(session, room_id, now):
+                        bad.append(room_code)
+                finally:
+                    await session.rollback()
+                    async with session.begin():
+                        await cleanup_synthetic(session, room_id, users, track_ids)
+            rooms = range(synthetic)
+        else:
+            rooms = (await session.execute(text(ACTIVE_ROOMS))).mappings().all()
+            if code:
+                rooms = [r for r in rooms if r["code"] == code]
+            bad = [r["code"] for r in rooms if not await check_room(session, r["id"], now)]
+    print(f"checked {len(rooms)} rooms, {len(bad)} mismatched {bad if bad else '✅'}")
+    if bad:
+        raise SystemExit(1)
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare SQL queue ranking with the Python scorer")
+    parser.add_argument("--code", help="only this room")
+    parser.add_argument("--synthetic", type=int, default=0, help="check this many throwaway rooms instead")
+    args = parser.parse_args()
+    asyncio.run(main(args.code, args.synthetic))
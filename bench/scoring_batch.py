@@ -0,0 +1,59 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.domain.scoring import epoch_seconds, score_room_track, score_room_tracks_batch
+
+# Per-row score_room_track + two stable sorts (the old _compute_queue path)
+# vs score_room_tracks_batch, on synthetic queues. Also checks both give the same scores and order.
+#   python -m bench.scoring_batch --sizes 100 1000 10000 100000
+
+
+def synthetic_queue(n: int, now: datetime, seed: int = 7):
+    rnd = random.Random(seed)
+    created = [now - timedelta(seconds=rnd.randint(0, 1800), microseconds=rnd.randint(0, 999_999)) for _ in range(n)]
+    votes = [rnd.randint(-5, 20) for _ in range(n)]
+    host = [rnd.random() < 0.2 for _ in range(n)]
+    return created, votes, host
+
+
+def per_row(created, votes, host, now):
+    scores = [score_room_track(c, v, is_host_add=h, now=now) for c, v, h in zip(created, votes, host)]
+    order = sorted(range(len(scores)), key=lambda i: created[i])
+    order.sort(key=lambda i: scores[i], reverse=True)
+    return scores, order
+
+
+def batch(created, votes, host, now):
+    scores, order = score_room_tracks_batch([epoch_seconds(c) for c in created], votes, host, now=now)
+    return scores.tolist(), order.tolist()
+
+
+def timeit(fn, *args, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batch vs per-row queue scoring")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    # "batch ms" includes turning datetimes into epoch seconds (what the API does per request),
+    # "kernel ms" is the NumPy call alone on ready-made columns (offline re-scoring)
+    print(f"{'rows':>8} {'per-row ms':>11} {'batch ms':>9} {'kernel ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        created, votes, host = synthetic_queue(n, now)
+        assert per_row(created, votes, host, now) == batch(created, votes, host, now), f"mismatch at n={n}"
+        a = timeit(per_row, created, votes, host, now, repeat=args.repeat)
+        b = timeit(batch, created, votes, host, now, repeat=args.repeat)
+        created_s = [epoch_seconds(c) for c in created]
+        k = timeit(score_room_tracks_batch, created_s, votes, host, now, repeat=args.repeat)
+        print(f"{n:>8} {a * 1000:>11.2f} {b * 1000:>9.2f} {k * 1000:>10.2f} {a / b:>7.1f}x")
@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import text
+from app.infra.db import AsyncSessionLocal
+from app.infra.search_index import CatalogIndex
+from app.sql import tracks as SQL
+
+# /tracks/search against a big synthetic catalog: the old leading-wildcard ILIKE (sequential scan)
+# vs SEARCH_TRACKS on the pg_trgm GIN indexes vs the in-memory CatalogIndex. Run it against a scratch database, it writes
+# --rows synthetic tracks (ids 'bench:<n>') into tracks; --cleanup removes them.
+#   python -m bench.search_catalog --rows 1000000
+
+OLD_SEARCH = """
+SELECT id, title, artist, duration_ms
+FROM tracks
+WHERE title ILIKE :q OR artist ILIKE :q
+ORDER BY title
+LIMIT 20;
+"""
+
+# titles/artists out of a small vocabulary, so terms hit realistic numbers of rows
+GENERATE = """
+INSERT INTO tracks (id, title, artist, duration_ms)
+SELECT
+  'bench:' || g,
+  initcap(w[1 + (g * 7) % array_length(w, 1)] || ' ' || w[1 + (g * 13 / 3) % array_length(w, 1)] || ' ' || g % 997),
+  initcap(a[1 + (g * 31) % array_length(a, 1)] || ' ' || a[1 + (g / 7) % array_length(a, 1)]),
+  120000 + (g * 7919) % 240000
+FROM generate_series(CAST(:start AS bigint), CAST(:stop AS bigint)) g,
+     (SELECT string_to_array('love night dance fire heart summer rain gold city dream wild blue moon road home girl boy party sky ocean', ' ') AS w,
+             string_to_array('billie dua weeknd bunny taylor harry calvin tones farruko drake rosalia karol shakira bad lipa swift styles eilish', ' ') AS a) v
+ON CONFLICT (id) DO NOTHING;
+"""
+
+TERMS = ["lov", "billie", "night dr", "zzzq", "a", "swift", "heart 99", "gold city 12"]
+
+
+async def timed(session, sql, params, repeat, seq_scan=False):
+    samples = []
+    for _ in range(repeat):
+        async with session.begin():
+            if seq_scan:
+                await session.execute(text("SET LOCAL enable_bitmapscan = off"))
+                await session.execute(text("SET LOCAL enable_indexscan = off"))
+            t0 = time.perf_counter()
+            rows = (await session.execute(text(sql), params)).all()
+            samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), len(rows)
+
+
+def timed_index(index, term, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        hits = index.search(term)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples), hits
+
+
+async def main(rows: int, repeat: int, cleanup: bool, index_mb: int):
+    async with AsyncSessionLocal() as session:
+        if cleanup:
+            async with session.begin():
+                await session.execute(text("DELETE FROM tracks WHERE id LIKE 'bench:%'"))
+            print("removed bench tracks")
+            return
+
+        have = (await session.execute(text("SELECT count(*) FROM tracks WHERE id LIKE 'bench:%'"))).scalar_one()
+        await session.commit()
+        if have < rows:
+            t0 = time.perf_counter()
+            for start in range(1, rows + 1, 100_000):
+                async with session.begin():
+                    await session.execute(text(GENERATE), {"start": start, "stop": min(start + 99_999, rows)})
+            print(f"generated {rows - have} tracks in {time.perf_counter() - t0:.1f}s")
+        async with session.begin():
+            await session.execute(text("ANALYZE tracks"))
+
+        total = (await session.execute(text("SELECT count(*) FROM tracks"))).scalar_one()
+        trgm = (await session.execute(text(
+            "SELECT count(*) FROM pg_indexes WHERE tablename = 'tracks' AND indexname LIKE '%_trgm'"
+        ))).scalar_one()
+        await session.commit()
+        print(f"catalog: {total} tracks, trigram indexes: {trgm}")
+        if trgm < 2:
+            print("pg_trgm indexes missing (run alembic upgrade head on a server with pg_trgm), timing the old query only")
+
+    index = CatalogIndex(max_bytes=index_mb * 2**20)
+    t0 = time.perf_counter()
+    await index.build(AsyncSessionLocal)
+    print(f"in-memory index: {index.stats()} built in {time.perf_counter() - t0:.1f}s")
+
+    # index "-" = it handed the query back to SQL (too short, too broad or over budget)
+    async with AsyncSessionLocal() as session:
+        print(f"{'term':>10} {'old seq ms':>11} {'new ms':>8} {'index us':>9} {'rows':>5}")
+        for term in TERMS:
+            params = {"q": f"%{term}%", "prefix": f"{term}%", "term": term}
+            old_ms, _ = await timed(session, OLD_SEARCH, params, repeat, seq_scan=True)
+            index_us, hits = timed_index(index, term, repeat)
+            index_col = f"{index_us:>9.0f}" if hits is not None else f"{'-':>9}"
+            if trgm < 2:
+                print(f"{term:>10} {old_ms:>11.1f} {'-':>8} {index_col}")
+                continue
+            new_ms, n = await timed(session, SQL.SEARCH_TRACKS, params, repeat)
+            print(f"{term:>10} {old_ms:>11.1f} {new_ms:>8.1f} {index_col} {n:>5}")
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /tracks/search on a synthetic catalog")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cleanup", action="store_true", help="delete the synthetic tracks and exit")
+    parser.add_argument("--index-mb", type=int, default=1024, help="memory budget for the in-memory index")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat, args.cleanup, args.index_mb))
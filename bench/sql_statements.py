@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.domain.scoring import T_AGE, W_AGE, W_HOST
+from app.infra.db import DATABASE_URL
+from app.infra.db_pool import PoolMetrics, PoolSettings, create_pooled_engine
+from app.sql import playback as SQL_PB, rooms as SQL_ROOMS, tracks as SQL, votes as SQLV
+
+# Per-query latency of the hot read queries, three ways on one connection:
+#   unprepared  text(sql) built per call, no prepared statement cache: parse + plan every call
+#               (what old PgBouncer in transaction mode forces, DB_STATEMENT_CACHE_SIZE=0)
+#   per call    text(sql) built per call (the old handlers), asyncpg's prepared statements cached
+#   prebuilt    the app.sql statements as the app runs them now: built at import, typed binds, cached
+# Creates a throwaway room with --tracks queued tracks, removes it afterwards.
+#   python -m bench.sql_statements --tracks 50 --iterations 2000
+
+
+async def setup(tracks: int):
+    async with AsyncSession(engine_for(256)) as session:
+        async with session.begin():
+            host, room_id, code = uuid.uuid4(), uuid.uuid4(), uuid.uuid4().hex[:12].upper()
+            await session.execute(text("INSERT INTO users (id, display_name) VALUES (:id, 'bench host')"), {"id": host})
+            await session.execute(
+                text("INSERT INTO rooms (id, code, name, host_user_id, is_active) VALUES (:id, :code, 'bench', :host, true)"),
+                {"id": room_id, "code": code, "host": host},
+            )
+            await session.execute(text("""
+                INSERT INTO room_tracks (id, room_id, track_id, added_by_user_id, status)
+                SELECT gen_random_uuid(), :room_id, t.id, :host, 'queued'::track_status
+                FROM (SELECT id FROM tracks ORDER BY id LIMIT :n) t
+            """), {"room_id": room_id, "host": host, "n": tracks})
+    return host, room_id, code
+
+
+async def cleanup(host, room_id):
+    async with AsyncSession(engine_for(256)) as session:
+        async with session.begin():
+            await session.execute(text("DELETE FROM rooms WHERE id = :id"), {"id": room_id})
+            await session.execute(text("DELETE FROM users WHERE id = :id"), {"id": host})
+
+
+_engines = {}
+
+
+def engine_for(cache_size: int):
+    if cache_size not in _engines:
+        _engines[cache_size] = create_pooled_engine(
+            DATABASE_URL, PoolSettings(pool_size=1, max_overflow=0, pre_ping="never"), PoolMetrics(),
+            connect_args={"ssl": False, "prepared_statement_cache_size": cache_size},
+        )
+    return _engines[cache_size]
+
+
+async def time_query(cache_size: int, build, params: dict, iterations: int) -> float:
+    async with AsyncSession(engine_for(cache_size)) as session:
+        for _ in range(20):  # warm up (connect, first prepare)
+            (await session.execute(build(), params)).all()
+        samples = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            (await session.execute(build(), params)).all()
+            samples.append((time.perf_counter() - t0) * 1_000_000)
+        await session.rollback()
+    return statistics.median(samples)
+
+
+async def main(tracks: int, iterations: int):
+    host, room_id, code = await setup(tracks)
+    score = {"now": datetime.now(timezone.utc), "w_age": W_AGE, "t_age": T_AGE, "w_host": W_HOST}
+    queries = {
+        "GET_ROOM_BY_CODE": (SQL_ROOMS.GET_ROOM_BY_CODE, {"code": code}),
+        "COMPUTE_QUEUE_AND_NOW_PLAYING": (SQL.COMPUTE_QUEUE_AND_NOW_PLAYING, {"room_id": str(room_id)}),
+        "QUEUE_ENTRIES_AND_NOW_PLAYING": (SQL.QUEUE_ENTRIES_AND_NOW_PLAYING, {"room_id": str(room_id)}),
+        "RANKED_QUEUE (limit 20)": (SQL.RANKED_QUEUE, {"room_id": str(room_id), "limit": 20, "offset": 0, **score}),
+        "GET_NOW_PLAYING_DETAILS": (SQL_PB.GET_NOW_PLAYING_DETAILS, {"room_id": str(room_id)}),
+        "GET_ROOM_BALLOTS": (SQLV.GET_ROOM_BALLOTS, {"room_id": str(room_id)}),
+    }
+    try:
+        print(f"median µs per query over {iterations} calls, room with {tracks} queued tracks")
+        print(f"{'query':>30} {'unprepared':>11} {'per call':>9} {'prebuilt':>9} {'saved':>7}")
+        for name, (stmt, params) in queries.items():
+            raw = stmt.text
+            unprepared = await time_query(0, lambda: text(raw), params, iterations)
+            per_call = await time_query(256, lambda: text(raw), params, iterations)
+            prebuilt = await time_query(256, lambda: stmt, params, iterations)
+            print(f"{name:>30} {unprepared:>11.0f} {per_call:>9.0f} {prebuilt:>9.0f} {unprepared - prebuilt:>7.0f}")
+    finally:
+        await cleanup(host, room_id)
+        for engine in _engines.values():
+            await engine.dispose()
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-query latency: unprepared vs text() per call vs prebuilt statements")
+    parser.add_argument("--tracks", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.tracks, args.iterations))
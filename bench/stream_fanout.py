@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import time
+
+from app.infra.room_hub import RoomHub
+
+# Fan-out harness for the /rooms/{code}/stream hub, no DB needed.
+# N simulated guests subscribe to one room, we fire changes and check that
+#   - every change builds the snapshot exactly once (not once per guest)
+#   - every guest receives it, and how long that took
+#   - an idle room pushes nothing
+#   python -m bench.stream_fanout --subscribers 500 --changes 50
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(subscribers: int, changes: int, snapshot_ms: float):
+    async def snapshot(room_id):
+        await asyncio.sleep(snapshot_ms / 1000)  # stand-in for loading the queue
+        return f"{time.perf_counter()}"
+
+    hub = RoomHub(snapshot=snapshot)
+    room = "room-1"
+    latencies: list[float] = []
+    received = [0] * subscribers
+
+    async def guest(i: int, mailbox: asyncio.Queue):
+        while True:
+            await mailbox.get()
+            received[i] += 1
+            latencies.append(time.perf_counter() - sent_at)
+
+    mailboxes = [hub.subscribe(room) for _ in range(subscribers)]
+    tasks = [asyncio.create_task(guest(i, m)) for i, m in enumerate(mailboxes)]
+
+    # idle room: nothing should be built or pushed
+    await asyncio.sleep(0.05)
+    assert hub.snapshots_built == 0 and hub.messages_sent == 0, "idle room pushed something"
+
+    # spaced changes: one snapshot and one message per guest each
+    for _ in range(changes):
+        sent_at = time.perf_counter()
+        hub.notify(room)
+        await asyncio.sleep(snapshot_ms / 1000 * 3)
+    spaced_built = hub.snapshots_built
+    assert spaced_built == changes, f"built {spaced_built} snapshots for {changes} changes"
+    assert all(r == changes for r in received), "some guests missed an update"
+
+    # vote burst: many notifies while a refresh is in flight collapse into at most two builds
+    before = hub.snapshots_built
+    sent_at = time.perf_counter()
+    for _ in range(200):
+        hub.notify(room)
+    await asyncio.sleep(snapshot_ms / 1000 * 4)
+    burst_built = hub.snapshots_built - before
+    assert burst_built <= 2, f"burst of 200 changes built {burst_built} snapshots"
+
+    for t in tasks:
+        t.cancel()
+
+    ms = [x * 1000 for x in latencies]
+    print(f"subscribers={subscribers} changes={changes} snapshot={snapshot_ms}ms")
+    print(f"snapshots built: {spaced_built} for {changes} changes, {burst_built} for a burst of 200")
+    print(f"messages delivered: {hub.messages_sent}")
+    print(f"notify -> guest latency ms: p50={pct(ms, 50):.2f} p95={pct(ms, 95):.2f} p99={pct(ms, 99):.2f} max={max(ms):.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate many stream subscribers on one room")
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--changes", type=int, default=50)
+    parser.add_argument("--snapshot-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.changes, args.snapshot_ms))
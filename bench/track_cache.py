@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import text
+from app.api.tracks import _load_ranked
+from app.infra.db import AsyncSessionLocal, engine
+from app.infra.track_cache import TrackCache, track_cache
+from bench.queue_etag import cleanup, setup
+
+# The track metadata cache (app.infra.track_cache):
+#   memory   --memory tracks from the catalog put in a cache: its own estimate (stats, GET /metrics)
+#            vs what tracemalloc saw allocated
+#   load     loading a room's queue with --tracks queued tracks (what every write costs the next read):
+#            COMPUTE_QUEUE_AND_NOW_PLAYING joining tracks (cache off) vs QUEUE_ENTRIES_AND_NOW_PLAYING plus
+#            titles from a warm cache, and from a cold one (every title fetched with TRACKS_BY_IDS);
+#            all three must give the same tracks, titles, artists and durations
+# Creates throwaway rooms, removes them afterwards.
+#   python -m bench.track_cache --tracks 50 200 500 --loads 200 --memory 50000
+
+
+async def memory(n: int) -> None:
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(text("SELECT id, title, artist, duration_ms FROM tracks LIMIT :n"), {"n": n})).all()
+    cache = TrackCache(max_tracks=n)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for row in rows:
+        # copies, so the strings belong to the cache like the ones decoded off the wire would
+        cache.put("".join(row.id), "".join(row.title), "".join(row.artist), row.duration_ms + 0)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{len(cache)} tracks: estimate {cache.bytes / 2**20:.1f} MB, tracemalloc {allocated / 2**20:.1f} MB, "
+          f"~{allocated / max(len(cache), 1):.0f} bytes per track")
+
+
+async def metadata(room_id) -> list[tuple]:
+    async with AsyncSessionLocal() as session:
+        ranked = await _load_ranked(session, room_id)
+    return [(i.room_track_id, i.track_id, i.title, i.artist, i.duration_ms) for i in ranked.ranked()]
+
+
+async def load_us(room_id, loads: int, before=None) -> float:
+    samples = []
+    async with AsyncSessionLocal() as session:
+        for _ in range(loads):
+            if before is not None:
+                before()
+            t0 = time.perf_counter()
+            await _load_ranked(session, room_id)
+            samples.append((time.perf_counter() - t0) * 1_000_000)
+            await session.rollback()
+    return statistics.median(samples)
+
+
+async def main(sizes: list[int], loads: int, memory_tracks: int):
+    await memory(memory_tracks)
+    configured = track_cache.max_tracks
+    print(f"\nmedian µs to load a room's queue over {loads} loads")
+    print(f"{'tracks':>6} {'join (off)':>11} {'warm cache':>11} {'cold cache':>11}")
+    for size in sizes:
+        host, room_id, code = await setup(size)
+        try:
+            track_cache.max_tracks = 0
+            joined = await load_us(room_id, loads)
+            want = await metadata(room_id)
+            track_cache.max_tracks = configured
+            track_cache.clear()
+            if await metadata(room_id) != want or await metadata(room_id) != want:  # cold, then warm
+                raise SystemExit("queue loaded through the track cache differs from the joined one")
+            cold = await load_us(room_id, max(loads // 5, 10), before=track_cache.clear)
+            await load_us(room_id, 1)  # fill it
+            warm = await load_us(room_id, loads)
+            print(f"{size:>6} {joined:>11.0f} {warm:>11.0f} {cold:>11.0f}")
+        finally:
+            track_cache.max_tracks = configured
+            await cleanup(host, room_id)
+    await engine.dispose()
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track metadata cache: memory and queue load time")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--loads", type=int, default=200)
+    parser.add_argument("--memory", type=int, default=50000, help="tracks to measure the cache's memory with")
+    args = parser.parse_args()
+    asyncio.run(main(args.tracks, args.loads, args.memory))
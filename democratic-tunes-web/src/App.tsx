@@ -10,6 +10,7 @@ import {
   vote,
   advance,
   getNowPlaying,
+  openRoomStream,
 } from "./api";
 
 // Very loose types to avoid TS friction while you iterate
@@ -138,9 +139,11 @@ export default function App() {
     health().catch(() => {});
   }, []);
 
-  // Poll queue when in room
+  // Live queue when in room: the server pushes every change over /stream.
+  // Polling every 4s is only the fallback while the stream is down.
   useEffect(() => {
     let t: number | undefined;
+    let es: EventSource | undefined;
   
   async function poll() {
     if (!roomCode) return;
@@ -180,11 +183,36 @@ export default function App() {
     }
   }
   
+  function startPolling() {
+    if (t) return;
+    poll();
+    t = window.setInterval(poll, 4000);
+  }
+
+  function stopPolling() {
+    if (t) clearInterval(t);
+    t = undefined;
+  }
+  
     if (view === "room" && roomCode) {
-      poll();
-      t = window.setInterval(poll, 4000);
+      if (typeof EventSource === "undefined") {
+        startPolling();
+      } else {
+        es = openRoomStream(roomCode, (state) => {
+          setNowPlaying(state.now_playing ?? null);
+          if (!sameQueue(queueRef.current, state.queue)) {
+            setQueue(state.queue);
+          }
+          setQueueError(null);
+        });
+        es.onopen = stopPolling;
+        es.onerror = startPolling; // EventSource keeps retrying on its own, poll meanwhile
+      }
     }
-    return () => { if (t) clearInterval(t); };
+    return () => {
+      stopPolling();
+      es?.close();
+    };
   }, [view, roomCode]);
   
   const queueOnly = useMemo(
@@ -269,9 +297,8 @@ export default function App() {
   async function onAddTrack(track_id: string) {
     if (!roomCode) return;
     try {
-      await addTrack(roomCode, track_id);
-      // refresh queue shortly after add
-      const data = await getQueue(roomCode);
+      // the add response already carries the refreshed queue
+      const data = await addTrack(roomCode, track_id);
       setQueue(data);
     } catch (e: any) {
       setErr(e?.message || "Failed to add track");
@@ -281,8 +308,7 @@ export default function App() {
   async function onVote(id: string, value: 1 | -1) {
     if (!roomCode) return;
     try {
-      await vote(roomCode, id, value);
-      const data = await getQueue(roomCode);
+      const data = await vote(roomCode, id, value);
       setQueue(data);
     } catch (e: any) {
       setErr(e?.message || "Vote failed");
@@ -25,8 +25,29 @@ export const createRoom = (name: string, userId: string) =>
     headers: { "X-User-ID": userId },
   }).json<any>();
 
+// Polled GETs: send back the ETag of our last copy, a 304 means it's still current (no body to download)
+const lastSeen = new Map<string, { etag: string; body: any }>();
+
+const getPolled = async <T>(path: string): Promise<T> => {
+  const seen = lastSeen.get(path);
+  try {
+    const res = await api.get(path, {
+      cache: "no-store", // we keep the copy ourselves, the browser's cache would answer for the server
+      headers: seen ? { "If-None-Match": seen.etag } : undefined,
+    });
+    const body = await res.json<T>();
+    const etag = res.headers.get("ETag");
+    if (etag) lastSeen.set(path, { etag, body });
+    return body;
+  } catch (err: any) {
+    // ky treats anything outside 2xx as an error, 304 included
+    if (err?.response?.status === 304 && seen) return seen.body;
+    throw err;
+  }
+};
+
 export const getQueue = (code: string) =>
-  api.get(`tracks/rooms/${code}/queue`).json<any>();
+  getPolled<any>(`tracks/rooms/${code}/queue`);
 
 export const searchTracks = (q: string) =>
   api.get("tracks/search", { searchParams: { artist_or_title: q } }).json<any>();
@@ -40,11 +61,20 @@ export const vote = (code: string, room_track_id: string, value: 1 | -1) =>
 export const advance = (code: string) =>
   api.post(`rooms/${code}/advance`).json<{ now_playing: any | null, queue: any[] }>();
 
+// Server-sent updates for a room: onState gets { now_playing, queue } every time the room changes.
+export const openRoomStream = (
+  code: string,
+  onState: (state: { now_playing: any | null, queue: any[] }) => void,
+) => {
+  const url = new URL(`rooms/${code}/stream`, import.meta.env.VITE_API_BASE);
+  const es = new EventSource(url, { withCredentials: true }); // keep the uid cookie
+  es.addEventListener("queue", (e) => onState(JSON.parse((e as MessageEvent).data)));
+  return es;
+};
+
 export const getNowPlaying = async (code: string) => {
     try {
-      return await api
-        .get(`rooms/${code}/now-playing`)
-        .json<{ now_playing: any | null }>();
+      return await getPolled<{ now_playing: any | null }>(`rooms/${code}/now-playing`);
     } catch (err: any) {
       const status = err?.response?.status;
       if (status === 404 || status === 204) {
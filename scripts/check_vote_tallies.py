@@ -0,0 +1,41 @@
+import argparse
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import text
+from app.infra.db import AsyncSessionLocal
+from app.sql import votes as SQLV
+
+# Compare room_tracks.vote_sum / vote_count against the votes table.
+# Safe to rerun any time:  python -m scripts.check_vote_tallies [--repair]
+async def main(repair: bool):
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            if repair:
+                # block vote writes while we recount so the fix can't race the trigger
+                await session.execute(text("LOCK TABLE votes IN SHARE ROW EXCLUSIVE MODE"))
+
+            drifted = (await session.execute(SQLV.CHECK_VOTE_TALLIES)).mappings().all()
+            for row in drifted:
+                print(
+                    f"{row['room_track_id']}: sum {row['vote_sum']} (expected {row['expected_sum']}), "
+                    f"count {row['vote_count']} (expected {row['expected_count']})"
+                )
+
+            if not drifted:
+                print("Vote tallies consistent ✅")
+                return
+            if not repair:
+                print(f"{len(drifted)} room_tracks out of sync, rerun with --repair to fix")
+                raise SystemExit(1)
+
+            fixed = (await session.execute(SQLV.REPAIR_VOTE_TALLIES)).scalars().all()
+            print(f"Repaired {len(fixed)} room_tracks ✅")
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check room_tracks vote tallies against the votes table")
+    parser.add_argument("--repair", action="store_true", help="recount drifted tallies from votes")
+    args = parser.parse_args()
+    asyncio.run(main(args.repair))
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from typing import Iterable, Iterator, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.infra.db import AsyncSessionLocal
+from app.infra.room_events import room_events
+from app.sql import tracks as SQL
+
+# Load a catalog dump (CSV with an id,title,artist,duration_ms header, or JSONL with the same keys,
+# optionally .gz) into tracks:
+#   python -m scripts.ingest_tracks catalog.csv.gz [--chunk-size 50000]
+# Reads the file as a stream and works chunk by chunk: COPY into a temp staging table, then one
+# INSERT ... ON CONFLICT upsert, committed per chunk. Rows that didn't change aren't touched, so a
+# rerun (e.g. after an interrupted load) just skips what is already there.
+
+STAGING_COLUMNS = ["seq", "id", "title", "artist", "duration_ms"]
+DEFAULT_DURATION_MS = 180000  # same as the tracks.duration_ms server default
+NOTIFY_IDS_MAX = 500          # up to this many changed tracks workers patch their search index, beyond it they rebuild
+NOTIFY_IDS_PER_EVENT = 100    # keeps each event well under the 8000 byte NOTIFY payload limit
+
+
+def open_dump(path: str) -> io.TextIOBase:
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def read_dump(path: str, fmt: Optional[str] = None) -> Iterator[tuple[int, dict]]:
+    # (line number, raw record) one at a time, never the whole file
+    name = path[:-3] if path.endswith(".gz") else path
+    fmt = fmt or ("csv" if name.endswith(".csv") else "jsonl")
+    with open_dump(path) as f:
+        if fmt == "csv":
+            for n, record in enumerate(csv.DictReader(f), start=2):
+                yield n, record
+        else:
+            for n, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield n, json.loads(line)
+                    except ValueError:
+                        yield n, None
+
+
+def to_row(record: Optional[dict]) -> tuple[str, str, str, int]:
+    if not isinstance(record, dict):
+        raise ValueError("not a JSON object")
+    track_id = str(record.get("id") or "").strip()
+    title = str(record.get("title") or "").strip()
+    artist = str(record.get("artist") or "").strip()
+    if not (track_id and title and artist):
+        raise ValueError("id, title and artist are required")
+    duration = record.get("duration_ms")
+    duration_ms = int(duration) if duration not in (None, "") else DEFAULT_DURATION_MS
+    if duration_ms <= 0:
+        raise ValueError(f"bad duration_ms {duration!r}")
+    return track_id, title, artist, duration_ms
+
+
+async def load_chunk(session, rows: list[tuple]) -> list:
+    async with session.begin():
+        await session.execute(SQL.CREATE_TRACKS_STAGING)
+        # COPY straight from the asyncpg connection under the session's transaction
+        raw = await (await session.connection()).get_raw_connection()
+        await raw.driver_connection.copy_records_to_table("tracks_staging", records=rows, columns=STAGING_COLUMNS)
+        return (await session.execute(SQL.UPSERT_TRACKS_FROM_STAGING)).all()
+
+
+async def ingest(records: Iterable[tuple[int, dict]], chunk_size: int = 50_000, notify: bool = True, quiet: bool = False) -> dict:
+    stats = {"read": 0, "inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    changed_ids: list[str] = []
+    started = time.perf_counter()
+
+    def report(final: bool = False) -> None:
+        if quiet and not final:
+            return
+        elapsed = time.perf_counter() - started
+        print(
+            f"{'done: ' if final else ''}{stats['read']:,} rows read, {stats['inserted']:,} new, {stats['updated']:,} changed, "
+            f"{stats['unchanged']:,} unchanged, {stats['skipped']:,} skipped "
+            f"({stats['read'] / elapsed if elapsed else 0:,.0f} rows/s)"
+        )
+
+    async with AsyncSessionLocal() as session:
+        chunk: list[tuple] = []
+
+        async def flush() -> None:
+            written = await load_chunk(session, chunk)
+            inserted = sum(1 for row in written if row.inserted)
+            stats["inserted"] += inserted
+            stats["updated"] += len(written) - inserted
+            stats["unchanged"] += len(chunk) - len(written)  # includes ids repeated inside the chunk
+            if len(changed_ids) <= NOTIFY_IDS_MAX:
+                changed_ids.extend(row.id for row in written)
+            chunk.clear()
+            report()
+
+        for n, record in records:
+            stats["read"] += 1
+            try:
+                chunk.append((stats["read"], *to_row(record)))
+            except (ValueError, TypeError) as e:
+                stats["skipped"] += 1
+                if stats["skipped"] <= 10:
+                    print(f"line {n}: skipped ({e})", file=sys.stderr)
+                continue
+            if len(chunk) >= chunk_size:
+                await flush()
+        if chunk:
+            await flush()
+
+    report(final=True)
+    if notify and changed_ids:
+        await notify_workers(changed_ids)
+    return stats
+
+
+async def notify_workers(changed_ids: list[str]) -> None:
+    # running API workers keep an in-memory search index of the catalog
+    await room_events.start()
+    if len(changed_ids) > NOTIFY_IDS_MAX:
+        room_events.publish("*", "catalog_changed")
+    else:
+        for i in range(0, len(changed_ids), NOTIFY_IDS_PER_EVENT):
+            room_events.publish("*", "tracks_added", track_ids=changed_ids[i:i + NOTIFY_IDS_PER_EVENT])
+    await room_events.stop()
+
+
+async def main(path: str, fmt: Optional[str], chunk_size: int, notify: bool):
+    stats = await ingest(read_dump(path, fmt), chunk_size=chunk_size, notify=notify)
+    if stats["skipped"]:
+        raise SystemExit(1)
+
+#avoid running this script if imported
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load a track catalog dump (CSV or JSONL) into tracks")
+    parser.add_argument("path", help="CSV/JSONL file, optionally .gz, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="rows per COPY + upsert transaction")
+    parser.add_argument("--no-notify", action="store_true", help="don't tell running workers to refresh their search index")
+    args = parser.parse_args()
+    asyncio.run(main(args.path, args.format, args.chunk_size, not args.no_notify))
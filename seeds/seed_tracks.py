@@ -2,10 +2,7 @@ import asyncio
 from dotenv import load_dotenv
 load_dotenv()
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.infra.db import AsyncSessionLocal
-from app.domain.models import Track
+from scripts.ingest_tracks import ingest
 
 SAMPLES = [
     {"id":"mock:track:1","title":"Levitating","artist":"Dua Lipa","duration_ms":203000},
@@ -20,16 +17,10 @@ SAMPLES = [
     {"id":"mock:track:10","title":"One Kiss","artist":"Calvin Harris & Dua Lipa","duration_ms":213000},
 ]
 
-#add tracks to the database
+#add tracks to the database (same upsert as scripts/ingest_tracks.py, so rerunning it is harmless)
 async def main():
-    async with AsyncSessionLocal() as session:  # type: AsyncSession
-        existing = (await session.execute(select(Track))).scalars().first()
-        if existing:
-            print("Tracks already seeded"); return
-        for t in SAMPLES:
-            session.add(Track(**t))
-        await session.commit()
-        print(f"Seeded {len(SAMPLES)} tracks ✅")
+    stats = await ingest(enumerate(SAMPLES, start=1), quiet=True)
+    print(f"Seeded {stats['inserted']} new, {stats['updated']} changed tracks ✅")
 
 #avoid running this script if imported
 if __name__ == "__main__":